@@ -0,0 +1,112 @@
+import asyncio
+from collections import Counter
+from typing import Dict, Optional
+
+from fastapi import HTTPException
+
+from app.core.nats_client import NatsJetStreamPublisher
+
+
+class AdmissionController:
+    """
+    Sheds ingest load while the pipeline is lagging.
+
+    A background task polls `consumer_info` for each watched durable. While any
+    durable's pending count is above its threshold the controller is overloaded and
+    `check` raises 429 with `Retry-After`. With `per_org`, the orgs instead share a
+    reduced budget per poll interval: `overload_budget` times the messages admitted in
+    the last interval before the overload, split evenly across the orgs seen in it. Small
+    orgs keep flowing while a backfilling org is throttled, and total intake still drops.
+    Budgets count messages, so callers charge a batch its size (`cost`).
+    """
+
+    def __init__(
+        self,
+        publisher: NatsJetStreamPublisher,
+        max_pending: Dict[str, int],
+        poll_interval: float,
+        retry_after: int,
+        per_org: bool = False,
+        overload_budget: float = 0.5,
+    ) -> None:
+        self._publisher = publisher
+        self._max_pending = {durable: limit for durable, limit in max_pending.items() if limit > 0}
+        self._poll_interval = poll_interval
+        self._retry_after = retry_after
+        self._per_org = per_org
+        self._overload_budget = overload_budget
+        self._pending: Dict[str, int] = {}
+        self._overloaded: Dict[str, int] = {}
+        self._org_counts: Counter = Counter()
+        self._last_org_counts: Counter = Counter()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def overloaded(self) -> bool:
+        return bool(self._overloaded)
+
+    @property
+    def pending(self) -> Dict[str, int]:
+        return dict(self._pending)
+
+    async def start(self) -> None:
+        if self._max_pending and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def refresh(self) -> None:
+        was_overloaded = bool(self._overloaded)
+        for durable, limit in self._max_pending.items():
+            try:
+                pending = await self._publisher.consumer_pending(durable)
+            except Exception as e:
+                # Fail open: an unreadable consumer must not take ingest down with it.
+                print(f"⚠️  admission: consumer_info({durable}) failed: {e}")
+                self._pending.pop(durable, None)
+                self._overloaded.pop(durable, None)
+                continue
+
+            self._pending[durable] = pending
+            if pending > limit:
+                if durable not in self._overloaded:
+                    print(f"⚠️  admission: shedding ingest, {durable} pending={pending} > {limit}")
+                self._overloaded[durable] = pending
+            elif self._overloaded.pop(durable, None) is not None:
+                print(f"✅ admission: {durable} pending={pending} back under {limit}")
+
+        # Budgets come from the last interval that ran unthrottled, not from throttled
+        # intervals, which would shrink the budget towards zero
+        if not was_overloaded:
+            self._last_org_counts = self._org_counts
+        self._org_counts = Counter()
+
+    async def _run(self) -> None:
+        while True:
+            await self.refresh()
+            await asyncio.sleep(self._poll_interval)
+
+    def _org_over_share(self, org_id: str, cost: int) -> bool:
+        recent = self._last_org_counts
+        if not recent:
+            return True
+        fair_share = self._overload_budget * sum(recent.values()) / len(recent)
+        return self._org_counts[org_id] + cost > fair_share
+
+    def check(self, org_id: str, cost: int = 1) -> None:
+        """Admits `cost` messages for `org_id` or raises 429."""
+        if self._overloaded and (not self._per_org or self._org_over_share(org_id, cost)):
+            lagging = ", ".join(f"{d} pending={p}" for d, p in sorted(self._overloaded.items()))
+            raise HTTPException(
+                status_code=429,
+                detail=f"Ingest pipeline is lagging ({lagging}); retry later",
+                headers={"Retry-After": str(self._retry_after)},
+            )
+        self._org_counts[org_id] += cost
@@ -0,0 +1,163 @@
+import base64
+import json
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, FrozenSet, Iterable, Optional, Tuple
+
+from nats.js.errors import KeyNotFoundError
+from nats.js.kv import KeyValue
+from prometheus_client import Counter
+
+from app.events import parse_message_clustered
+
+CONNECTIONS_CACHE_LOOKUPS = Counter(
+    "api_connections_cache_lookups_total",
+    "Connections cache lookups by tier and result.",
+    ["tier", "result"],
+)
+
+CacheKey = Tuple[str, str, str]
+
+
+@dataclass
+class _Entry:
+    payload: Dict[str, Any]
+    cluster_ids: FrozenSet[str]
+    created_at: float
+
+
+class ConnectionsCache:
+    """
+    LRU cache of connections responses keyed by (org_id, user_id, variant).
+
+    Entries are not indexed for invalidation. Instead each `message.clustered` event
+    records when its cluster (and its user) last changed, and an entry is only served
+    if it was computed after every cluster it contains and its target user last
+    changed. That makes the same check work for entries read back from the optional
+    shared KV tier, written by other API replicas. Invalidation marks are bounded;
+    when one is dropped, entries older than it are treated as stale.
+    """
+
+    def __init__(
+        self,
+        max_entries: int,
+        ttl: float,
+        kv: Optional[KeyValue] = None,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self._max_entries = max_entries
+        self._ttl = ttl
+        self._kv = kv
+        self._clock = clock
+        self._entries: "OrderedDict[CacheKey, _Entry]" = OrderedDict()
+        self._invalidated: "OrderedDict[Tuple[str, str, str], float]" = OrderedDict()
+        self._max_invalidations = max(4 * max_entries, 1024)
+        # Anything computed before this cache existed can't be checked against events.
+        self._invalidated_floor = clock()
+
+    def now(self) -> float:
+        return self._clock()
+
+    def _last_change(self, mark: Tuple[str, str, str]) -> float:
+        return max(self._invalidated.get(mark, 0.0), self._invalidated_floor)
+
+    def _is_fresh(self, org_id: str, user_id: str, entry: _Entry) -> bool:
+        if self._clock() - entry.created_at >= self._ttl:
+            return False
+        if entry.created_at <= self._last_change(("user", org_id, user_id)):
+            return False
+        return all(
+            entry.created_at > self._last_change(("cluster", org_id, cluster_id))
+            for cluster_id in entry.cluster_ids
+        )
+
+    def _store_local(self, key: CacheKey, entry: _Entry) -> None:
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self._max_entries:
+            self._entries.popitem(last=False)
+
+    @staticmethod
+    def _kv_key(key: CacheKey) -> str:
+        return base64.urlsafe_b64encode(json.dumps(key).encode("utf-8")).decode("ascii")
+
+    async def get(self, org_id: str, user_id: str, variant: str = "") -> Optional[Dict[str, Any]]:
+        key = (org_id, user_id, variant)
+        entry = self._entries.get(key)
+        if entry is not None:
+            if self._is_fresh(org_id, user_id, entry):
+                self._entries.move_to_end(key)
+                CONNECTIONS_CACHE_LOOKUPS.labels(tier="local", result="hit").inc()
+                return entry.payload
+            del self._entries[key]
+        CONNECTIONS_CACHE_LOOKUPS.labels(tier="local", result="miss").inc()
+
+        if self._kv is None:
+            return None
+
+        try:
+            raw = (await self._kv.get(self._kv_key(key))).value
+            stored = json.loads(raw)
+            entry = _Entry(
+                payload=stored["payload"],
+                cluster_ids=frozenset(stored["cluster_ids"]),
+                created_at=float(stored["created_at"]),
+            )
+        except KeyNotFoundError:
+            entry = None
+        except Exception as e:
+            print(f"⚠️  connections cache: shared tier get failed: {e}")
+            entry = None
+
+        if entry is None or not self._is_fresh(org_id, user_id, entry):
+            CONNECTIONS_CACHE_LOOKUPS.labels(tier="shared", result="miss").inc()
+            return None
+
+        self._store_local(key, entry)
+        CONNECTIONS_CACHE_LOOKUPS.labels(tier="shared", result="hit").inc()
+        return entry.payload
+
+    async def put(
+        self,
+        org_id: str,
+        user_id: str,
+        payload: Dict[str, Any],
+        cluster_ids: Iterable[str],
+        computed_at: float,
+        variant: str = "",
+    ) -> None:
+        """`computed_at` must be taken before the query ran, so events that race it win."""
+        key = (org_id, user_id, variant)
+        entry = _Entry(payload=payload, cluster_ids=frozenset(cluster_ids), created_at=computed_at)
+        if not self._is_fresh(org_id, user_id, entry):
+            return
+
+        self._store_local(key, entry)
+        if self._kv is not None:
+            stored = {
+                "payload": entry.payload,
+                "cluster_ids": sorted(entry.cluster_ids),
+                "created_at": entry.created_at,
+            }
+            try:
+                await self._kv.put(self._kv_key(key), json.dumps(stored).encode("utf-8"))
+            except Exception as e:
+                print(f"⚠️  connections cache: shared tier put failed: {e}")
+
+    def invalidate(self, org_id: str, cluster_id: str, user_id: str) -> None:
+        now = self._clock()
+        for mark in (("cluster", org_id, cluster_id), ("user", org_id, user_id)):
+            self._invalidated[mark] = now
+            self._invalidated.move_to_end(mark)
+        while len(self._invalidated) > self._max_invalidations:
+            _, dropped_at = self._invalidated.popitem(last=False)
+            self._invalidated_floor = max(self._invalidated_floor, dropped_at)
+
+    async def handle_clustered(self, msg) -> None:
+        try:
+            evt = parse_message_clustered(msg.data)
+        except Exception as e:
+            print(f"⚠️  connections cache: ignoring unparseable clustered event: {e}")
+            return
+        self.invalidate(evt.org_id, str(evt.cluster_id), evt.user_id)
@@ -1,12 +1,64 @@
-from collections.abc import Generator
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
 
 import psycopg
+from fastapi import Depends
+from prometheus_client import REGISTRY, Histogram
+from prometheus_client.core import GaugeMetricFamily
+from psycopg_pool import ConnectionPool
 
-from app.core.config import NATS_URL, JETSTREAM_STREAM, JETSTREAM_SUBJECTS
+from app.api.admission import AdmissionController
+from app.api.connections_cache import ConnectionsCache
+from app.core.config import (
+    ADMISSION_CLUSTERER_DURABLE,
+    ADMISSION_CLUSTERER_MAX_PENDING,
+    ADMISSION_EMBEDDER_DURABLE,
+    ADMISSION_EMBEDDER_MAX_PENDING,
+    ADMISSION_OVERLOAD_BUDGET,
+    ADMISSION_PER_ORG,
+    ADMISSION_POLL_INTERVAL_SEC,
+    ADMISSION_RETRY_AFTER_SEC,
+    CLUSTERED_SUBJECT_PREFIX,
+    CONNECTIONS_CACHE_KV_BUCKET,
+    CONNECTIONS_CACHE_MAX_ENTRIES,
+    CONNECTIONS_CACHE_TTL_SEC,
+    DB_POOL_MAX_IDLE_SEC,
+    DB_POOL_MAX_SIZE,
+    DB_POOL_MIN_SIZE,
+    DB_POOL_TIMEOUT_SEC,
+    JETSTREAM_PUBLISH_ACK_TIMEOUT_SEC,
+    JETSTREAM_PUBLISH_MAX_IN_FLIGHT,
+    JETSTREAM_STREAM,
+    JETSTREAM_SUBJECTS,
+    NATS_URL,
+)
 from app.core.db import db_conninfo
 from app.core.nats_client import NatsJetStreamPublisher
 
 _publisher: NatsJetStreamPublisher | None = None
+_admission: AdmissionController | None = None
+_db_pool: ConnectionPool | None = None
+_connections_cache: ConnectionsCache | None = None
+_connections_cache_sub = None
+
+DB_POOL_WAIT_SECONDS = Histogram(
+    "api_db_pool_wait_seconds",
+    "Time spent waiting to check a connection out of the API database pool.",
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+
+
+class _DbPoolStatsCollector:
+    # Exposes psycopg_pool's own counters (size, available, waiting, requests_wait_ms, ...)
+    def collect(self):
+        if _db_pool is None:
+            return
+        for key, value in _db_pool.get_stats().items():
+            yield GaugeMetricFamily(f"api_db_pool_{key}", f"psycopg_pool statistic `{key}`.", value=value)
+
+
+REGISTRY.register(_DbPoolStatsCollector())
 
 
 def get_publisher() -> NatsJetStreamPublisher:
@@ -20,6 +72,8 @@ async def init_publisher() -> None:
         nats_url=NATS_URL,
         stream_name=JETSTREAM_STREAM,
         subjects=JETSTREAM_SUBJECTS,
+        max_in_flight=JETSTREAM_PUBLISH_MAX_IN_FLIGHT,
+        ack_timeout=JETSTREAM_PUBLISH_ACK_TIMEOUT_SEC,
     )
     await _publisher.connect()
 
@@ -31,6 +85,104 @@ async def close_publisher() -> None:
         _publisher = None
 
 
-def get_db_conn() -> Generator[psycopg.Connection, None, None]:
-    with psycopg.connect(db_conninfo()) as conn:
+def get_admission() -> AdmissionController | None:
+    return _admission
+
+
+async def init_admission() -> None:
+    global _admission
+    _admission = AdmissionController(
+        publisher=get_publisher(),
+        max_pending={
+            ADMISSION_EMBEDDER_DURABLE: ADMISSION_EMBEDDER_MAX_PENDING,
+            ADMISSION_CLUSTERER_DURABLE: ADMISSION_CLUSTERER_MAX_PENDING,
+        },
+        poll_interval=ADMISSION_POLL_INTERVAL_SEC,
+        retry_after=ADMISSION_RETRY_AFTER_SEC,
+        per_org=ADMISSION_PER_ORG,
+        overload_budget=ADMISSION_OVERLOAD_BUDGET,
+    )
+    await _admission.start()
+
+
+async def close_admission() -> None:
+    global _admission
+    if _admission is not None:
+        await _admission.stop()
+        _admission = None
+
+
+def check_admission(
+    org_id: str,
+    admission: AdmissionController | None = Depends(get_admission),
+) -> None:
+    if admission is not None:
+        admission.check(org_id)
+
+
+def get_connections_cache() -> ConnectionsCache | None:
+    return _connections_cache
+
+
+async def init_connections_cache() -> None:
+    global _connections_cache, _connections_cache_sub
+    if CONNECTIONS_CACHE_MAX_ENTRIES <= 0:
+        return
+
+    pub = get_publisher()
+    kv = None
+    if CONNECTIONS_CACHE_KV_BUCKET:
+        kv = await pub.key_value(CONNECTIONS_CACHE_KV_BUCKET, ttl=CONNECTIONS_CACHE_TTL_SEC)
+
+    cache = ConnectionsCache(
+        max_entries=CONNECTIONS_CACHE_MAX_ENTRIES,
+        ttl=CONNECTIONS_CACHE_TTL_SEC,
+        kv=kv,
+    )
+    _connections_cache_sub = await pub.subscribe(f"{CLUSTERED_SUBJECT_PREFIX}.>", cache.handle_clustered)
+    _connections_cache = cache
+
+
+async def close_connections_cache() -> None:
+    global _connections_cache, _connections_cache_sub
+    if _connections_cache_sub is not None:
+        await _connections_cache_sub.unsubscribe()
+        _connections_cache_sub = None
+    _connections_cache = None
+
+
+def get_db_pool() -> ConnectionPool:
+    assert _db_pool is not None, "Database pool not initialized"
+    return _db_pool
+
+
+def init_db_pool() -> None:
+    global _db_pool
+    _db_pool = ConnectionPool(
+        db_conninfo(),
+        min_size=DB_POOL_MIN_SIZE,
+        max_size=DB_POOL_MAX_SIZE,
+        timeout=DB_POOL_TIMEOUT_SEC,
+        max_idle=DB_POOL_MAX_IDLE_SEC,
+        check=ConnectionPool.check_connection,
+        name="api",
+        open=False,
+    )
+    # Don't block startup on Postgres; the pool fills in the background.
+    _db_pool.open(wait=False)
+
+
+def close_db_pool() -> None:
+    global _db_pool
+    if _db_pool is not None:
+        _db_pool.close()
+        _db_pool = None
+
+
+@contextmanager
+def pooled_connection() -> Iterator[psycopg.Connection]:
+    # Commits on success and rolls back on error, like psycopg.connect() as a context manager.
+    start = time.perf_counter()
+    with get_db_pool().connection() as conn:
+        DB_POOL_WAIT_SECONDS.observe(time.perf_counter() - start)
         yield conn
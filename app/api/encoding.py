@@ -0,0 +1,61 @@
+from typing import Any, Dict, Tuple
+
+import msgpack
+import orjson
+from fastapi import Request
+from fastapi.responses import Response
+
+MSGPACK_MEDIA_TYPES = ("application/msgpack", "application/x-msgpack")
+
+# OpenAPI `responses` entry advertising the alternative encoding
+MSGPACK_RESPONSE_DOC = {200: {"content": {"application/msgpack": {}}}}
+
+
+def _quality(params: str) -> float:
+    for param in params.split(";"):
+        key, _, value = param.strip().partition("=")
+        if key.strip().lower() == "q":
+            try:
+                return float(value)
+            except ValueError:
+                return 0.0
+    return 1.0
+
+
+def _accept_qualities(accept: str) -> Dict[str, float]:
+    qualities: Dict[str, float] = {}
+    for part in accept.split(","):
+        media_type, _, params = part.partition(";")
+        media_type = media_type.strip().lower()
+        if media_type:
+            qualities[media_type] = max(qualities.get(media_type, 0.0), _quality(params))
+    return qualities
+
+
+def _quality_for(qualities: Dict[str, float], media_types: Tuple[str, ...]) -> float:
+    # The most specific matching range decides: exact type, then application/*, then */*
+    exact = [qualities[m] for m in media_types if m in qualities]
+    if exact:
+        return max(exact)
+    for media_range in ("application/*", "*/*"):
+        if media_range in qualities:
+            return qualities[media_range]
+    return 0.0
+
+
+def wants_msgpack(request: Request) -> bool:
+    """True only when the client prefers msgpack strictly over JSON; ties go to JSON."""
+    qualities = _accept_qualities(request.headers.get("accept", ""))
+    msgpack_q = _quality_for(qualities, MSGPACK_MEDIA_TYPES)
+    return msgpack_q > 0.0 and msgpack_q > _quality_for(qualities, ("application/json",))
+
+
+def encoded_response(request: Request, payload: Any) -> Response:
+    """
+    Encodes a plain dict/list payload as msgpack when the client asks for it, else as
+    JSON via orjson. Payloads must already be JSON-safe (str ids, no pydantic models),
+    which skips FastAPI's response_model validation and per-row model construction.
+    """
+    if wants_msgpack(request):
+        return Response(msgpack.packb(payload, use_bin_type=True), media_type="application/msgpack")
+    return Response(orjson.dumps(payload), media_type="application/json")
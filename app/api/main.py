@@ -1,6 +1,18 @@
-from fastapi import FastAPI
-
-from app.api.dependencies import close_publisher, init_publisher
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+from prometheus_client import make_asgi_app
+from psycopg_pool import PoolTimeout
+
+from app.api.dependencies import (
+    close_admission,
+    close_connections_cache,
+    close_db_pool,
+    close_publisher,
+    init_admission,
+    init_connections_cache,
+    init_db_pool,
+    init_publisher,
+)
 
 
 def create_app() -> FastAPI:
@@ -13,6 +25,12 @@ def create_app() -> FastAPI:
     async def health():
         return {"status": "ok"}
 
+    app.mount("/metrics", make_asgi_app())
+
+    @app.exception_handler(PoolTimeout)
+    async def db_pool_timeout(request: Request, exc: PoolTimeout):
+        return JSONResponse(status_code=503, content={"detail": f"Database pool exhausted: {exc}"})
+
     # Routes
     from app.api.routes.messages import router as messages_router
     from app.api.routes.centroids import router as centroids_router
@@ -21,11 +39,17 @@ def create_app() -> FastAPI:
 
     @app.on_event("startup")
     async def startup():
+        init_db_pool()
         await init_publisher()
+        await init_admission()
+        await init_connections_cache()
 
     @app.on_event("shutdown")
     async def shutdown():
+        await close_connections_cache()
+        await close_admission()
         await close_publisher()
+        close_db_pool()
 
     return app
 
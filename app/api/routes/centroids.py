@@ -1,11 +1,18 @@
-from typing import List
+import base64
+import binascii
+import json
+from typing import Any, Dict, List, Optional, Tuple
 from uuid import UUID
 
-import psycopg
-from fastapi import APIRouter, Depends, Path
-from pydantic import BaseModel, Field
+from fastapi import APIRouter, Depends, HTTPException, Path, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import Response
+from pydantic import BaseModel, ConfigDict, Field
 
-from app.api.dependencies import get_db_conn
+from app.api.connections_cache import ConnectionsCache
+from app.api.dependencies import get_connections_cache, pooled_connection
+from app.api.encoding import MSGPACK_RESPONSE_DOC, encoded_response
+from app.core.config import SIMILAR_USERS_EF_SEARCH
 
 router = APIRouter(prefix="/v1/orgs", tags=["connections"])
 
@@ -28,7 +35,8 @@ class UserCentroidResult(BaseModel):
     cluster_id: UUID = Field(description="Active cluster id that includes the target user.")
     users: List[RankedUser] = Field(
         description=(
-            "Users in this cluster ranked by `distance` ascending; ties break by `user_id` ascending."
+            "Users in this cluster ranked by `distance` ascending; ties break by `user_id` ascending. "
+            "At most `limit_per_cluster` users when that parameter is set."
         )
     )
 
@@ -38,9 +46,245 @@ class UserCentroidsResponse(BaseModel):
     user_id: str = Field(description="Target user id used for the ranking comparison.")
     centroids: List[UserCentroidResult] = Field(
         description=(
-            "One result per active cluster containing the target user, with in-cluster user rankings."
+            "One result per active cluster containing the target user, with in-cluster user rankings, "
+            "ordered by the target's `participation_score` in the cluster (descending), then `cluster_id`."
         )
     )
+    next_cursor: Optional[str] = Field(
+        default=None,
+        description="Opaque cursor for the next page of clusters when `max_clusters` truncated the result.",
+    )
+
+
+class SimilarUser(BaseModel):
+    user_id: str
+    distance: float = Field(
+        description=(
+            "pgvector cosine distance (`<=>`) between this user's profile vector (mean of all their "
+            "message embeddings) and the target user's. `0.0` means most similar."
+        )
+    )
+    message_count: int = Field(description="Number of messages contributing to this user's profile vector.")
+
+
+class SimilarUsersResponse(BaseModel):
+    model_config = ConfigDict(protected_namespaces=())
+
+    org_id: str
+    user_id: str = Field(description="Target user id.")
+    model_version: str = Field(description="Embedding model of the compared profile vectors.")
+    users: List[SimilarUser] = Field(description="Closest users across the org, by `distance` ascending.")
+
+
+class ConnectionsBatchRequest(BaseModel):
+    user_ids: List[str] = Field(min_length=1, max_length=1_000, description="Target user ids.")
+    limit_per_cluster: Optional[int] = Field(
+        default=None, ge=1, le=10_000, description="Keep only the closest N users in each cluster."
+    )
+
+
+class ConnectionsBatchResponse(BaseModel):
+    org_id: str
+    results: List[UserCentroidsResponse] = Field(
+        description="One entry per distinct requested user id, in request order."
+    )
+
+
+def _encode_cursor(participation_score: float, cluster_id: UUID) -> str:
+    raw = json.dumps([participation_score, str(cluster_id)]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def _decode_cursor(cursor: str) -> Tuple[float, UUID]:
+    try:
+        score, cluster_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return float(score), UUID(cluster_id)
+    except (binascii.Error, UnicodeError, ValueError, TypeError, AttributeError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid cursor: {e}")
+
+
+def _rank_user_connections(
+    org_id: str,
+    user_id: str,
+    limit_per_cluster: Optional[int] = None,
+    max_clusters: Optional[int] = None,
+    after: Optional[Tuple[float, UUID]] = None,
+) -> Dict[str, Any]:
+    """
+    Returns a `UserCentroidsResponse`-shaped dict built straight from the cursor rows,
+    without a pydantic model per ranked user.
+    """
+    after_score, after_cluster = after if after is not None else (None, None)
+    centroids: List[Dict[str, Any]] = []
+    scores: List[float] = []
+    current_cluster = None
+    current_users: List[Dict[str, Any]] = []
+
+    with pooled_connection() as conn, conn.cursor() as cur:
+        # Clusters are paged by the target's participation (keyset on score DESC, cluster_id ASC)
+        # and each cluster's ranking stops after `limit_per_cluster` users. LIMIT NULL is LIMIT ALL.
+        cur.execute(
+            """
+            WITH target_clusters AS (
+              SELECT uc.cluster_id, uc.participation_score
+              FROM user_cluster uc
+              JOIN clusters c
+                ON c.org_id = uc.org_id
+               AND c.cluster_id = uc.cluster_id
+              WHERE uc.org_id = %(org_id)s
+                AND uc.user_id = %(user_id)s
+                AND c.is_active = TRUE
+                AND (
+                  %(after_score)s::real IS NULL
+                  OR uc.participation_score < %(after_score)s::real
+                  OR (uc.participation_score = %(after_score)s::real AND uc.cluster_id > %(after_cluster)s::uuid)
+                )
+              ORDER BY uc.participation_score DESC, uc.cluster_id ASC
+              LIMIT %(cluster_limit)s
+            ),
+            target_user_vectors AS (
+              SELECT tc.cluster_id, tc.participation_score, ucv.embedding_sum AS target_vec
+              FROM target_clusters tc
+              JOIN user_cluster_vectors ucv
+                ON ucv.org_id = %(org_id)s
+               AND ucv.cluster_id = tc.cluster_id
+               AND ucv.user_id = %(user_id)s
+            )
+            SELECT
+              tuv.cluster_id,
+              tuv.participation_score,
+              ranked.user_id,
+              ranked.distance,
+              ranked.message_count
+            FROM target_user_vectors tuv
+            CROSS JOIN LATERAL (
+              SELECT
+                ucv.user_id,
+                (ucv.embedding_sum <=> tuv.target_vec) AS distance,
+                ucv.message_count
+              FROM user_cluster_vectors ucv
+              WHERE ucv.org_id = %(org_id)s
+                AND ucv.cluster_id = tuv.cluster_id
+              ORDER BY distance ASC, ucv.user_id ASC
+              LIMIT %(limit_per_cluster)s
+            ) ranked
+            ORDER BY tuv.participation_score DESC, tuv.cluster_id ASC, ranked.distance ASC, ranked.user_id ASC
+            """,
+            {
+                "org_id": org_id,
+                "user_id": user_id,
+                "after_score": after_score,
+                "after_cluster": str(after_cluster) if after_cluster is not None else None,
+                # one extra cluster tells us whether there is another page
+                "cluster_limit": max_clusters + 1 if max_clusters is not None else None,
+                "limit_per_cluster": limit_per_cluster,
+            },
+        )
+        for cluster_id, participation_score, ranked_user_id, distance, message_count in cur:
+            if cluster_id != current_cluster:
+                current_cluster = cluster_id
+                current_users = []
+                centroids.append({"cluster_id": str(cluster_id), "users": current_users})
+                scores.append(float(participation_score))
+
+            current_users.append(
+                {
+                    "user_id": ranked_user_id,
+                    "distance": float(distance),
+                    "message_count": int(message_count),
+                }
+            )
+
+    next_cursor = None
+    if max_clusters is not None and len(centroids) > max_clusters:
+        del centroids[max_clusters:]
+        next_cursor = _encode_cursor(scores[max_clusters - 1], UUID(centroids[-1]["cluster_id"]))
+
+    return {"org_id": org_id, "user_id": user_id, "centroids": centroids, "next_cursor": next_cursor}
+
+
+def _rank_many_user_connections(
+    org_id: str,
+    user_ids: List[str],
+    limit_per_cluster: Optional[int] = None,
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Rankings for several targets from one query. Each (target, cluster) pair ranks that
+    cluster's user vectors through the (org_id, cluster_id, user_id) primary key.
+    Returns payloads shaped like `_rank_user_connections`, keyed by target user id.
+    """
+    results: Dict[str, Dict[str, Any]] = {
+        target: {"org_id": org_id, "user_id": target, "centroids": [], "next_cursor": None}
+        for target in user_ids
+    }
+    current_key = None
+    current_users: List[Dict[str, Any]] = []
+
+    with pooled_connection() as conn, conn.cursor() as cur:
+        cur.execute(
+            """
+            WITH target_clusters AS (
+              SELECT uc.user_id AS target_user_id, uc.cluster_id, uc.participation_score
+              FROM user_cluster uc
+              JOIN clusters c
+                ON c.org_id = uc.org_id
+               AND c.cluster_id = uc.cluster_id
+              WHERE uc.org_id = %(org_id)s
+                AND uc.user_id = ANY(%(user_ids)s)
+                AND c.is_active = TRUE
+            ),
+            target_user_vectors AS (
+              SELECT tc.target_user_id, tc.cluster_id, tc.participation_score, ucv.embedding_sum AS target_vec
+              FROM target_clusters tc
+              JOIN user_cluster_vectors ucv
+                ON ucv.org_id = %(org_id)s
+               AND ucv.cluster_id = tc.cluster_id
+               AND ucv.user_id = tc.target_user_id
+            )
+            SELECT
+              tuv.target_user_id,
+              tuv.cluster_id,
+              ranked.user_id,
+              ranked.distance,
+              ranked.message_count
+            FROM target_user_vectors tuv
+            CROSS JOIN LATERAL (
+              SELECT
+                ucv.user_id,
+                (ucv.embedding_sum <=> tuv.target_vec) AS distance,
+                ucv.message_count
+              FROM user_cluster_vectors ucv
+              WHERE ucv.org_id = %(org_id)s
+                AND ucv.cluster_id = tuv.cluster_id
+              ORDER BY distance ASC, ucv.user_id ASC
+              LIMIT %(limit_per_cluster)s
+            ) ranked
+            ORDER BY
+              tuv.target_user_id,
+              tuv.participation_score DESC,
+              tuv.cluster_id ASC,
+              ranked.distance ASC,
+              ranked.user_id ASC
+            """,
+            {"org_id": org_id, "user_ids": list(user_ids), "limit_per_cluster": limit_per_cluster},
+        )
+        for target_user_id, cluster_id, ranked_user_id, distance, message_count in cur:
+            if (target_user_id, cluster_id) != current_key:
+                current_key = (target_user_id, cluster_id)
+                current_users = []
+                results[target_user_id]["centroids"].append(
+                    {"cluster_id": str(cluster_id), "users": current_users}
+                )
+
+            current_users.append(
+                {
+                    "user_id": ranked_user_id,
+                    "distance": float(distance),
+                    "message_count": int(message_count),
+                }
+            )
+
+    return results
 
 
 @router.get(
@@ -48,94 +292,173 @@ class UserCentroidsResponse(BaseModel):
     summary="Rank users by distance to a target user within each shared active cluster",
     description=(
         "List other users in order of semantic connection to the target user."
-        "For each active cluster that contains the target user, this endpoint computes one vector per "
-        "user as `AVG(message_embeddings.embedding)` over messages assigned to that cluster. "
+        "For each active cluster that contains the target user, each user is represented by the "
+        "sum of their message embeddings assigned to that cluster, maintained incrementally by the "
+        "clusterer (same direction, and so the same cosine distance, as the mean). "
         "It then ranks users by pgvector cosine distance (`<=>`) to "
-        "the target user's vector in the same cluster."
+        "the target user's vector in the same cluster. "
+        "Clusters come in order of the target's participation; `max_clusters` pages them with "
+        "`next_cursor`, and `limit_per_cluster` keeps only the closest users in each cluster. "
+        "Responses are cached per user and invalidated as soon as any of the user's clusters changes."
     ),
     response_description=(
         "Per-cluster user rankings where `distance` is cosine distance to the target user (ascending)."
     ),
     response_model=UserCentroidsResponse,
+    responses=MSGPACK_RESPONSE_DOC,
 )
-def get_user_centroids(
+async def get_user_centroids(
+    request: Request,
     org_id: str = Path(description="Organization id."),
     user_id: str = Path(description="Target user id for per-cluster rankings."),
-    conn: psycopg.Connection = Depends(get_db_conn),
-) -> UserCentroidsResponse:
-    with conn.cursor() as cur:
+    limit_per_cluster: Optional[int] = Query(
+        default=None, ge=1, le=10_000, description="Keep only the closest N users in each cluster."
+    ),
+    max_clusters: Optional[int] = Query(
+        default=None, ge=1, le=1_000, description="Return at most N clusters per page."
+    ),
+    cursor: Optional[str] = Query(default=None, description="`next_cursor` from the previous page."),
+    cache: ConnectionsCache | None = Depends(get_connections_cache),
+) -> Response:
+    after = _decode_cursor(cursor) if cursor else None
+    args = (org_id, user_id, limit_per_cluster, max_clusters, after)
+    if cache is None:
+        return encoded_response(request, await run_in_threadpool(_rank_user_connections, *args))
+
+    variant = f"{limit_per_cluster}:{max_clusters}:{cursor or ''}"
+    cached = await cache.get(org_id, user_id, variant)
+    if cached is not None:
+        return encoded_response(request, cached)
+
+    computed_at = cache.now()
+    payload = await run_in_threadpool(_rank_user_connections, *args)
+    await cache.put(
+        org_id,
+        user_id,
+        payload=payload,
+        cluster_ids=(c["cluster_id"] for c in payload["centroids"]),
+        computed_at=computed_at,
+        variant=variant,
+    )
+    return encoded_response(request, payload)
+
+
+def _nearest_users(org_id: str, user_id: str, limit: int) -> Dict[str, Any]:
+    with pooled_connection() as conn, conn.cursor() as cur:
         cur.execute(
             """
-            WITH target_clusters AS (
-              SELECT uc.cluster_id, c.model_version
-              FROM user_cluster uc
-              JOIN clusters c
-                ON c.org_id = uc.org_id
-               AND c.cluster_id = uc.cluster_id
-              WHERE uc.org_id = %s
-                AND uc.user_id = %s
-                AND c.is_active = TRUE
-            ),
-            user_cluster_vectors AS (
-              SELECT
-                tc.cluster_id,
-                m.user_id,
-                AVG(me.embedding)::vector AS user_vec,
-                COUNT(*)::bigint AS message_count
-              FROM target_clusters tc
-              JOIN message_cluster mc
-                ON mc.org_id = %s
-               AND mc.cluster_id = tc.cluster_id
-              JOIN messages m
-                ON m.org_id = mc.org_id
-               AND m.message_id = mc.message_id
-              JOIN message_embeddings me
-                ON me.org_id = mc.org_id
-               AND me.message_id = mc.message_id
-               AND me.model_version = tc.model_version
-              GROUP BY tc.cluster_id, m.user_id
-            ),
-            target_user_vectors AS (
-              SELECT cluster_id, user_vec AS target_vec
-              FROM user_cluster_vectors
-              WHERE user_id = %s
-            )
-            SELECT
-              ucv.cluster_id,
-              ucv.user_id,
-              (ucv.user_vec <=> tuv.target_vec) AS distance,
-              ucv.message_count
-            FROM user_cluster_vectors ucv
-            JOIN target_user_vectors tuv
-              ON tuv.cluster_id = ucv.cluster_id
-            ORDER BY ucv.cluster_id, distance ASC, ucv.user_id ASC
+            SELECT model_version, embedding_sum::text
+            FROM user_profile_vectors
+            WHERE org_id = %s
+              AND user_id = %s
+            ORDER BY updated_at DESC
+            LIMIT 1
             """,
-            (org_id, user_id, org_id, user_id),
+            (org_id, user_id),
         )
-        rows = cur.fetchall()
-
-    centroids: List[UserCentroidResult] = []
-    current_cluster: UUID | None = None
-    current_users: List[RankedUser] = []
-
-    for cluster_id, ranked_user_id, distance, message_count in rows:
-        parsed_cluster_id = UUID(str(cluster_id))
-        if current_cluster is None:
-            current_cluster = parsed_cluster_id
-        if parsed_cluster_id != current_cluster:
-            centroids.append(UserCentroidResult(cluster_id=current_cluster, users=current_users))
-            current_cluster = parsed_cluster_id
-            current_users = []
-
-        current_users.append(
-            RankedUser(
-                user_id=ranked_user_id,
-                distance=float(distance),
-                message_count=int(message_count),
+        target = cur.fetchone()
+        if target is None:
+            raise HTTPException(status_code=404, detail=f"No profile vector for user {user_id}")
+        model_version, target_vec = target
+
+        # Iterative scans keep pulling HNSW candidates until enough rows survive the
+        # org filter; relaxed order is re-sorted exactly by the outer query.
+        cur.execute("SELECT set_config('hnsw.ef_search', %s, true)", (str(SIMILAR_USERS_EF_SEARCH),))
+        cur.execute("SELECT set_config('hnsw.iterative_scan', 'relaxed_order', true)")
+        cur.execute(
+            """
+            WITH candidates AS MATERIALIZED (
+              SELECT user_id, (embedding_sum <=> %(target)s::vector) AS distance, message_count
+              FROM user_profile_vectors
+              WHERE org_id = %(org_id)s
+                AND model_version = %(model_version)s
+                AND user_id <> %(user_id)s
+              ORDER BY embedding_sum <=> %(target)s::vector
+              LIMIT %(limit)s
             )
+            SELECT user_id, distance, message_count
+            FROM candidates
+            ORDER BY distance ASC, user_id ASC
+            """,
+            {
+                "target": target_vec,
+                "org_id": org_id,
+                "model_version": model_version,
+                "user_id": user_id,
+                "limit": limit,
+            },
         )
+        users = [
+            {"user_id": ranked_user_id, "distance": float(distance), "message_count": int(message_count)}
+            for ranked_user_id, distance, message_count in cur
+        ]
+
+    return {"org_id": org_id, "user_id": user_id, "model_version": model_version, "users": users}
+
+
+@router.get(
+    "/{org_id}/users/{user_id}/similar",
+    summary="Find the users most similar to a target user across the whole org",
+    description=(
+        "Ranks every other user in the org by cosine distance between profile vectors, where a "
+        "user's profile is the mean of all their message embeddings regardless of cluster. "
+        "Profiles are maintained incrementally by the clusterer and searched with an HNSW index, "
+        "so the lookup stays sublinear in the number of users. Results are approximate nearest "
+        "neighbours."
+    ),
+    response_model=SimilarUsersResponse,
+    responses={**MSGPACK_RESPONSE_DOC, 404: {"description": "The target user has no messages yet."}},
+)
+async def get_similar_users(
+    request: Request,
+    org_id: str = Path(description="Organization id."),
+    user_id: str = Path(description="Target user id."),
+    limit: int = Query(default=20, ge=1, le=1_000, description="Number of users to return."),
+) -> Response:
+    return encoded_response(request, await run_in_threadpool(_nearest_users, org_id, user_id, limit))
+
+
+@router.post(
+    "/{org_id}/connections:batch",
+    summary="Rank connections for many target users in one call",
+    description=(
+        "Batch form of `/users/{user_id}/connections` (first page, all clusters). Rankings for "
+        "every target are computed by one set-based query that reads each shared cluster's user "
+        "vectors once; targets already in the connections cache are served from it."
+    ),
+    response_model=ConnectionsBatchResponse,
+    responses=MSGPACK_RESPONSE_DOC,
+)
+async def get_user_centroids_batch(
+    request: Request,
+    body: ConnectionsBatchRequest,
+    org_id: str = Path(description="Organization id."),
+    cache: ConnectionsCache | None = Depends(get_connections_cache),
+) -> Response:
+    user_ids = list(dict.fromkeys(body.user_ids))
+    variant = f"{body.limit_per_cluster}:None:"
+    payloads: Dict[str, Dict[str, Any]] = {}
+
+    if cache is not None:
+        for target in user_ids:
+            cached = await cache.get(org_id, target, variant)
+            if cached is not None:
+                payloads[target] = cached
 
-    if current_cluster is not None:
-        centroids.append(UserCentroidResult(cluster_id=current_cluster, users=current_users))
+    misses = [target for target in user_ids if target not in payloads]
+    if misses:
+        computed_at = cache.now() if cache is not None else 0.0
+        computed = await run_in_threadpool(_rank_many_user_connections, org_id, misses, body.limit_per_cluster)
+        payloads.update(computed)
+        if cache is not None:
+            for target, payload in computed.items():
+                await cache.put(
+                    org_id,
+                    target,
+                    payload=payload,
+                    cluster_ids=(c["cluster_id"] for c in payload["centroids"]),
+                    computed_at=computed_at,
+                    variant=variant,
+                )
 
-    return UserCentroidsResponse(org_id=org_id, user_id=user_id, centroids=centroids)
+    return encoded_response(request, {"org_id": org_id, "results": [payloads[t] for t in user_ids]})
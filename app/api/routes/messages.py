@@ -1,16 +1,22 @@
-
+import asyncio
 from datetime import datetime
-from typing import Any, Dict, Optional
+from typing import Any, AsyncIterator, Dict, List, Literal, Optional, Set, Tuple
 from uuid import UUID, uuid4
 
-from fastapi import APIRouter, Depends, HTTPException
-from pydantic import BaseModel, Field
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from pydantic import BaseModel, Field, ValidationError
 
+from app.core.config import INGEST_ACK_MODE, INGEST_STREAM_MAX_LINE_BYTES
 from app.events import MessageCreatedEvent, MessagePayload, to_json_bytes
-from app.api.dependencies import get_publisher
+from app.api.admission import AdmissionController
+from app.api.dependencies import check_admission, get_admission, get_publisher
 
 router = APIRouter(prefix="/v1/orgs", tags=["messages"])
 
+MAX_BATCH_SIZE = 1000
+# Streamed lines can be large; reported errors never echo them back whole
+MAX_STREAM_ERROR_CHARS = 500
+
 
 class IngestMessageRequest(BaseModel):
     message_id: Optional[UUID] = Field(default=None, description="Optional client-supplied id for idempotency.")
@@ -22,29 +28,85 @@ class IngestMessageRequest(BaseModel):
 
 
 class IngestMessageResponse(BaseModel):
-    status: str = "accepted"
+    status: Literal["accepted", "enqueued", "duplicate"] = "accepted"
     event_id: UUID
     org_id: str
     message_id: UUID
     subject: str
     stream: str
-    seq: int
+    seq: Optional[int] = Field(
+        default=None,
+        description="JetStream sequence; null when `status` is `enqueued` and the PubAck was not awaited.",
+    )
 
 
-@router.post("/{org_id}/messages", status_code=202, response_model=IngestMessageResponse)
-async def ingest_message(
-    org_id: str,
-    body: IngestMessageRequest,
-    pub=Depends(get_publisher),
-) -> IngestMessageResponse:
-    event_id = uuid4()
-    message_id = body.message_id or uuid4()
+class IngestBatchRequest(BaseModel):
+    messages: List[IngestMessageRequest] = Field(min_length=1, max_length=MAX_BATCH_SIZE)
+
+
+class IngestBatchItemResult(BaseModel):
+    index: int = Field(description="Position of the message in the request batch.")
+    status: Literal["accepted", "duplicate", "failed"]
+    event_id: UUID
+    message_id: UUID
+    seq: Optional[int] = Field(default=None, description="JetStream sequence when accepted.")
+    error: Optional[str] = Field(default=None, description="Publish error when failed.")
+
+
+class IngestBatchResponse(BaseModel):
+    org_id: str
+    subject: str
+    stream: str
+    accepted: int
+    failed: int
+    results: List[IngestBatchItemResult]
+
 
-    evt = MessageCreatedEvent(
-        event_id=event_id,
+class IngestStreamError(BaseModel):
+    line: int = Field(description="1-based line number in the NDJSON body.")
+    error: str
+
+
+class IngestStreamResponse(BaseModel):
+    org_id: str
+    subject: str
+    stream: str
+    received: int = Field(description="Non-empty lines read from the body.")
+    accepted: int
+    failed: int
+    errors: List[IngestStreamError] = Field(description="The first `max_errors` failures, in line order.")
+    stopped_at_line: Optional[int] = Field(
+        default=None,
+        description="Set when ingest was shed mid-upload: this line and the rest of the body were not read; "
+        "resend them after `retry_after` seconds.",
+    )
+    retry_after: Optional[int] = None
+
+
+def _log_enqueued_ack(subject: str, event_id: UUID, ack_future: "asyncio.Future[Any]") -> None:
+    if ack_future.cancelled():
+        print(f"❌ Enqueued publish of event {event_id} to {subject} was cancelled")
+    elif ack_future.exception() is not None:
+        print(f"❌ Enqueued publish of event {event_id} to {subject} failed: {ack_future.exception()}")
+
+
+def _dedup_headers(evt: MessageCreatedEvent, body: IngestMessageRequest) -> Optional[Dict[str, str]]:
+    # Only client-supplied ids identify a retry; generated ids are unique anyway.
+    if body.message_id is None:
+        return None
+    return {"Nats-Msg-Id": f"{evt.org_id}.{body.message_id}"}
+
+
+def _ack_status(ack: Any) -> str:
+    return "duplicate" if getattr(ack, "duplicate", False) else "accepted"
+
+
+def _message_created_event(org_id: str, body: IngestMessageRequest) -> MessageCreatedEvent:
+    return MessageCreatedEvent(
+        event_id=uuid4(),
         org_id=org_id,
         message=MessagePayload(
-            message_id=message_id,
+            message_id=body.message_id or uuid4(),
             user_id=body.user_id,
             ts=body.ts,
             source_type=body.source_type,
@@ -53,15 +115,43 @@ async def ingest_message(
         ),
     )
 
+
+@router.post(
+    "/{org_id}/messages",
+    status_code=202,
+    response_model=IngestMessageResponse,
+    dependencies=[Depends(check_admission)],
+)
+async def ingest_message(
+    org_id: str,
+    body: IngestMessageRequest,
+    pub=Depends(get_publisher),
+) -> IngestMessageResponse:
+    evt = _message_created_event(org_id, body)
+
     subject = f"messages.{org_id}"  # per your rename
     try:
-        ack = await pub.publish(subject, to_json_bytes(evt))
+        if INGEST_ACK_MODE == "enqueue":
+            ack_future = await pub.publish_async(subject, to_json_bytes(evt), _dedup_headers(evt, body))
+            ack_future.add_done_callback(lambda f: _log_enqueued_ack(subject, evt.event_id, f))
+
+            return IngestMessageResponse(
+                status="enqueued",
+                event_id=evt.event_id,
+                org_id=org_id,
+                message_id=evt.message.message_id,
+                subject=subject,
+                stream=pub.stream_name,
+            )
+
+        ack = await pub.publish(subject, to_json_bytes(evt), _dedup_headers(evt, body))
         print(f"Published message.created event to {subject} with ack {ack}")
         
         return IngestMessageResponse(
-            event_id=event_id,
+            status=_ack_status(ack),
+            event_id=evt.event_id,
             org_id=org_id,
-            message_id=message_id,
+            message_id=evt.message.message_id,
             subject=subject,
             stream=getattr(ack, "stream", pub.stream_name),
             seq=int(getattr(ack, "seq", 0)),
@@ -69,3 +159,211 @@ async def ingest_message(
     except Exception as e:
         raise HTTPException(status_code=503, detail=f"JetStream publish failed: {e}")
 
+
+@router.post(
+    "/{org_id}/messages:batch",
+    status_code=202,
+    response_model=IngestBatchResponse,
+)
+async def ingest_message_batch(
+    org_id: str,
+    body: IngestBatchRequest,
+    pub=Depends(get_publisher),
+    admission: Optional[AdmissionController] = Depends(get_admission),
+) -> IngestBatchResponse:
+    if admission is not None:
+        admission.check(org_id, cost=len(body.messages))
+
+    subject = f"messages.{org_id}"
+    events = [_message_created_event(org_id, item) for item in body.messages]
+
+    # Pipeline the publishes so the batch costs roughly one PubAck round trip
+    # rather than one per message.
+    acks = await pub.publish_many(
+        (subject, to_json_bytes(evt), _dedup_headers(evt, item))
+        for evt, item in zip(events, body.messages)
+    )
+
+    results: List[IngestBatchItemResult] = []
+    for index, (evt, ack) in enumerate(zip(events, acks)):
+        if isinstance(ack, BaseException):
+            results.append(
+                IngestBatchItemResult(
+                    index=index,
+                    status="failed",
+                    event_id=evt.event_id,
+                    message_id=evt.message.message_id,
+                    error=f"JetStream publish failed: {ack}",
+                )
+            )
+        else:
+            results.append(
+                IngestBatchItemResult(
+                    index=index,
+                    status=_ack_status(ack),
+                    event_id=evt.event_id,
+                    message_id=evt.message.message_id,
+                    seq=int(getattr(ack, "seq", 0)),
+                )
+            )
+
+    accepted = sum(1 for r in results if r.status != "failed")
+    print(f"Published {accepted}/{len(results)} message.created events to {subject}")
+
+    return IngestBatchResponse(
+        org_id=org_id,
+        subject=subject,
+        stream=pub.stream_name,
+        accepted=accepted,
+        failed=len(results) - accepted,
+        results=results,
+    )
+
+
+async def _ndjson_lines(
+    chunks: AsyncIterator[bytes],
+    max_line_bytes: int,
+) -> AsyncIterator[Tuple[int, Optional[bytes]]]:
+    """
+    Yields (line_no, line) for each non-empty line as chunks arrive.
+    `line` is None when the line exceeds `max_line_bytes`; the rest of it is skipped.
+    """
+    buf = bytearray()
+    line_no = 0
+    oversized = False
+
+    async for chunk in chunks:
+        start = 0
+        while True:
+            nl = chunk.find(b"\n", start)
+            if nl < 0:
+                if not oversized:
+                    buf.extend(chunk[start:])
+                    if len(buf) > max_line_bytes:
+                        oversized = True
+                        buf.clear()
+                break
+
+            line_no += 1
+            if oversized:
+                yield line_no, None
+            else:
+                buf.extend(chunk[start:nl])
+                if len(buf) > max_line_bytes:
+                    yield line_no, None
+                elif buf.strip():
+                    yield line_no, bytes(buf)
+            buf.clear()
+            oversized = False
+            start = nl + 1
+
+    if oversized:
+        yield line_no + 1, None
+    elif buf.strip():
+        yield line_no + 1, bytes(buf)
+
+
+@router.post(
+    "/{org_id}/messages:stream",
+    status_code=202,
+    response_model=IngestStreamResponse,
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {"application/x-ndjson": {"schema": IngestMessageRequest.model_json_schema()}},
+        }
+    },
+)
+async def ingest_message_stream(
+    org_id: str,
+    request: Request,
+    max_errors: int = Query(default=100, ge=0, le=10_000),
+    pub=Depends(get_publisher),
+    admission: Optional[AdmissionController] = Depends(get_admission),
+) -> IngestStreamResponse:
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    if content_type != "application/x-ndjson":
+        raise HTTPException(status_code=415, detail="Expected Content-Type: application/x-ndjson")
+    if admission is not None:
+        # Refuse the upload outright if the org is already being shed; lines are charged below
+        admission.check(org_id, cost=0)
+
+    subject = f"messages.{org_id}"
+    received = 0
+    accepted = 0
+    errors: List[IngestStreamError] = []
+    failed_count = 0
+    stopped_at_line: Optional[int] = None
+    retry_after: Optional[int] = None
+    pending: Set["asyncio.Future[Any]"] = set()
+
+    def record_error(line_no: int, error: str) -> None:
+        nonlocal failed_count
+        failed_count += 1
+        if len(error) > MAX_STREAM_ERROR_CHARS:
+            error = error[: MAX_STREAM_ERROR_CHARS - 3] + "..."
+        errors.append(IngestStreamError(line=line_no, error=error))
+        # Publish failures can complete out of order; keep the earliest lines.
+        if len(errors) > max_errors:
+            errors.sort(key=lambda e: e.line)
+            errors.pop()
+
+    def on_ack(line_no: int, ack_future: "asyncio.Future[Any]") -> None:
+        nonlocal accepted
+        pending.discard(ack_future)
+        if ack_future.cancelled() or ack_future.exception() is not None:
+            cause = "cancelled" if ack_future.cancelled() else ack_future.exception()
+            record_error(line_no, f"JetStream publish failed: {cause}")
+        else:
+            accepted += 1
+
+    # Lines are published while the body is still arriving. The publisher's in-flight
+    # window bounds memory and stops reading the upload when JetStream falls behind.
+    async for line_no, line in _ndjson_lines(request.stream(), INGEST_STREAM_MAX_LINE_BYTES):
+        if admission is not None:
+            # Charged per line, so a long upload counts against the org's budget like a batch
+            try:
+                admission.check(org_id)
+            except HTTPException as e:
+                stopped_at_line = line_no
+                retry_after = int(e.headers["Retry-After"])
+                break
+        received += 1
+        if line is None:
+            record_error(line_no, f"Line exceeds {INGEST_STREAM_MAX_LINE_BYTES} bytes")
+            continue
+
+        try:
+            item = IngestMessageRequest.model_validate_json(line)
+        except ValidationError as e:
+            record_error(line_no, f"Invalid message: {e.errors(include_url=False, include_input=False)}")
+            continue
+        evt = _message_created_event(org_id, item)
+
+        try:
+            ack_future = await pub.publish_async(subject, to_json_bytes(evt), _dedup_headers(evt, item))
+        except Exception as e:
+            record_error(line_no, f"JetStream publish failed: {e}")
+            continue
+        pending.add(ack_future)
+        ack_future.add_done_callback(lambda f, n=line_no: on_ack(n, f))
+
+    if pending:
+        await asyncio.wait(pending)
+
+    errors.sort(key=lambda e: e.line)
+    if stopped_at_line is not None:
+        print(f"Stopped streaming to {subject} at line {stopped_at_line}: ingest is being shed")
+    print(f"Streamed {accepted}/{received} message.created events to {subject}")
+
+    return IngestStreamResponse(
+        org_id=org_id,
+        subject=subject,
+        stream=pub.stream_name,
+        received=received,
+        accepted=accepted,
+        failed=failed_count,
+        errors=errors,
+        stopped_at_line=stopped_at_line,
+        retry_after=retry_after,
+    )
@@ -0,0 +1,62 @@
+"""
+Claim-check storage for message.embedded.
+
+With EMBED_CLAIM_CHECK=db or kv the embedder stores the vector out of band and
+publishes an event_version 3 event carrying only a reference. "db" is the
+message_embeddings row keyed by the event's (org_id, message_id, model_version),
+so the clusterer does not insert it again. "kv" is a NATS KV entry whose key is
+in `embedding_ref`. The clusterer resolves the references of a whole fetch batch at once.
+"""
+import asyncio
+import hashlib
+import os
+import struct
+from typing import Dict, Iterable, List, Optional
+
+from nats.js.client import JetStreamContext
+from nats.js.errors import KeyNotFoundError
+from nats.js.kv import KeyValue
+
+from app.core.nats_client import bind_or_create_kv
+
+CLAIM_CHECK_MODES = ("none", "db", "kv")
+
+EMBED_CLAIM_CHECK = os.getenv("EMBED_CLAIM_CHECK", "none").strip().lower()
+CLAIM_CHECK_KV_BUCKET = os.getenv("EMBED_CLAIM_CHECK_KV_BUCKET", "message_embeddings")
+# Keep entries at least as long as the stream retains the events that point at them (0 = forever)
+CLAIM_CHECK_KV_TTL_SEC = float(os.getenv("EMBED_CLAIM_CHECK_KV_TTL_SEC", "0"))
+
+if EMBED_CLAIM_CHECK not in CLAIM_CHECK_MODES:
+    raise ValueError(f"EMBED_CLAIM_CHECK must be one of {CLAIM_CHECK_MODES}, got {EMBED_CLAIM_CHECK!r}")
+
+
+def claim_check_key(org_id: str, message_id: str, model_version: str) -> str:
+    # Hashed because org ids and model versions may hold characters KV keys do not allow;
+    # deterministic so a redelivered message overwrites its own entry.
+    return hashlib.sha256(f"{org_id}\x00{message_id}\x00{model_version}".encode("utf-8")).hexdigest()
+
+
+def pack_embedding(vec: List[float]) -> bytes:
+    return struct.pack(f"<{len(vec)}f", *vec)
+
+
+def unpack_embedding(data: bytes) -> List[float]:
+    return list(struct.unpack(f"<{len(data) // 4}f", data))
+
+
+async def claim_check_bucket(js: JetStreamContext) -> KeyValue:
+    return await bind_or_create_kv(js, CLAIM_CHECK_KV_BUCKET, CLAIM_CHECK_KV_TTL_SEC or None)
+
+
+async def fetch_kv_embeddings(kv: KeyValue, keys: Iterable[str]) -> Dict[str, List[float]]:
+    """Concurrent gets for a batch of keys; missing keys are left out of the result."""
+    keys = list(dict.fromkeys(keys))
+
+    async def get(key: str) -> Optional[bytes]:
+        try:
+            return (await kv.get(key)).value
+        except KeyNotFoundError:
+            return None
+
+    values = await asyncio.gather(*(get(k) for k in keys))
+    return {k: unpack_embedding(v) for k, v in zip(keys, values) if v}
@@ -1,14 +1,17 @@
 import asyncio
 import os
 from datetime import datetime, timezone
-from typing import List, Optional, Tuple
+from typing import Dict, List, Optional, Tuple
 from uuid import UUID, uuid4
 
 import psycopg
 from dotenv import load_dotenv
 from nats import errors as nats_errors
 from nats.aio.client import Client as NATS
+from nats.aio.msg import Msg
+from nats.js.kv import KeyValue
 
+from app.claim_check import claim_check_bucket, fetch_kv_embeddings
 from app.events import (
     MessageEmbeddedEvent,
     MessageClusteredEvent,
@@ -38,6 +41,10 @@ ASSIGN_DIST_THRESHOLD = 1.0 - ASSIGN_SIM_THRESHOLD
 # centroid update: capped mean
 COUNT_CAP = int(os.getenv("CLUSTER_COUNT_CAP", "1000"))
 
+# Size of the vector columns (db/schema.sql embed_dim); must match the embedder's EMBED_DIM.
+# Similarities shift with the dimension and reduction, so retune the threshold above with it.
+EMBED_DIM = int(os.getenv("EMBED_DIM", "768"))
+
 
 def db_conninfo() -> str:
     host = os.getenv("DB_HOST", "postgres")
@@ -92,6 +99,20 @@ def parse_vector_text(vec_txt: str) -> List[float]:
     return [float(x) for x in body.split(",")]
 
 
+class EmbeddingDimensionError(ValueError):
+    """The embedding can never fit the vector columns; redelivering it won't help."""
+
+
+def checked_embedding(embedded: MessageEmbeddedEvent, vector: List[float]) -> List[float]:
+    """Normalized `vector`, or EmbeddingDimensionError if it doesn't fit the EMBED_DIM vector columns."""
+    if embedded.embedding_dim != EMBED_DIM or len(vector) != EMBED_DIM:
+        raise EmbeddingDimensionError(
+            f"embedding for message_id={embedded.message.message_id} has {len(vector)} dimensions "
+            f"(embedding_dim={embedded.embedding_dim}, model={embedded.model_version}), expected {EMBED_DIM}"
+        )
+    return l2_normalize(vector)
+
+
 def fetch_best_cluster(
     cur: psycopg.Cursor,
     org_id: str,
@@ -256,6 +277,118 @@ def upsert_user_cluster(
     )
 
 
+def upsert_user_cluster_vector(
+    cur: psycopg.Cursor,
+    org_id: str,
+    user_id: str,
+    cluster_id: UUID,
+    embedding: List[float],
+) -> None:
+    # Running sum (not mean) so the update is a single atomic vector addition
+    vec_lit = to_pgvector_literal(embedding)
+    cur.execute(
+        """
+        INSERT INTO user_cluster_vectors (
+          org_id, cluster_id, user_id,
+          embedding_sum, message_count, updated_at
+        )
+        VALUES (%s, %s::uuid, %s, %s::vector, 1, now())
+        ON CONFLICT (org_id, cluster_id, user_id)
+        DO UPDATE SET
+          embedding_sum = user_cluster_vectors.embedding_sum + EXCLUDED.embedding_sum,
+          message_count = user_cluster_vectors.message_count + 1,
+          updated_at = now()
+        """,
+        (org_id, str(cluster_id), user_id, vec_lit),
+    )
+
+
+def upsert_user_profile_vector(
+    cur: psycopg.Cursor,
+    org_id: str,
+    user_id: str,
+    model_version: str,
+    embedding: List[float],
+) -> None:
+    # Org-wide profile across all clusters; feeds the HNSW nearest-users index
+    vec_lit = to_pgvector_literal(embedding)
+    cur.execute(
+        """
+        INSERT INTO user_profile_vectors (
+          org_id, user_id, model_version,
+          embedding_sum, message_count, updated_at
+        )
+        VALUES (%s, %s, %s, %s::vector, 1, now())
+        ON CONFLICT (org_id, user_id, model_version)
+        DO UPDATE SET
+          embedding_sum = user_profile_vectors.embedding_sum + EXCLUDED.embedding_sum,
+          message_count = user_profile_vectors.message_count + 1,
+          updated_at = now()
+        """,
+        (org_id, user_id, model_version, vec_lit),
+    )
+
+
+def fetch_message_embeddings(
+    cur: psycopg.Cursor,
+    keys: List[Tuple[str, UUID, str]],
+) -> Dict[Tuple[str, UUID, str], List[float]]:
+    """
+    Bulk read of claim-checked embeddings for (org_id, message_id, model_version) keys.
+    Keys without a row are left out of the result.
+    """
+    if not keys:
+        return {}
+    org_ids, message_ids, model_versions = zip(*keys)
+    cur.execute(
+        """
+        SELECT me.org_id, me.message_id, me.model_version, me.embedding::text
+        FROM message_embeddings me
+        JOIN unnest(%s::text[], %s::uuid[], %s::text[]) AS k(org_id, message_id, model_version)
+          USING (org_id, message_id, model_version)
+        """,
+        (list(org_ids), [str(m) for m in message_ids], list(model_versions)),
+    )
+    return {
+        (org_id, UUID(str(message_id)), model_version): parse_vector_text(vec_txt)
+        for org_id, message_id, model_version, vec_txt in cur.fetchall()
+    }
+
+
+async def resolve_embeddings(
+    conn: psycopg.Connection,
+    claim_kv: Optional[KeyValue],
+    events: List[MessageEmbeddedEvent],
+) -> Dict[UUID, List[float]]:
+    """
+    Raw (unnormalized) embedding for each event of a fetch batch, keyed by event_id.
+    Inline events are decoded; claim-checked ones are read with one query / one round
+    of KV gets for the whole batch. Unresolvable references are missing from the result.
+    """
+    out: Dict[UUID, List[float]] = {}
+    db_keys = {}
+    kv_refs = {}
+    for evt in events:
+        if evt.event_version != 3:
+            out[evt.event_id] = evt.vector()
+        elif evt.embedding_store == "db":
+            db_keys[evt.event_id] = (evt.org_id, evt.message.message_id, evt.model_version)
+        else:
+            kv_refs[evt.event_id] = evt.embedding_ref
+
+    if db_keys:
+        with conn.cursor() as cur:
+            rows = fetch_message_embeddings(cur, list(set(db_keys.values())))
+        conn.commit()
+        out.update({event_id: rows[key] for event_id, key in db_keys.items() if key in rows})
+
+    if kv_refs:
+        values = await fetch_kv_embeddings(claim_kv, kv_refs.values())
+        out.update({event_id: values[ref] for event_id, ref in kv_refs.items() if ref in values})
+
+    return out
+
+
 def get_existing_message_assignment(
     cur: psycopg.Cursor,
     org_id: str,
@@ -286,9 +419,13 @@ async def main() -> None:
 
     # Consume message.embedded events
     sub = await js.pull_subscribe(CONSUME_SUBJECT, durable=CONSUME_DURABLE, stream=STREAM_NAME)
+
+    # Bound lazily: only needed once an embedder publishes kv claim checks
+    claim_kv: Optional[KeyValue] = None
+
     print(
         f"✅ Clusterer running (consume={CONSUME_SUBJECT}, publish={PUBLISH_PREFIX}.<org>, "
-        f"stream={STREAM_NAME}, durable={CONSUME_DURABLE}, assign_sim>={ASSIGN_SIM_THRESHOLD})"
+        f"stream={STREAM_NAME}, durable={CONSUME_DURABLE}, assign_sim>={ASSIGN_SIM_THRESHOLD}, dim={EMBED_DIM})"
     )
 
     conn = psycopg.connect(db_conninfo())
@@ -302,10 +439,25 @@ async def main() -> None:
                 await asyncio.sleep(0.2)
                 continue
 
+            batch: List[Tuple[Msg, MessageEmbeddedEvent]] = []
             for m in msgs:
                 try:
-                    embedded: MessageEmbeddedEvent = parse_message_embedded(m.data)
+                    batch.append((m, parse_message_embedded(m.data)))
+                except Exception as e:
+                    # Don't ack; message will redeliver
+                    print(f"❌ clusterer failed: {e}")
+
+            try:
+                if claim_kv is None and any(evt.embedding_store == "kv" for _, evt in batch):
+                    claim_kv = await claim_check_bucket(js)
+                vectors = await resolve_embeddings(conn, claim_kv, [evt for _, evt in batch])
+            except Exception as e:
+                conn.rollback()
+                print(f"❌ clusterer failed to resolve embeddings: {e}")
+                continue
 
+            for m, embedded in batch:
+                try:
                     org_id = embedded.org_id
                     model_version = embedded.model_version
 
@@ -314,7 +466,12 @@ async def main() -> None:
                     user_id = msg_payload.user_id
                     ts = msg_payload.ts
 
-                    embedding = l2_normalize(list(embedded.embedding))
+                    if embedded.event_id not in vectors:
+                        raise LookupError(
+                            f"claim-checked embedding not found in {embedded.embedding_store!r} "
+                            f"for message_id={message_id}"
+                        )
+                    embedding = checked_embedding(embedded, vectors[embedded.event_id])
 
                     with conn.cursor() as cur:
                         upsert_message(
@@ -328,13 +485,15 @@ async def main() -> None:
                             metadata=msg_payload.metadata,
                         )
 
-                        upsert_message_embedding(
-                            cur=cur,
-                            org_id=org_id,
-                            message_id=message_id,
-                            model_version=model_version,
-                            embedding=embedding,
-                        )
+                        # A db claim check means the embedder already wrote this row
+                        if embedded.embedding_store != "db":
+                            upsert_message_embedding(
+                                cur=cur,
+                                org_id=org_id,
+                                message_id=message_id,
+                                model_version=model_version,
+                                embedding=embedding,
+                            )
 
                         existing = get_existing_message_assignment(cur, org_id, message_id)
                         if existing is not None:
@@ -360,6 +519,8 @@ async def main() -> None:
 
                             upsert_message_cluster(cur, org_id, message_id, cluster_id, confidence)
                             upsert_user_cluster(cur, org_id, user_id, cluster_id, confidence)
+                            upsert_user_cluster_vector(cur, org_id, user_id, cluster_id, embedding)
+                            upsert_user_profile_vector(cur, org_id, user_id, model_version, embedding)
 
                         conn.commit()
 
@@ -385,6 +546,12 @@ async def main() -> None:
                         f"-> cluster={cluster_id} conf={confidence:.3f}"
                     )
 
+                except EmbeddingDimensionError as e:
+                    conn.rollback()
+                    # Stop redelivery; the embedder and clusterer EMBED_DIM disagree
+                    await m.term()
+                    print(f"❌ clusterer dropped message: {e}")
+
                 except Exception as e:
                     if conn is not None:
                         conn.rollback()
@@ -1,14 +1,57 @@
 import os
 from dotenv import load_dotenv
 
+from app.core.embedder_consumer_config import EMBEDDER_DURABLE
+
 load_dotenv()
 
 NATS_URL = os.getenv("NATS_URL", "nats://localhost:4222")
 JETSTREAM_STREAM = os.getenv("JETSTREAM_STREAM", "ingress_messages")
 JETSTREAM_SUBJECTS = os.getenv("JETSTREAM_SUBJECTS", "messages.>").split(",")
 
+# Pipelined publishing: un-acked publishes allowed in flight, and how long to wait for a PubAck
+JETSTREAM_PUBLISH_MAX_IN_FLIGHT = int(os.getenv("JETSTREAM_PUBLISH_MAX_IN_FLIGHT", "4000"))
+JETSTREAM_PUBLISH_ACK_TIMEOUT_SEC = float(os.getenv("JETSTREAM_PUBLISH_ACK_TIMEOUT_SEC", "5"))
+
+# "puback": ingest responds after the PubAck; "enqueue": responds once the publish is sent
+INGEST_ACK_MODE = os.getenv("INGEST_ACK_MODE", "puback").strip().lower()
+
+# NDJSON streaming ingest
+INGEST_STREAM_MAX_LINE_BYTES = int(os.getenv("INGEST_STREAM_MAX_LINE_BYTES", str(1024 * 1024)))
+
 DB_HOST = os.getenv("DB_HOST", "localhost")
 DB_PORT = int(os.getenv("DB_PORT", "5432"))
 DB_NAME = os.getenv("DB_NAME", "network_builder_db")
 DB_USER = os.getenv("DB_USER", "network_builder_client")
 DB_PASSWORD = os.getenv("DB_PASSWORD", "network_builder_secret")
+
+# API connection pool
+DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", "2"))
+DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", "10"))
+DB_POOL_TIMEOUT_SEC = float(os.getenv("DB_POOL_TIMEOUT_SEC", "5"))
+DB_POOL_MAX_IDLE_SEC = float(os.getenv("DB_POOL_MAX_IDLE_SEC", "300"))
+
+# Lag-aware admission control: ingest returns 429 while a durable's pending count
+# (undelivered + unacked) exceeds its threshold. A threshold of 0 disables that check.
+# The embedder's durable depends on its EMBEDDER_CONSUMER_MODE (push or pull)
+ADMISSION_EMBEDDER_DURABLE = os.getenv("ADMISSION_EMBEDDER_DURABLE", EMBEDDER_DURABLE)
+ADMISSION_EMBEDDER_MAX_PENDING = int(os.getenv("ADMISSION_EMBEDDER_MAX_PENDING", "100000"))
+ADMISSION_CLUSTERER_DURABLE = os.getenv("ADMISSION_CLUSTERER_DURABLE", "clusterer_v1")
+ADMISSION_CLUSTERER_MAX_PENDING = int(os.getenv("ADMISSION_CLUSTERER_MAX_PENDING", "100000"))
+ADMISSION_POLL_INTERVAL_SEC = float(os.getenv("ADMISSION_POLL_INTERVAL_SEC", "2"))
+ADMISSION_RETRY_AFTER_SEC = int(os.getenv("ADMISSION_RETRY_AFTER_SEC", "5"))
+# When true, only orgs sending more than their fair share of recent traffic are shed
+ADMISSION_PER_ORG = os.getenv("ADMISSION_PER_ORG", "false").lower() in ("1", "true", "yes")
+# Per-org mode: fraction of the pre-overload intake shared across orgs while overloaded
+ADMISSION_OVERLOAD_BUDGET = float(os.getenv("ADMISSION_OVERLOAD_BUDGET", "0.5"))
+
+# Connections response cache, invalidated by message.clustered events.
+# CONNECTIONS_CACHE_MAX_ENTRIES=0 disables it; set CONNECTIONS_CACHE_KV_BUCKET to share
+# entries between API replicas through a NATS KV bucket.
+CONNECTIONS_CACHE_MAX_ENTRIES = int(os.getenv("CONNECTIONS_CACHE_MAX_ENTRIES", "10000"))
+CONNECTIONS_CACHE_TTL_SEC = float(os.getenv("CONNECTIONS_CACHE_TTL_SEC", "300"))
+CONNECTIONS_CACHE_KV_BUCKET = os.getenv("CONNECTIONS_CACHE_KV_BUCKET", "").strip()
+CLUSTERED_SUBJECT_PREFIX = os.getenv("CLUSTERED_SUBJECT_PREFIX", "clusters")
+
+# Org-wide nearest-users search: HNSW candidate list size per query
+SIMILAR_USERS_EF_SEARCH = int(os.getenv("SIMILAR_USERS_EF_SEARCH", "100"))
@@ -0,0 +1,43 @@
+"""
+The embedder's JetStream consumer, shared by js_init (which creates it), the embedder
+(which binds to it) and the API's admission control (which watches its lag).
+"""
+import os
+
+from dotenv import load_dotenv
+from nats.js.api import AckPolicy, ConsumerConfig, DeliverPolicy
+
+load_dotenv()
+
+# "push" (callback subscription on EMBEDDER_DELIVER_SUBJECT) or "pull" (fetch loop)
+EMBEDDER_CONSUMER_MODE = os.getenv("EMBEDDER_CONSUMER_MODE", "push").strip().lower()
+# Push and pull consumers are different JetStream consumers, so each mode has its own durable
+EMBEDDER_DURABLE = os.getenv(
+    "EMBEDDER_DURABLE", "embedder_pull_v1" if EMBEDDER_CONSUMER_MODE == "pull" else "embedder_v1"
+)
+EMBEDDER_ACK_WAIT_SEC = float(os.getenv("EMBEDDER_ACK_WAIT_SEC", "30"))
+EMBEDDER_MAX_DELIVER = int(os.getenv("EMBEDDER_MAX_DELIVER", "5"))
+EMBEDDER_FILTER_SUBJECT = "messages.>"
+
+# Messages being embedded/published at once (both modes); match it to TEI capacity
+EMBED_MAX_IN_FLIGHT = int(os.getenv("EMBED_MAX_IN_FLIGHT", "256"))
+
+if EMBEDDER_CONSUMER_MODE not in ("push", "pull"):
+    raise ValueError(f"EMBEDDER_CONSUMER_MODE must be 'push' or 'pull', got {EMBEDDER_CONSUMER_MODE!r}")
+
+
+def embedder_pull_consumer_config(
+    durable: str = EMBEDDER_DURABLE,
+    max_in_flight: int = EMBED_MAX_IN_FLIGHT,
+    ack_wait_sec: float = EMBEDDER_ACK_WAIT_SEC,
+) -> ConsumerConfig:
+    return ConsumerConfig(
+        durable_name=durable,
+        deliver_policy=DeliverPolicy.ALL,
+        ack_policy=AckPolicy.EXPLICIT,
+        ack_wait=ack_wait_sec,
+        # Room for the in-flight messages plus a fetch's worth waiting on a free slot
+        max_ack_pending=max(max_in_flight, 1) * 2,
+        max_deliver=EMBEDDER_MAX_DELIVER,
+        filter_subject=EMBEDDER_FILTER_SUBJECT,
+    )
@@ -1,14 +1,34 @@
-from typing import Optional, Sequence
+import asyncio
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
 
 from nats.aio.client import Client as NATS
-from nats.js.api import StreamConfig, RetentionPolicy, StorageType
+from nats.js.api import KeyValueConfig, StreamConfig, RetentionPolicy, StorageType
+from nats.js.errors import BucketNotFoundError
+from nats.js.kv import KeyValue
+
+
+async def bind_or_create_kv(js, bucket: str, ttl: Optional[float] = None) -> KeyValue:
+    # Bind to a KV bucket, creating it on first use
+    try:
+        return await js.key_value(bucket)
+    except BucketNotFoundError:
+        return await js.create_key_value(KeyValueConfig(bucket=bucket, ttl=ttl))
 
 
 class NatsJetStreamPublisher:
-    def __init__(self, nats_url: str, stream_name: str, subjects: Sequence[str]) -> None:
+    def __init__(
+        self,
+        nats_url: str,
+        stream_name: str,
+        subjects: Sequence[str],
+        max_in_flight: int = 4000,
+        ack_timeout: float = 5.0,
+    ) -> None:
         self._nats_url = nats_url
         self._stream_name = stream_name
         self._subjects = list(subjects)
+        self._max_in_flight = max_in_flight
+        self._ack_timeout = ack_timeout
         self._nc: Optional[NATS] = None
         self._js = None
 
@@ -20,10 +40,12 @@ class NatsJetStreamPublisher:
         nc = NATS()
         await nc.connect(servers=[self._nats_url])
         self._nc = nc
-        self._js = nc.jetstream()
+        self._js = nc.jetstream(publish_async_max_pending=self._max_in_flight)
 
-    async def ensure_stream(self) -> None:
-        # Create or update stream config (dev-friendly)
+    async def ensure_stream(self, duplicate_window: float = 120.0) -> None:
+        # Create or update stream config (dev-friendly).
+        # duplicate_window (seconds) is how long publishes carrying the same
+        # Nats-Msg-Id header are dropped by the server as duplicates.
         cfg = StreamConfig(
             name=self._stream_name,
             subjects=self._subjects,
@@ -33,6 +55,7 @@ class NatsJetStreamPublisher:
             max_bytes=-1,
             max_age=0,
             num_replicas=1,
+            duplicate_window=duplicate_window,
         )
         try:
             await self._js.add_stream(cfg)
@@ -43,9 +66,55 @@ class NatsJetStreamPublisher:
             else:
                 raise
 
-    async def publish(self, subject: str, payload: bytes):
-        # Returns PubAck (stream + seq)
-        return await self._js.publish(subject, payload)
+    async def publish(self, subject: str, payload: bytes, headers: Optional[Dict[str, str]] = None):
+        # Returns PubAck (stream + seq + duplicate)
+        return await self._js.publish(subject, payload, headers=headers)
+
+    async def publish_async(
+        self,
+        subject: str,
+        payload: bytes,
+        headers: Optional[Dict[str, str]] = None,
+    ) -> "asyncio.Future[Any]":
+        """
+        Sends the message without waiting for its PubAck and returns a future for it.
+        Only blocks while `max_in_flight` publishes are already un-acked; the returned
+        future fails with a timeout if the ack takes longer than `ack_timeout`.
+        """
+        ack = await self._js.publish_async(
+            subject, payload, wait_stall=self._ack_timeout, headers=headers
+        )
+        return asyncio.ensure_future(asyncio.wait_for(ack, self._ack_timeout))
+
+    async def publish_many(
+        self,
+        messages: Iterable[Tuple[str, bytes, Optional[Dict[str, str]]]],
+    ) -> List[Any]:
+        """
+        Pipelines (subject, payload, headers) publishes through the in-flight window.
+        Returns one PubAck or exception per message, in input order.
+        """
+        acks: List["asyncio.Future[Any]"] = []
+        for subject, payload, headers in messages:
+            try:
+                acks.append(await self.publish_async(subject, payload, headers))
+            except Exception as e:
+                failed = asyncio.get_running_loop().create_future()
+                failed.set_exception(e)
+                acks.append(failed)
+        return await asyncio.gather(*acks, return_exceptions=True)
+
+    async def consumer_pending(self, durable: str) -> int:
+        # Messages not yet delivered plus delivered-but-unacked for a durable on this stream
+        info = await self._js.consumer_info(self._stream_name, durable)
+        return int(info.num_pending or 0) + int(info.num_ack_pending or 0)
+
+    async def subscribe(self, subject: str, cb):
+        # Plain (non-JetStream) subscription on the shared connection
+        return await self._nc.subscribe(subject, cb=cb)
+
+    async def key_value(self, bucket: str, ttl: Optional[float] = None) -> KeyValue:
+        return await bind_or_create_kv(self._js, bucket, ttl)
 
     async def close(self) -> None:
         if self._nc is not None:
@@ -0,0 +1,119 @@
+import time
+from collections import deque
+from typing import Callable, Deque, Optional
+
+from prometheus_client import Counter, Gauge
+
+CIRCUIT_STATE = Gauge(
+    "embedder_circuit_state",
+    "Circuit breaker state: 0 closed, 1 half-open, 2 open.",
+    ["name"],
+)
+CIRCUIT_REJECTIONS = Counter(
+    "embedder_circuit_rejections_total",
+    "Calls rejected without being attempted because the circuit was open.",
+    ["name"],
+)
+
+CLOSED = "closed"
+HALF_OPEN = "half_open"
+OPEN = "open"
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitOpenError(RuntimeError):
+    """`retry_after` (seconds) is the NAK delay the caller should hand the message back with."""
+
+    def __init__(self, message: str, retry_after: Optional[float] = None) -> None:
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """
+    Failure-rate circuit breaker.
+
+    Closed: calls go through and their outcomes fill a sliding window of the last
+    `window` calls; once it holds `min_calls` and the failure rate reaches
+    `failure_rate`, the circuit opens. Open: calls are rejected for `open_sec`.
+    Half-open: up to `half_open_probes` calls are let through; a success closes the
+    circuit, a failure opens it again.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        window: int = 20,
+        min_calls: int = 10,
+        failure_rate: float = 0.5,
+        open_sec: float = 10.0,
+        half_open_probes: int = 1,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.name = name
+        self._outcomes: Deque[bool] = deque(maxlen=max(1, window))
+        self._min_calls = max(1, min_calls)
+        self._failure_rate = failure_rate
+        self._open_sec = open_sec
+        self._half_open_probes = max(1, half_open_probes)
+        self._clock = clock
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probes = 0
+        CIRCUIT_STATE.labels(name=name).set(0)
+
+    @property
+    def state(self) -> str:
+        if self._state == OPEN and self._clock() - self._opened_at >= self._open_sec:
+            self._transition(HALF_OPEN)
+        return self._state
+
+    def is_open(self) -> bool:
+        """True while calls would be rejected outright; does not take a half-open probe."""
+        return self.state == OPEN or (self._state == HALF_OPEN and self._probes >= self._half_open_probes)
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == CLOSED:
+            return True
+        if state == HALF_OPEN and self._probes < self._half_open_probes:
+            self._probes += 1
+            return True
+        CIRCUIT_REJECTIONS.labels(name=self.name).inc()
+        return False
+
+    def record_success(self) -> None:
+        if self._state == HALF_OPEN:
+            self._transition(CLOSED)
+        elif self._state == CLOSED:
+            self._record(True)
+
+    def record_failure(self) -> None:
+        if self._state == HALF_OPEN:
+            self._transition(OPEN)
+        elif self._state == CLOSED:
+            self._record(False)
+
+    def release_probe(self) -> None:
+        """For a call that ended with no outcome (e.g. cancelled): frees its half-open probe slot."""
+        if self._state == HALF_OPEN and self._probes > 0:
+            self._probes -= 1
+
+    def _record(self, ok: bool) -> None:
+        self._outcomes.append(ok)
+        if len(self._outcomes) < self._min_calls:
+            return
+        if self._outcomes.count(False) / len(self._outcomes) >= self._failure_rate:
+            self._transition(OPEN)
+
+    def _transition(self, state: str) -> None:
+        if state == self._state:
+            return
+        print(f"⚡ circuit {self.name}: {self._state} -> {state}")
+        self._state = state
+        self._probes = 0
+        if state == OPEN:
+            self._opened_at = self._clock()
+        if state == CLOSED:
+            self._outcomes.clear()
+        CIRCUIT_STATE.labels(name=self.name).set(_STATE_VALUES[state])
@@ -0,0 +1,108 @@
+import json
+import os
+from operator import mul
+from typing import Any, List, Optional
+
+from app.embed.text_prep import l2_normalize
+
+# How to get from EMBED_MODEL_DIM to a smaller EMBED_DIM:
+#   none       - the dimensions must match
+#   matryoshka - keep the first EMBED_DIM components and renormalize (models trained with MRL)
+#   pca        - project onto a fitted basis from EMBED_PCA_PATH (scripts/fit_pca_projection.py)
+EMBED_DIM_REDUCTION = os.getenv("EMBED_DIM_REDUCTION", "none").strip().lower()
+EMBED_PCA_PATH = os.getenv("EMBED_PCA_PATH", "").strip()
+
+if EMBED_DIM_REDUCTION not in ("none", "matryoshka", "pca"):
+    raise ValueError(
+        f"EMBED_DIM_REDUCTION must be 'none', 'matryoshka' or 'pca', got {EMBED_DIM_REDUCTION!r}"
+    )
+
+# What the model itself outputs (providers check it), and the size of the vectors published
+# and stored. Without a reduction they are the same, so either setting alone sizes both.
+EMBED_MODEL_DIM = int(
+    os.getenv("EMBED_MODEL_DIM", os.getenv("EMBED_DIM", "768") if EMBED_DIM_REDUCTION == "none" else "768")
+)
+EMBED_DIM = int(os.getenv("EMBED_DIM", str(EMBED_MODEL_DIM)))
+
+
+class DimensionReducer:
+    """
+    Maps unit-length `model_dim` embeddings to unit-length `dim` ones.
+
+    Reduced vectors are not comparable with full-size ones (or with another reduction),
+    so `model_version()` tags the provider's model version with the reduction; clusters,
+    profiles and stored embeddings are all keyed by it.
+
+    PCA uses numpy when it is installed. Without it the projection is a pure-Python
+    matmul, and `offload` tells the caller to run `reduce` in a worker thread.
+    """
+
+    def __init__(
+        self,
+        model_dim: int,
+        dim: int,
+        method: str = "none",
+        mean: Optional[List[float]] = None,
+        components: Optional[List[List[float]]] = None,
+    ) -> None:
+        if method == "none" and dim != model_dim:
+            raise ValueError(
+                f"EMBED_DIM={dim} differs from EMBED_MODEL_DIM={model_dim}; set EMBED_DIM_REDUCTION"
+            )
+        if method != "none" and not 0 < dim <= model_dim:
+            raise ValueError(f"Cannot reduce {model_dim} dimensions to {dim}")
+        if method == "pca":
+            if mean is None or components is None:
+                raise ValueError("PCA reduction needs a mean and components")
+            if len(mean) != model_dim or any(len(c) != model_dim for c in components):
+                raise ValueError(f"PCA projection was not fitted on {model_dim}-dimensional embeddings")
+            if len(components) < dim:
+                raise ValueError(f"PCA projection has {len(components)} components, EMBED_DIM={dim}")
+        self.model_dim = model_dim
+        self.dim = dim
+        self.method = method
+        self._mean = mean
+        self._components = components[:dim] if components is not None else None
+        self._np: Any = None
+        if method == "pca":
+            try:
+                import numpy as np
+            except ImportError:
+                pass
+            else:
+                self._np = np
+                self._mean = np.asarray(self._mean, dtype=np.float32)
+                self._components = np.asarray(self._components, dtype=np.float32)
+        self.offload = method == "pca" and self._np is None
+
+    @classmethod
+    def from_pca_file(cls, path: str, model_dim: int, dim: int) -> "DimensionReducer":
+        with open(path, "r", encoding="utf-8") as f:
+            artifact = json.load(f)
+        return cls(model_dim, dim, "pca", mean=artifact["mean"], components=artifact["components"])
+
+    def model_version(self, base: str) -> str:
+        if self.method == "none":
+            return base
+        tag = "mrl" if self.method == "matryoshka" else "pca"
+        return f"{base}#{tag}{self.dim}"
+
+    def reduce(self, vec: List[float]) -> List[float]:
+        if self.method == "none":
+            return vec
+        if self.method == "matryoshka":
+            return l2_normalize(vec[: self.dim])
+        if self._np is not None:
+            projected = self._components @ (self._np.asarray(vec, dtype=self._np.float32) - self._mean)
+            return l2_normalize(projected.tolist())
+        centered = [x - m for x, m in zip(vec, self._mean)]
+        return l2_normalize([sum(map(mul, row, centered)) for row in self._components])
+
+
+def dimension_reducer() -> DimensionReducer:
+    """The reducer configured by EMBED_MODEL_DIM / EMBED_DIM / EMBED_DIM_REDUCTION."""
+    if EMBED_DIM_REDUCTION == "pca":
+        if not EMBED_PCA_PATH:
+            raise ValueError("EMBED_DIM_REDUCTION=pca needs EMBED_PCA_PATH")
+        return DimensionReducer.from_pca_file(EMBED_PCA_PATH, EMBED_MODEL_DIM, EMBED_DIM)
+    return DimensionReducer(EMBED_MODEL_DIM, EMBED_DIM, EMBED_DIM_REDUCTION)
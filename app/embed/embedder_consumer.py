@@ -1,15 +1,251 @@
-import os
 import asyncio
+import os
+from datetime import datetime, timezone
+from typing import Optional, Set
+from uuid import uuid4
 
-async def main() -> None:
-    provider = os.getenv("EMBED_PROVIDER", "tei").strip().lower()
+from dotenv import load_dotenv
+from nats.aio.client import Client
+from nats.js.api import AckPolicy, ConsumerConfig, DeliverPolicy
+from nats.js.client import JetStreamContext
+from nats.js.kv import KeyValue
+from prometheus_client import start_http_server
+from psycopg_pool import AsyncConnectionPool
+
+from app.claim_check import (
+    EMBED_CLAIM_CHECK,
+    claim_check_bucket,
+    claim_check_key,
+    pack_embedding,
+)
+from app.core.embedder_consumer_config import (
+    EMBED_MAX_IN_FLIGHT,
+    EMBEDDER_ACK_WAIT_SEC,
+    EMBEDDER_CONSUMER_MODE,
+    EMBEDDER_DURABLE,
+    EMBEDDER_FILTER_SUBJECT,
+    EMBEDDER_MAX_DELIVER,
+)
+from app.embed.circuit_breaker import CircuitOpenError
+from app.embed.dim_reduction import DimensionReducer, dimension_reducer
+from app.embed.embedding_writer import EmbeddingWriter
+from app.embed.providers import EmbeddingProvider, create_provider
+from app.embed.pull_consumer import run_pull_consumer
+from app.events import (
+    MessageCreatedEvent,
+    MessageEmbeddedEvent,
+    claim_check_fields,
+    embedding_fields,
+    parse_message_created,
+    to_json_bytes,
+)
+
+load_dotenv()
+
+# JetStream / NATS
+STREAM_NAME = os.getenv("JETSTREAM_STREAM", "ingress_messages")
+CONSUME_DURABLE = EMBEDDER_DURABLE
+NATS_URL = os.getenv("NATS_URL", "nats://nats:4222")
+DELIVER_SUBJECT_ENV = os.getenv("EMBEDDER_DELIVER_SUBJECT", "").strip()
+
+# Embedding backend: stub | tei | local (see app/embed/providers)
+EMBED_PROVIDER = os.getenv("EMBED_PROVIDER", "tei").strip().lower()
+
+# message.embedded wire format: 1 = JSON float list, 2 = base64 little-endian EMBED_EVENT_DTYPE
+EMBED_EVENT_VERSION = int(os.getenv("EMBED_EVENT_VERSION", "1"))
+EMBED_EVENT_DTYPE = os.getenv("EMBED_EVENT_DTYPE", "float32").strip().lower()
+
+# Prometheus metrics on :EMBED_METRICS_PORT/metrics (0 disables)
+EMBED_METRICS_PORT = int(os.getenv("EMBED_METRICS_PORT", "9100"))
+
+# Publish embedded events to embeddings.{org_id}
+PUBLISH_SUBJECT_PREFIX = os.getenv("EMBEDDED_SUBJECT_PREFIX", "embeddings")
+
+# Persist embeddings into Postgres as well (always on for EMBED_CLAIM_CHECK=db)
+PERSIST_TO_DB = os.getenv("EMBED_PERSIST_TO_DB", "false").lower() in (
+    "1",
+    "true",
+    "yes",
+) or EMBED_CLAIM_CHECK == "db"
+# Long-lived pool and write-behind batching for persisted embeddings
+EMBED_DB_POOL_MIN_SIZE = int(os.getenv("EMBED_DB_POOL_MIN_SIZE", "1"))
+EMBED_DB_POOL_MAX_SIZE = int(os.getenv("EMBED_DB_POOL_MAX_SIZE", "4"))
+EMBED_PERSIST_BATCH_SIZE = int(os.getenv("EMBED_PERSIST_BATCH_SIZE", "256"))
+EMBED_PERSIST_MAX_WAIT_MS = float(os.getenv("EMBED_PERSIST_MAX_WAIT_MS", "20"))
 
-    if provider == "stub":
-        from app.embed.stub_embedder_consumer import main as run
+
+def db_conninfo() -> str:
+    host = os.getenv("DB_HOST", "postgres")
+    port = int(os.getenv("DB_PORT", "5432"))
+    name = os.getenv("DB_NAME", "network_builder_db")
+    user = os.getenv("DB_USER", "network_builder_client")
+    pw = os.getenv("DB_PASSWORD", "network_builder_secret")
+    return f"host={host} port={port} dbname={name} user={user} password={pw}"
+
+
+async def msg_callback(
+    js: JetStreamContext,
+    msg,
+    provider: EmbeddingProvider,
+    writer: Optional[EmbeddingWriter] = None,
+    claim_kv: Optional[KeyValue] = None,
+    reducer: Optional[DimensionReducer] = None,
+):
+    created: MessageCreatedEvent = parse_message_created(msg.data)
+
+    org_id = created.org_id
+    msg_payload = created.message
+    message_id = msg_payload.message_id
+
+    try:
+        emb = await provider.embed(msg_payload.text, org_id, message_id)
+    except CircuitOpenError as exc:
+        # The backend is down and the provider asked for the message to be retried later
+        await msg.nak(delay=exc.retry_after)
+        return
+
+    model_version = provider.model_version
+    embedding_dim = provider.dim
+    if reducer is not None:
+        emb = await asyncio.to_thread(reducer.reduce, emb) if reducer.offload else reducer.reduce(emb)
+        model_version = reducer.model_version(model_version)
+        embedding_dim = reducer.dim
+
+    if writer is not None:
+        # Returns once the flush holding this row has committed, so the ack below follows it
+        await writer.write(org_id, message_id, emb)
+
+    if EMBED_CLAIM_CHECK == "kv":
+        ref = claim_check_key(org_id, str(message_id), model_version)
+        await claim_kv.put(ref, pack_embedding(emb))
+        event_embedding_fields = claim_check_fields("kv", ref)
+    elif EMBED_CLAIM_CHECK == "db":
+        # Persisted above; the clusterer reads it back from message_embeddings
+        event_embedding_fields = claim_check_fields("db")
     else:
-        from app.embed.tei_embedder_consumer import main as run
+        event_embedding_fields = embedding_fields(emb, EMBED_EVENT_VERSION, EMBED_EVENT_DTYPE)
+
+    embedded_evt = MessageEmbeddedEvent(
+        event_id=uuid4(),
+        org_id=org_id,
+        message=msg_payload,  # <-- includes text + metadata + user_id + ts
+        model_version=model_version,
+        embedding_dim=embedding_dim,
+        **event_embedding_fields,
+        created_at=datetime.now(timezone.utc),
+    )
+
+    publish_subject = f"{PUBLISH_SUBJECT_PREFIX}.{org_id}"
+    await js.publish(publish_subject, to_json_bytes(embedded_evt))
+
+    print(f"✅ embedded message_id={message_id} org={org_id} -> {publish_subject}")
+    await msg.ack()
+
+
+async def main() -> None:
+    print(f"⏳ Starting embedder consumer (provider={EMBED_PROVIDER})...")
+
+    provider = create_provider(EMBED_PROVIDER)
+    reducer = dimension_reducer()
+    model_version = reducer.model_version(provider.model_version)
+
+    if EMBED_METRICS_PORT:
+        start_http_server(EMBED_METRICS_PORT)
+
+    nats_client: Client = Client()
+    await nats_client.connect(servers=[NATS_URL])
+
+    js: JetStreamContext = nats_client.jetstream()
+
+    print("✅ Connected to NATS/JetStream")
+
+    await provider.start(js)
+
+    claim_kv = await claim_check_bucket(js) if EMBED_CLAIM_CHECK == "kv" else None
+
+    writer: Optional[EmbeddingWriter] = None
+    db_pool: Optional[AsyncConnectionPool] = None
+    if PERSIST_TO_DB:
+        db_pool = AsyncConnectionPool(
+            db_conninfo(),
+            min_size=EMBED_DB_POOL_MIN_SIZE,
+            max_size=EMBED_DB_POOL_MAX_SIZE,
+            open=False,
+            name="embedder",
+        )
+        await db_pool.open()
+        writer = EmbeddingWriter(
+            db_pool,
+            model_version,
+            max_batch_size=EMBED_PERSIST_BATCH_SIZE,
+            max_wait_sec=EMBED_PERSIST_MAX_WAIT_MS / 1000.0,
+        )
+
+    try:
+        if EMBEDDER_CONSUMER_MODE == "pull":
+            print(
+                f"✅ Embedder running in pull mode (consume=messages.>, "
+                f"publish={PUBLISH_SUBJECT_PREFIX}.<org>, stream={STREAM_NAME}, durable={CONSUME_DURABLE}, "
+                f"{provider.describe()}, dim={reducer.dim} ({reducer.method}), model_version={model_version})"
+            )
+            await run_pull_consumer(
+                js,
+                STREAM_NAME,
+                lambda m: msg_callback(js, m, provider, writer, claim_kv, reducer),
+            )
+            return
+
+        in_flight = asyncio.Semaphore(EMBED_MAX_IN_FLIGHT)
+        handlers: Set[asyncio.Task] = set()
+
+        def handler_done(task: asyncio.Task) -> None:
+            handlers.discard(task)
+            in_flight.release()
+            if not task.cancelled() and task.exception() is not None:
+                # Not acked; JetStream redelivers after ack_wait
+                print(f"❌ embedder failed: {task.exception()}")
+
+        async def on_message(m) -> None:
+            # Push callbacks run one at a time, so each message gets its own task;
+            # otherwise no second text could reach a batcher before the first is embedded.
+            await in_flight.acquire()
+            task = asyncio.create_task(msg_callback(js, m, provider, writer, claim_kv, reducer))
+            handlers.add(task)
+            task.add_done_callback(handler_done)
+
+        deliver_subject = DELIVER_SUBJECT_ENV or nats_client.new_inbox()
+
+        consumer_config = ConsumerConfig(
+            "embedder_consumer",
+            durable_name=CONSUME_DURABLE,
+            description=f"Embedder consumer ({EMBED_PROVIDER})",
+            deliver_policy=DeliverPolicy.ALL,
+            deliver_subject=deliver_subject,
+            ack_policy=AckPolicy.EXPLICIT,
+            ack_wait=EMBEDDER_ACK_WAIT_SEC,
+            max_deliver=EMBEDDER_MAX_DELIVER,
+        )
+
+        await js.subscribe(
+            subject=EMBEDDER_FILTER_SUBJECT,
+            cb=on_message,
+            durable=CONSUME_DURABLE,
+            stream=STREAM_NAME,
+            config=consumer_config,
+        )
+
+        print(
+            f"✅ Embedder running (consume=messages.>, publish={PUBLISH_SUBJECT_PREFIX}.<org>, "
+            f"stream={STREAM_NAME}, durable={CONSUME_DURABLE}, {provider.describe()}, "
+            f"dim={reducer.dim} ({reducer.method}), model_version={model_version})"
+        )
 
-    await run()
+        await asyncio.Event().wait()
+    finally:
+        await provider.close()
+        if writer is not None:
+            await writer.close()
+            await db_pool.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,135 @@
+import asyncio
+import hashlib
+import re
+import unicodedata
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from nats.js.errors import KeyNotFoundError
+from nats.js.kv import KeyValue
+from prometheus_client import Counter, Gauge
+
+from app.claim_check import pack_embedding, unpack_embedding
+
+EMBEDDING_CACHE_LOOKUPS = Counter(
+    "embedder_embedding_cache_lookups_total",
+    "Embedding cache lookups by tier and result.",
+    ["tier", "result"],
+)
+EMBEDDING_CACHE_BYTES = Gauge(
+    "embedder_embedding_cache_bytes",
+    "Bytes of packed vectors held in the local embedding cache.",
+)
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    # Only differences the tokenizer ignores anyway: Unicode form and whitespace runs
+    return _WHITESPACE.sub(" ", unicodedata.normalize("NFC", text)).strip()
+
+
+class EmbeddingCache:
+    """
+    Content-addressed cache of embeddings keyed by sha256(model_version, normalized text).
+
+    The local tier is an LRU of packed float32 vectors bounded by `max_bytes`. The
+    optional KV tier is shared by all embedder replicas and bounded by its bucket's
+    TTL/size limits. Concurrent misses for the same key share one computation, and a
+    failed computation is never cached.
+    """
+
+    def __init__(self, model_version: str, max_bytes: int, kv: Optional[KeyValue] = None) -> None:
+        self._model_version = model_version
+        self._max_bytes = max_bytes
+        self._kv = kv
+        self._entries: "OrderedDict[str, bytes]" = OrderedDict()
+        self._bytes = 0
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    def key(self, text: str) -> str:
+        h = hashlib.sha256(self._model_version.encode("utf-8"))
+        h.update(b"\x00")
+        h.update(normalize_text(text).encode("utf-8"))
+        return h.hexdigest()
+
+    def _store_local(self, key: str, packed: bytes) -> None:
+        if len(packed) > self._max_bytes:
+            return
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._bytes -= len(old)
+        self._entries[key] = packed
+        self._bytes += len(packed)
+        while self._bytes > self._max_bytes:
+            _, dropped = self._entries.popitem(last=False)
+            self._bytes -= len(dropped)
+        EMBEDDING_CACHE_BYTES.set(self._bytes)
+
+    async def get(self, key: str) -> Optional[List[float]]:
+        packed = self._entries.get(key)
+        if packed is not None:
+            self._entries.move_to_end(key)
+            EMBEDDING_CACHE_LOOKUPS.labels(tier="local", result="hit").inc()
+            return unpack_embedding(packed)
+        EMBEDDING_CACHE_LOOKUPS.labels(tier="local", result="miss").inc()
+
+        if self._kv is None:
+            return None
+
+        try:
+            packed = (await self._kv.get(key)).value
+        except KeyNotFoundError:
+            packed = None
+        except Exception as e:
+            print(f"⚠️  embedding cache: shared tier get failed: {e}")
+            packed = None
+
+        if not packed:
+            EMBEDDING_CACHE_LOOKUPS.labels(tier="shared", result="miss").inc()
+            return None
+
+        self._store_local(key, packed)
+        EMBEDDING_CACHE_LOOKUPS.labels(tier="shared", result="hit").inc()
+        return unpack_embedding(packed)
+
+    async def put(self, key: str, embedding: List[float]) -> None:
+        packed = pack_embedding(embedding)
+        self._store_local(key, packed)
+        if self._kv is not None:
+            try:
+                await self._kv.put(key, packed)
+            except Exception as e:
+                print(f"⚠️  embedding cache: shared tier put failed: {e}")
+
+    async def get_or_compute(
+        self, text: str, compute: Callable[[], Awaitable[List[float]]]
+    ) -> List[float]:
+        key = self.key(text)
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            EMBEDDING_CACHE_LOOKUPS.labels(tier="inflight", result="hit").inc()
+            return list(await asyncio.shield(inflight))
+
+        fut = asyncio.get_running_loop().create_future()
+        self._inflight[key] = fut
+        try:
+            embedding = await self.get(key)
+            computed = embedding is None
+            if computed:
+                embedding = await compute()
+        except asyncio.CancelledError:
+            fut.cancel()
+            raise
+        except Exception as exc:
+            fut.set_exception(exc)
+            # Waiters handle the failure themselves; don't warn about it here
+            fut.exception()
+            raise
+        else:
+            fut.set_result(embedding)
+            if computed:
+                await self.put(key, embedding)
+            return embedding
+        finally:
+            del self._inflight[key]
@@ -0,0 +1,61 @@
+from typing import List, Tuple
+from uuid import UUID
+
+from psycopg_pool import AsyncConnectionPool
+
+from app.embed.micro_batcher import MicroBatcher
+
+EmbeddingRow = Tuple[str, UUID, List[float]]
+
+
+def to_pgvector_literal(vec: List[float]) -> str:
+    return "[" + ",".join(f"{x:.6f}" for x in vec) + "]"
+
+
+class EmbeddingWriter:
+    """
+    Write-behind buffer for message_embeddings over a long-lived connection pool.
+
+    Rows from concurrent `write()` calls are inserted together, one multi-row
+    INSERT per flush of up to `max_batch_size` rows or `max_wait_sec`; `write()`
+    returns only once its row's transaction has committed, so callers can ack after it.
+    """
+
+    def __init__(
+        self,
+        pool: AsyncConnectionPool,
+        model_version: str,
+        max_batch_size: int = 256,
+        max_wait_sec: float = 0.02,
+    ) -> None:
+        self._pool = pool
+        self._model_version = model_version
+        self._batcher: MicroBatcher[EmbeddingRow, None] = MicroBatcher(
+            self._flush, max_batch_size=max_batch_size, max_wait_sec=max_wait_sec
+        )
+
+    async def write(self, org_id: str, message_id: UUID, embedding: List[float]) -> None:
+        await self._batcher.submit((org_id, message_id, embedding))
+
+    async def _flush(self, rows: List[EmbeddingRow]) -> List[None]:
+        async with self._pool.connection() as conn:
+            async with conn.cursor() as cur:
+                await cur.execute(
+                    """
+                    INSERT INTO message_embeddings (org_id, message_id, model_version, embedding)
+                    SELECT r.org_id, r.message_id, %s, r.embedding::vector
+                    FROM unnest(%s::text[], %s::uuid[], %s::text[]) AS r(org_id, message_id, embedding)
+                    ON CONFLICT (org_id, message_id, model_version) DO NOTHING
+                    """,
+                    (
+                        self._model_version,
+                        [org_id for org_id, _, _ in rows],
+                        [str(message_id) for _, message_id, _ in rows],
+                        [to_pgvector_literal(emb) for _, _, emb in rows],
+                    ),
+                )
+        # The pool's connection context committed on exit
+        return [None] * len(rows)
+
+    async def close(self) -> None:
+        await self._batcher.close()
@@ -0,0 +1,74 @@
+import asyncio
+from typing import Awaitable, Callable, Generic, List, Optional, Set, Tuple, TypeVar
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+class MicroBatcher(Generic[T, R]):
+    """
+    Coalesces concurrent `submit()` calls into calls of `fn` on up to `max_batch_size`
+    items, waiting at most `max_wait_sec` after the first item of a batch arrives.
+
+    Results fan back out to each submitter. If a batch call fails, every submitter gets
+    the error, unless `should_split(exc)` says the failure may come from a single bad
+    input: then the items are retried one by one so it only fails its own submitter.
+    """
+
+    def __init__(
+        self,
+        fn: Callable[[List[T]], Awaitable[List[R]]],
+        max_batch_size: int = 32,
+        max_wait_sec: float = 0.01,
+        should_split: Optional[Callable[[Exception], bool]] = None,
+    ):
+        self._fn = fn
+        self._max_batch_size = max(1, max_batch_size)
+        self._max_wait_sec = max_wait_sec
+        self._should_split = should_split
+        self._pending: List[Tuple[T, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def submit(self, item: T) -> R:
+        fut = asyncio.get_running_loop().create_future()
+        self._pending.append((item, fut))
+        if len(self._pending) >= self._max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self._max_wait_sec, self._flush)
+        return await fut
+
+    async def close(self) -> None:
+        self._flush()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+        task = asyncio.create_task(self._run(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: List[Tuple[T, asyncio.Future]]) -> None:
+        try:
+            results = await self._fn([item for item, _ in batch])
+            if len(results) != len(batch):
+                raise RuntimeError(f"batch returned {len(results)} results for {len(batch)} items")
+        except Exception as exc:
+            if len(batch) > 1 and self._should_split is not None and self._should_split(exc):
+                await asyncio.gather(*(self._run([entry]) for entry in batch))
+                return
+            for _, fut in batch:
+                if not fut.done():
+                    fut.set_exception(exc)
+            return
+
+        for (_, fut), result in zip(batch, results):
+            if not fut.done():
+                fut.set_result(result)
@@ -0,0 +1,19 @@
+import importlib
+
+from app.embed.providers.base import EmbeddingProvider
+
+# EMBED_PROVIDER -> "module:Class"; imported on demand so a provider's dependencies
+# (e.g. onnxruntime for "local") are only needed where it is selected.
+PROVIDERS = {
+    "stub": "app.embed.providers.stub:StubProvider",
+    "tei": "app.embed.providers.tei:TeiProvider",
+    "local": "app.embed.providers.local:LocalOnnxProvider",
+}
+
+
+def create_provider(name: str) -> EmbeddingProvider:
+    name = name.strip().lower()
+    if name not in PROVIDERS:
+        raise ValueError(f"EMBED_PROVIDER must be one of {sorted(PROVIDERS)}, got {name!r}")
+    module_name, class_name = PROVIDERS[name].split(":")
+    return getattr(importlib.import_module(module_name), class_name)()
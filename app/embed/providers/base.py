@@ -0,0 +1,129 @@
+import asyncio
+import os
+from abc import ABC, abstractmethod
+from typing import List, Optional
+from uuid import UUID
+
+from nats.js.client import JetStreamContext
+from nats.js.kv import KeyValue
+
+from app.core.nats_client import bind_or_create_kv
+from app.embed.dim_reduction import EMBED_MODEL_DIM
+from app.embed.embedding_cache import EmbeddingCache
+from app.embed.micro_batcher import MicroBatcher
+from app.embed.text_prep import l2_normalize, mean_pool, split_for_embedding
+
+# Long texts: approximate token budget per model input, and what to do past it
+# ("truncate" keeps the start; "chunk" embeds up to EMBED_MAX_CHUNKS pieces and mean-pools them)
+EMBED_MAX_TOKENS = int(os.getenv("EMBED_MAX_TOKENS", "512"))
+EMBED_LONG_TEXT_STRATEGY = os.getenv("EMBED_LONG_TEXT_STRATEGY", "truncate").strip().lower()
+EMBED_MAX_CHUNKS = int(os.getenv("EMBED_MAX_CHUNKS", "8"))
+
+if EMBED_LONG_TEXT_STRATEGY not in ("truncate", "chunk"):
+    raise ValueError(f"EMBED_LONG_TEXT_STRATEGY must be 'truncate' or 'chunk', got {EMBED_LONG_TEXT_STRATEGY!r}")
+
+# Content-addressed embedding cache: local LRU (0 disables) and optional shared KV tier
+EMBED_CACHE_MAX_BYTES = int(os.getenv("EMBED_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+EMBED_CACHE_KV_BUCKET = os.getenv("EMBED_CACHE_KV_BUCKET", "").strip()
+EMBED_CACHE_KV_TTL_SEC = float(os.getenv("EMBED_CACHE_KV_TTL_SEC", str(7 * 24 * 3600)))
+
+
+async def embedding_cache_bucket(js: JetStreamContext) -> KeyValue:
+    return await bind_or_create_kv(js, EMBED_CACHE_KV_BUCKET, EMBED_CACHE_KV_TTL_SEC or None)
+
+
+class EmbeddingProvider(ABC):
+    """
+    Turns message text into a unit-length EMBED_MODEL_DIM vector for `model_version`.
+
+    `embed` may raise CircuitOpenError (with `retry_after`) to ask the consumer to NAK the
+    message for later; any other exception leaves it unacked for redelivery.
+    """
+
+    name = ""
+    default_model_version = ""
+
+    def __init__(self) -> None:
+        self.model_version = os.getenv("EMBED_MODEL_VERSION", self.default_model_version)
+        self.dim = EMBED_MODEL_DIM
+
+    async def start(self, js: JetStreamContext) -> None:
+        pass
+
+    @abstractmethod
+    async def embed(self, text: str, org_id: str, message_id: UUID) -> List[float]:
+        raise NotImplementedError
+
+    async def close(self) -> None:
+        pass
+
+    def describe(self) -> str:
+        return f"provider={self.name}, model={self.model_version}"
+
+
+class BatchedEmbeddingProvider(EmbeddingProvider):
+    """
+    Base for model-backed providers: texts go through the content-addressed cache,
+    long-text truncation/chunking and a MicroBatcher in front of `embed_batch`.
+    Cached vectors are full-size, before any dimension reduction.
+    """
+
+    max_batch_size = 32
+    max_batch_wait_ms = 10.0
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._batcher: MicroBatcher[str, List[float]] = MicroBatcher(
+            self._embed_checked,
+            max_batch_size=self.max_batch_size,
+            max_wait_sec=self.max_batch_wait_ms / 1000.0,
+            should_split=self.is_input_error,
+        )
+        self.cache: Optional[EmbeddingCache] = None
+
+    async def start(self, js: JetStreamContext) -> None:
+        if EMBED_CACHE_MAX_BYTES > 0 or EMBED_CACHE_KV_BUCKET:
+            cache_kv = await embedding_cache_bucket(js) if EMBED_CACHE_KV_BUCKET else None
+            self.cache = EmbeddingCache(self.model_version, max_bytes=EMBED_CACHE_MAX_BYTES, kv=cache_kv)
+
+    @abstractmethod
+    async def embed_batch(self, texts: List[str]) -> List[List[float]]:
+        raise NotImplementedError
+
+    def is_input_error(self, exc: Exception) -> bool:
+        # True when `embed_batch` failed because of one of its texts rather than the model
+        # or its transport; only then is a failed batch retried text by text.
+        return False
+
+    async def _embed_checked(self, texts: List[str]) -> List[List[float]]:
+        out = []
+        for vector in await self.embed_batch(texts):
+            emb = [float(x) for x in vector]
+            if len(emb) != self.dim:
+                raise RuntimeError(
+                    f"{self.name} embedding dimension mismatch: expected {self.dim}, got {len(emb)}"
+                )
+            out.append(l2_normalize(emb))
+        return out
+
+    async def embed_text(self, text: str) -> List[float]:
+        pieces = split_for_embedding(text, EMBED_MAX_TOKENS, EMBED_LONG_TEXT_STRATEGY, EMBED_MAX_CHUNKS)
+        if len(pieces) == 1:
+            return await self._batcher.submit(pieces[0][0])
+        # Submitted together so the chunks share batches with each other and other messages
+        vectors = await asyncio.gather(*(self._batcher.submit(piece) for piece, _ in pieces))
+        return mean_pool(vectors, [count for _, count in pieces])
+
+    async def embed(self, text: str, org_id: str, message_id: UUID) -> List[float]:
+        if self.cache is None:
+            return await self.embed_text(text)
+        return await self.cache.get_or_compute(text, lambda: self.embed_text(text))
+
+    async def close(self) -> None:
+        await self._batcher.close()
+
+    def describe(self) -> str:
+        return (
+            f"{super().describe()}, batch<={self.max_batch_size}/{self.max_batch_wait_ms}ms, "
+            f"cache={'on' if self.cache is not None else 'off'}"
+        )
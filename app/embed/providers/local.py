@@ -0,0 +1,104 @@
+import asyncio
+import os
+from typing import Any, List
+
+from nats.js.client import JetStreamContext
+
+from app.embed.providers.base import BatchedEmbeddingProvider
+
+# In-process CPU inference with ONNX Runtime. EMBED_LOCAL_MODEL_DIR holds an exported
+# encoder (e.g. an int8-quantized BAAI/bge-base-en-v1.5) and its tokenizer.json.
+EMBED_LOCAL_MODEL_DIR = os.getenv("EMBED_LOCAL_MODEL_DIR", "/models/bge-base-en-v1.5")
+EMBED_LOCAL_MODEL_FILE = os.getenv("EMBED_LOCAL_MODEL_FILE", "model_quantized.onnx")
+EMBED_LOCAL_THREADS = int(os.getenv("EMBED_LOCAL_THREADS", "0"))  # 0 = onnxruntime default
+EMBED_LOCAL_MAX_SEQ_LEN = int(os.getenv("EMBED_LOCAL_MAX_SEQ_LEN", "512"))
+EMBED_LOCAL_MAX_BATCH_SIZE = int(os.getenv("EMBED_LOCAL_MAX_BATCH_SIZE", "16"))
+EMBED_LOCAL_MAX_BATCH_WAIT_MS = float(os.getenv("EMBED_LOCAL_MAX_BATCH_WAIT_MS", "10"))
+# bge models use the [CLS] hidden state; sentence-transformers models mostly mean-pool
+EMBED_LOCAL_POOLING = os.getenv("EMBED_LOCAL_POOLING", "cls").strip().lower()
+
+if EMBED_LOCAL_POOLING not in ("cls", "mean"):
+    raise ValueError(f"EMBED_LOCAL_POOLING must be 'cls' or 'mean', got {EMBED_LOCAL_POOLING!r}")
+
+
+class LocalOnnxProvider(BatchedEmbeddingProvider):
+    """
+    Batched inference on the embedder's own CPU; no TEI round trip.
+
+    onnxruntime, tokenizers and numpy are optional (requirements-local.txt) and only
+    imported when this provider starts.
+    """
+
+    name = "local"
+    default_model_version = "BAAI/bge-base-en-v1.5@onnx-int8"
+    max_batch_size = EMBED_LOCAL_MAX_BATCH_SIZE
+    max_batch_wait_ms = EMBED_LOCAL_MAX_BATCH_WAIT_MS
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._np: Any = None
+        self._session: Any = None
+        self._tokenizer: Any = None
+        self._input_names: List[str] = []
+        # One batch at a time: the session already spreads each run over EMBED_LOCAL_THREADS
+        self._run_lock = asyncio.Lock()
+
+    async def start(self, js: JetStreamContext) -> None:
+        try:
+            import numpy as np
+            import onnxruntime as ort
+            from tokenizers import Tokenizer
+        except ImportError as exc:
+            raise RuntimeError(
+                "EMBED_PROVIDER=local needs onnxruntime, tokenizers and numpy "
+                "(pip install -r requirements-local.txt)"
+            ) from exc
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if EMBED_LOCAL_THREADS > 0:
+            options.intra_op_num_threads = EMBED_LOCAL_THREADS
+
+        self._np = np
+        self._session = ort.InferenceSession(
+            os.path.join(EMBED_LOCAL_MODEL_DIR, EMBED_LOCAL_MODEL_FILE),
+            sess_options=options,
+            providers=["CPUExecutionProvider"],
+        )
+        self._input_names = [i.name for i in self._session.get_inputs()]
+
+        self._tokenizer = Tokenizer.from_file(os.path.join(EMBED_LOCAL_MODEL_DIR, "tokenizer.json"))
+        self._tokenizer.enable_truncation(max_length=EMBED_LOCAL_MAX_SEQ_LEN)
+        self._tokenizer.enable_padding()
+
+        await super().start(js)
+
+    def _infer(self, texts: List[str]) -> List[List[float]]:
+        np = self._np
+        encodings = self._tokenizer.encode_batch(texts)
+        feeds = {
+            "input_ids": np.array([e.ids for e in encodings], dtype=np.int64),
+            "attention_mask": np.array([e.attention_mask for e in encodings], dtype=np.int64),
+            "token_type_ids": np.array([e.type_ids for e in encodings], dtype=np.int64),
+        }
+        hidden = self._session.run(None, {name: feeds[name] for name in self._input_names})[0]
+
+        if EMBED_LOCAL_POOLING == "cls":
+            pooled = hidden[:, 0]
+        else:
+            mask = feeds["attention_mask"][:, :, None].astype(hidden.dtype)
+            pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        return pooled.tolist()
+
+    async def embed_batch(self, texts: List[str]) -> List[List[float]]:
+        if self._session is None:
+            raise RuntimeError("local provider used before start()")
+        async with self._run_lock:
+            # onnxruntime releases the GIL, so the event loop keeps publishing and acking meanwhile
+            return await asyncio.to_thread(self._infer, texts)
+
+    def describe(self) -> str:
+        return (
+            f"{super().describe()}, model_path={os.path.join(EMBED_LOCAL_MODEL_DIR, EMBED_LOCAL_MODEL_FILE)}, "
+            f"pooling={EMBED_LOCAL_POOLING}, threads={EMBED_LOCAL_THREADS or 'auto'}"
+        )
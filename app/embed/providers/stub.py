@@ -0,0 +1,28 @@
+import hashlib
+import random
+from typing import List
+from uuid import UUID
+
+from app.embed.providers.base import EmbeddingProvider
+from app.embed.text_prep import l2_normalize
+
+
+def stable_seed(*parts: str) -> int:
+    h = hashlib.sha256("::".join(parts).encode("utf-8")).digest()
+    return int.from_bytes(h[:8], "big", signed=False)
+
+
+def stub_embedding(text: str, org_id: str, message_id: str, dim: int) -> List[float]:
+    seed = stable_seed(org_id, message_id, text[:128])
+    rng = random.Random(seed)
+    return [rng.uniform(-1.0, 1.0) for _ in range(dim)]
+
+
+class StubProvider(EmbeddingProvider):
+    """Deterministic pseudo-random vectors per message; for development and fallbacks."""
+
+    name = "stub"
+    default_model_version = "stub-768-v1"
+
+    async def embed(self, text: str, org_id: str, message_id: UUID) -> List[float]:
+        return l2_normalize(stub_embedding(text, org_id, str(message_id), self.dim))
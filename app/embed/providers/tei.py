@@ -0,0 +1,146 @@
+import os
+from typing import List
+from uuid import UUID
+
+from nats.js.client import JetStreamContext
+
+from app.embed.circuit_breaker import CircuitBreaker, CircuitOpenError
+from app.embed.providers.base import BatchedEmbeddingProvider
+from app.embed.providers.stub import StubProvider
+from app.embed.tei_client import TeiClient, TeiInputError
+
+TEI_URL = os.getenv("TEI_URL", "http://tei:80").rstrip("/")
+# Comma-separated TEI replicas to balance across; TEI_URL alone when unset
+TEI_URLS = [u.strip().rstrip("/") for u in os.getenv("TEI_URLS", "").split(",") if u.strip()] or [TEI_URL]
+TEI_TIMEOUT_SEC = float(os.getenv("TEI_TIMEOUT_SEC", "10"))
+TEI_CONNECT_TIMEOUT_SEC = float(os.getenv("TEI_CONNECT_TIMEOUT_SEC", "2"))
+# Concurrent /embed requests (and pooled keep-alive connections) to TEI
+TEI_MAX_CONCURRENCY = int(os.getenv("TEI_MAX_CONCURRENCY", "8"))
+TEI_MAX_RETRIES = int(os.getenv("TEI_MAX_RETRIES", "2"))
+TEI_RETRY_BACKOFF_MS = float(os.getenv("TEI_RETRY_BACKOFF_MS", "50"))
+TEI_RETRY_BACKOFF_MAX_MS = float(os.getenv("TEI_RETRY_BACKOFF_MAX_MS", "1000"))
+# Micro-batching: one /embed call per TEI_MAX_BATCH_SIZE texts or TEI_MAX_BATCH_WAIT_MS
+TEI_MAX_BATCH_SIZE = int(os.getenv("TEI_MAX_BATCH_SIZE", "32"))
+TEI_MAX_BATCH_WAIT_MS = float(os.getenv("TEI_MAX_BATCH_WAIT_MS", "10"))
+# Per-replica health: GET /health every TEI_HEALTH_CHECK_INTERVAL_SEC, and ejection after
+# TEI_EJECT_CONSECUTIVE_FAILURES failed requests in a row (TEI_EJECT_BASE_SEC, doubling to TEI_EJECT_MAX_SEC)
+TEI_HEALTH_CHECK_INTERVAL_SEC = float(os.getenv("TEI_HEALTH_CHECK_INTERVAL_SEC", "5"))
+TEI_EJECT_CONSECUTIVE_FAILURES = int(os.getenv("TEI_EJECT_CONSECUTIVE_FAILURES", "3"))
+TEI_EJECT_BASE_SEC = float(os.getenv("TEI_EJECT_BASE_SEC", "10"))
+TEI_EJECT_MAX_SEC = float(os.getenv("TEI_EJECT_MAX_SEC", "120"))
+
+# Circuit breaker around TEI: opens at TEI_BREAKER_FAILURE_RATE over the last
+# TEI_BREAKER_WINDOW calls, then rejects calls for TEI_BREAKER_OPEN_SEC before probing.
+# While open, messages use the stub ("fallback", if EMBED_FALLBACK_TO_STUB allows it)
+# or are NAK'd with a delay ("nak").
+TEI_BREAKER_WINDOW = int(os.getenv("TEI_BREAKER_WINDOW", "20"))
+TEI_BREAKER_MIN_CALLS = int(os.getenv("TEI_BREAKER_MIN_CALLS", "10"))
+TEI_BREAKER_FAILURE_RATE = float(os.getenv("TEI_BREAKER_FAILURE_RATE", "0.5"))
+TEI_BREAKER_OPEN_SEC = float(os.getenv("TEI_BREAKER_OPEN_SEC", "10"))
+TEI_BREAKER_HALF_OPEN_PROBES = int(os.getenv("TEI_BREAKER_HALF_OPEN_PROBES", "1"))
+TEI_BREAKER_OPEN_ACTION = os.getenv("TEI_BREAKER_OPEN_ACTION", "fallback").strip().lower()
+TEI_BREAKER_NAK_DELAY_SEC = float(os.getenv("TEI_BREAKER_NAK_DELAY_SEC", "5"))
+
+if TEI_BREAKER_OPEN_ACTION not in ("fallback", "nak"):
+    raise ValueError(f"TEI_BREAKER_OPEN_ACTION must be 'fallback' or 'nak', got {TEI_BREAKER_OPEN_ACTION!r}")
+
+EMBED_FALLBACK_TO_STUB = os.getenv("EMBED_FALLBACK_TO_STUB", "true").lower() in (
+    "1",
+    "true",
+    "yes",
+)
+
+
+class TeiProvider(BatchedEmbeddingProvider):
+    """Embeds through a Hugging Face text-embeddings-inference server."""
+
+    name = "tei"
+    default_model_version = "BAAI/bge-base-en-v1.5@tei"
+    max_batch_size = TEI_MAX_BATCH_SIZE
+    max_batch_wait_ms = TEI_MAX_BATCH_WAIT_MS
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.client = TeiClient(
+            TEI_URLS,
+            timeout_sec=TEI_TIMEOUT_SEC,
+            connect_timeout_sec=TEI_CONNECT_TIMEOUT_SEC,
+            max_concurrency=TEI_MAX_CONCURRENCY,
+            max_retries=TEI_MAX_RETRIES,
+            backoff_base_sec=TEI_RETRY_BACKOFF_MS / 1000.0,
+            backoff_max_sec=TEI_RETRY_BACKOFF_MAX_MS / 1000.0,
+            eject_consecutive_failures=TEI_EJECT_CONSECUTIVE_FAILURES,
+            eject_base_sec=TEI_EJECT_BASE_SEC,
+            eject_max_sec=TEI_EJECT_MAX_SEC,
+            health_check_interval_sec=TEI_HEALTH_CHECK_INTERVAL_SEC,
+        )
+        self.breaker = CircuitBreaker(
+            "tei",
+            window=TEI_BREAKER_WINDOW,
+            min_calls=TEI_BREAKER_MIN_CALLS,
+            failure_rate=TEI_BREAKER_FAILURE_RATE,
+            open_sec=TEI_BREAKER_OPEN_SEC,
+            half_open_probes=TEI_BREAKER_HALF_OPEN_PROBES,
+        )
+        self.fallback = StubProvider()
+
+    async def start(self, js: JetStreamContext) -> None:
+        if len(TEI_URLS) > 1:
+            self.client.start_health_checks()
+        await super().start(js)
+
+    async def embed_batch(self, texts: List[str]) -> List[List[float]]:
+        return await self.client.embed(texts)
+
+    def is_input_error(self, exc: Exception) -> bool:
+        return isinstance(exc, TeiInputError)
+
+    async def _embed_checked(self, texts: List[str]) -> List[List[float]]:
+        if not self.breaker.allow():
+            raise CircuitOpenError("TEI circuit is open")
+
+        try:
+            out = await super()._embed_checked(texts)
+        except TeiInputError:
+            # TEI answered; the input was the problem
+            self.breaker.record_success()
+            raise
+        except Exception:
+            self.breaker.record_failure()
+            raise
+        except BaseException:
+            # Cancelled: says nothing about TEI, but a half-open probe must not stay taken
+            self.breaker.release_probe()
+            raise
+
+        self.breaker.record_success()
+        return out
+
+    async def embed(self, text: str, org_id: str, message_id: UUID) -> List[float]:
+        """
+        Raises CircuitOpenError while TEI's circuit is open, unless TEI_BREAKER_OPEN_ACTION=fallback
+        and EMBED_FALLBACK_TO_STUB both allow the stub.
+        """
+        try:
+            # Skip the batcher (and cache single-flight) outright while the circuit is open
+            if self.breaker.is_open():
+                raise CircuitOpenError("TEI circuit is open")
+            return await super().embed(text, org_id, message_id)
+        except CircuitOpenError:
+            if TEI_BREAKER_OPEN_ACTION == "nak" or not EMBED_FALLBACK_TO_STUB:
+                # Hand it back to JetStream for later rather than waiting on a TEI that is down
+                raise CircuitOpenError("TEI circuit is open", retry_after=TEI_BREAKER_NAK_DELAY_SEC)
+            return await self.fallback.embed(text, org_id, message_id)
+        except Exception as exc:
+            if not EMBED_FALLBACK_TO_STUB:
+                raise
+
+            print(f"⚠️  TEI embed failed, falling back to stub: {exc}")
+            return await self.fallback.embed(text, org_id, message_id)
+
+    async def close(self) -> None:
+        await super().close()
+        await self.client.aclose()
+
+    def describe(self) -> str:
+        return f"{super().describe()}, tei={','.join(TEI_URLS)}, concurrency={TEI_MAX_CONCURRENCY}"
@@ -0,0 +1,95 @@
+import asyncio
+import os
+from typing import Awaitable, Callable, Set
+
+from nats import errors as nats_errors
+from nats.aio.msg import Msg
+from nats.js.client import JetStreamContext
+
+from app.core.embedder_consumer_config import (
+    EMBED_MAX_IN_FLIGHT,
+    EMBEDDER_ACK_WAIT_SEC,
+    EMBEDDER_DURABLE,
+    embedder_pull_consumer_config,
+)
+
+# Pull mode: fetch loops and max messages per fetch
+EMBED_PULL_WORKERS = int(os.getenv("EMBED_PULL_WORKERS", "2"))
+EMBED_PULL_BATCH = int(os.getenv("EMBED_PULL_BATCH", "32"))
+
+
+async def keep_in_progress(msg: Msg, interval: float) -> None:
+    # Resets ack_wait while a slow batch is still being worked on, so it isn't redelivered
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await msg.in_progress()
+        except Exception as e:
+            print(f"⚠️  in_progress ack failed: {e}")
+
+
+async def run_pull_consumer(
+    js: JetStreamContext,
+    stream: str,
+    handler: Callable[[Msg], Awaitable[None]],
+    durable: str = EMBEDDER_DURABLE,
+    workers: int = EMBED_PULL_WORKERS,
+    batch: int = EMBED_PULL_BATCH,
+    max_in_flight: int = EMBED_MAX_IN_FLIGHT,
+    ack_wait_sec: float = EMBEDDER_ACK_WAIT_SEC,
+) -> None:
+    """
+    Handles messages of a pull consumer with `workers` fetch loops.
+
+    A worker only fetches as many messages as there are free in-flight slots (up to
+    `batch`), so at most `max_in_flight` are ever handled at once and nothing waits in
+    client buffers burning its ack_wait. `handler` acks; messages it fails are left
+    for JetStream to redeliver.
+
+    The durable is created or updated to this process's settings first: binding alone
+    would keep whatever ack_wait and max_ack_pending an existing durable was made with.
+    """
+    await js.add_consumer(stream, embedder_pull_consumer_config(durable, max_in_flight, ack_wait_sec))
+
+    # One subscription (inbox) per worker so concurrent fetches never share a reply queue
+    subs = [await js.pull_subscribe_bind(durable=durable, stream=stream) for _ in range(max(1, workers))]
+
+    slots = asyncio.Semaphore(max(1, max_in_flight))
+    handlers: Set[asyncio.Task] = set()
+
+    async def handle(msg: Msg) -> None:
+        heartbeat = asyncio.create_task(keep_in_progress(msg, ack_wait_sec / 3.0))
+        try:
+            await handler(msg)
+        except Exception as e:
+            # Not acked; JetStream redelivers after ack_wait
+            print(f"❌ embedder failed: {e}")
+        finally:
+            heartbeat.cancel()
+            slots.release()
+
+    async def worker(sub) -> None:
+        while True:
+            await slots.acquire()
+            taken = 1
+            while taken < batch and not slots.locked():
+                await slots.acquire()
+                taken += 1
+
+            try:
+                msgs = await sub.fetch(batch=taken, timeout=1.0)
+            except nats_errors.TimeoutError:
+                msgs = []
+            except Exception as e:
+                print(f"⚠️  fetch failed: {e}")
+                msgs = []
+                await asyncio.sleep(0.5)
+
+            for _ in range(taken - len(msgs)):
+                slots.release()
+            for msg in msgs:
+                task = asyncio.create_task(handle(msg))
+                handlers.add(task)
+                task.add_done_callback(handlers.discard)
+
+    await asyncio.gather(*(worker(sub) for sub in subs))
@@ -0,0 +1,226 @@
+import asyncio
+import random
+import time
+from typing import Callable, List, Optional, Sequence, Set, Union
+
+import httpx
+from prometheus_client import Gauge
+
+# Worth another attempt: TEI queue full / overloaded, or a proxy in front of it restarting
+RETRYABLE_STATUS = {429, 502, 503, 504}
+
+TEI_ENDPOINT_OUTSTANDING = Gauge(
+    "embedder_tei_endpoint_outstanding",
+    "/embed requests sent or waiting for a slot, per TEI endpoint.",
+    ["endpoint"],
+)
+TEI_ENDPOINT_AVAILABLE = Gauge(
+    "embedder_tei_endpoint_available",
+    "1 while a TEI endpoint passes health checks and is not ejected, else 0.",
+    ["endpoint"],
+)
+
+
+class TeiInputError(RuntimeError):
+    """TEI rejected the request itself (4xx); retrying or tripping a breaker won't help."""
+
+
+class TeiEndpoint:
+    """One TEI replica: its connection pool, load and health."""
+
+    def __init__(
+        self,
+        base_url: str,
+        timeout_sec: float,
+        connect_timeout_sec: float,
+        max_concurrency: int,
+        transport: Optional[httpx.AsyncBaseTransport],
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.outstanding = 0
+        self.healthy = True
+        self.consecutive_failures = 0
+        self.ejections = 0
+        self.ejected_until = 0.0
+        self.slots = asyncio.Semaphore(max(1, max_concurrency))
+        self.client = httpx.AsyncClient(
+            base_url=self.base_url,
+            timeout=httpx.Timeout(timeout_sec, connect=connect_timeout_sec),
+            limits=httpx.Limits(
+                max_connections=max(1, max_concurrency),
+                max_keepalive_connections=max(1, max_concurrency),
+            ),
+            transport=transport,
+        )
+        TEI_ENDPOINT_OUTSTANDING.labels(endpoint=self.base_url).set(0)
+        TEI_ENDPOINT_AVAILABLE.labels(endpoint=self.base_url).set(1)
+
+    def available(self, now: float) -> bool:
+        return self.healthy and now >= self.ejected_until
+
+
+class TeiClient:
+    """
+    Async client for TEI's /embed across one or more replicas, each over its own
+    keep-alive connection pool.
+
+    Each request goes to the available endpoint with the fewest outstanding requests.
+    An endpoint is unavailable while its /health check fails or after
+    `eject_consecutive_failures` failed requests in a row, which eject it for
+    `eject_base_sec`, doubling per repeat ejection up to `eject_max_sec`. If no endpoint
+    is available, all of them are tried rather than none.
+
+    At most `max_concurrency` requests are in flight per endpoint; transport errors and
+    RETRYABLE_STATUS responses are retried up to `max_retries` times, on another endpoint
+    when there is one, otherwise after full-jitter exponential backoff, without holding a
+    concurrency slot while waiting.
+    With `truncate`, TEI cuts over-long inputs to the model's limit instead of rejecting them.
+    """
+
+    def __init__(
+        self,
+        base_urls: Union[str, Sequence[str]],
+        timeout_sec: float = 10.0,
+        connect_timeout_sec: float = 2.0,
+        max_concurrency: int = 8,
+        max_retries: int = 2,
+        backoff_base_sec: float = 0.05,
+        backoff_max_sec: float = 1.0,
+        truncate: bool = True,
+        eject_consecutive_failures: int = 3,
+        eject_base_sec: float = 10.0,
+        eject_max_sec: float = 120.0,
+        health_check_interval_sec: float = 5.0,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        if isinstance(base_urls, str):
+            base_urls = [base_urls]
+        if not base_urls:
+            raise ValueError("TeiClient needs at least one base URL")
+        self.endpoints = [
+            TeiEndpoint(url, timeout_sec, connect_timeout_sec, max_concurrency, transport) for url in base_urls
+        ]
+        self._truncate = truncate
+        self._max_retries = max(0, max_retries)
+        self._backoff_base_sec = backoff_base_sec
+        self._backoff_max_sec = backoff_max_sec
+        self._eject_consecutive_failures = max(1, eject_consecutive_failures)
+        self._eject_base_sec = eject_base_sec
+        self._eject_max_sec = eject_max_sec
+        self._health_check_interval_sec = health_check_interval_sec
+        self._health_task: Optional[asyncio.Task] = None
+        self._clock = clock
+
+    def start_health_checks(self) -> None:
+        if self._health_check_interval_sec > 0 and self._health_task is None:
+            self._health_task = asyncio.create_task(self._health_loop())
+
+    async def embed(self, texts: List[str]) -> List[List[float]]:
+        attempt = 0
+        tried: Set[TeiEndpoint] = set()
+        while True:
+            endpoint = self._pick(tried)
+            if endpoint in tried:
+                # Nowhere new to go; give this one a moment
+                await asyncio.sleep(self._backoff(attempt - 1))
+            tried.add(endpoint)
+            try:
+                resp = await self._post(endpoint, texts)
+                if resp.status_code in RETRYABLE_STATUS:
+                    raise httpx.HTTPStatusError(
+                        f"TEI returned {resp.status_code}", request=resp.request, response=resp
+                    )
+            except (httpx.TransportError, httpx.HTTPStatusError) as exc:
+                self._record_failure(endpoint)
+                if attempt >= self._max_retries:
+                    raise RuntimeError(f"TEI request failed: {exc}") from exc
+                attempt += 1
+                continue
+
+            if resp.status_code >= 500:
+                self._record_failure(endpoint)
+                raise RuntimeError(f"TEI request failed: {resp.status_code} {resp.text[:200]}")
+            # The endpoint answered; a 4xx is the input's fault, not the replica's
+            endpoint.consecutive_failures = 0
+            endpoint.ejections = 0
+            break
+
+        if 400 <= resp.status_code < 500:
+            raise TeiInputError(f"TEI rejected request: {resp.status_code} {resp.text[:200]}")
+
+        parsed = resp.json()
+        if not (isinstance(parsed, list) and len(parsed) == len(texts) and all(isinstance(v, list) for v in parsed)):
+            raise RuntimeError("Unexpected TEI response format")
+        return parsed
+
+    def _pick(self, tried: Set[TeiEndpoint]) -> TeiEndpoint:
+        now = self._clock()
+        candidates = [e for e in self.endpoints if e.available(now)] or self.endpoints
+        fresh = [e for e in candidates if e not in tried]
+        pool = fresh or candidates
+        least = min(e.outstanding for e in pool)
+        return random.choice([e for e in pool if e.outstanding == least])
+
+    async def _post(self, endpoint: TeiEndpoint, texts: List[str]) -> httpx.Response:
+        # Counted while waiting for a slot too, so a saturated replica stops attracting work
+        endpoint.outstanding += 1
+        TEI_ENDPOINT_OUTSTANDING.labels(endpoint=endpoint.base_url).set(endpoint.outstanding)
+        try:
+            async with endpoint.slots:
+                return await endpoint.client.post("/embed", json={"inputs": texts, "truncate": self._truncate})
+        finally:
+            endpoint.outstanding -= 1
+            TEI_ENDPOINT_OUTSTANDING.labels(endpoint=endpoint.base_url).set(endpoint.outstanding)
+
+    def _record_failure(self, endpoint: TeiEndpoint) -> None:
+        endpoint.consecutive_failures += 1
+        if endpoint.consecutive_failures < self._eject_consecutive_failures or len(self.endpoints) == 1:
+            return
+        eject_sec = min(self._eject_max_sec, self._eject_base_sec * (2 ** endpoint.ejections))
+        endpoint.ejections += 1
+        endpoint.consecutive_failures = 0
+        endpoint.ejected_until = self._clock() + eject_sec
+        TEI_ENDPOINT_AVAILABLE.labels(endpoint=endpoint.base_url).set(0)
+        print(f"⚠️  TEI endpoint {endpoint.base_url} ejected for {eject_sec:.0f}s")
+
+    async def check_health(self) -> None:
+        now = self._clock()
+        for endpoint, ok in zip(
+            self.endpoints, await asyncio.gather(*(self._probe(e) for e in self.endpoints))
+        ):
+            if ok and not endpoint.healthy:
+                print(f"✅ TEI endpoint {endpoint.base_url} healthy again")
+            elif not ok and endpoint.healthy:
+                print(f"⚠️  TEI endpoint {endpoint.base_url} failed its health check")
+            endpoint.healthy = ok
+            TEI_ENDPOINT_AVAILABLE.labels(endpoint=endpoint.base_url).set(1 if endpoint.available(now) else 0)
+
+    async def _probe(self, endpoint: TeiEndpoint) -> bool:
+        try:
+            resp = await endpoint.client.get("/health")
+        except httpx.HTTPError:
+            return False
+        return resp.status_code == 200
+
+    async def _health_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self._health_check_interval_sec)
+            try:
+                await self.check_health()
+            except Exception as exc:
+                print(f"❌ TEI health check failed: {exc}")
+
+    def _backoff(self, attempt: int) -> float:
+        return random.uniform(0.0, min(self._backoff_max_sec, self._backoff_base_sec * (2 ** attempt)))
+
+    async def aclose(self) -> None:
+        if self._health_task is not None:
+            self._health_task.cancel()
+            try:
+                await self._health_task
+            except asyncio.CancelledError:
+                pass
+            self._health_task = None
+        for endpoint in self.endpoints:
+            await endpoint.client.aclose()
@@ -0,0 +1,79 @@
+import math
+import re
+from typing import List, Sequence, Tuple
+
+# Approximates a WordPiece tokenizer without loading one: words and single punctuation
+# marks, with long words costing a token per 8 characters as they split into pieces.
+# Scripts written without spaces between words (CJK, kana, Hangul, Thai, Lao, Myanmar,
+# Khmer) count every character as a token, as BERT-style tokenizers split CJK; for the
+# others that overestimates, so chunks err on the short side rather than get truncated.
+_PER_CHAR = (
+    "\u0e00-\u0eff\u1000-\u109f\u1780-\u17ff\u3040-\u30ff\u3400-\u4dbf"
+    "\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff\U00020000-\U0002ffff"
+)
+_TOKEN = re.compile(rf"[{_PER_CHAR}]|[^\W{_PER_CHAR}]+|[^\w\s]")
+_CHARS_PER_PIECE = 8
+
+
+def token_spans(text: str) -> List[Tuple[int, int, int]]:
+    """(start, end, approx token count) for each word / punctuation mark."""
+    return [
+        (m.start(), m.end(), max(1, math.ceil((m.end() - m.start()) / _CHARS_PER_PIECE)))
+        for m in _TOKEN.finditer(text)
+    ]
+
+
+def approx_token_count(text: str) -> int:
+    return sum(n for _, _, n in token_spans(text))
+
+
+def split_for_embedding(
+    text: str, max_tokens: int, strategy: str = "truncate", max_chunks: int = 8
+) -> List[Tuple[str, int]]:
+    """
+    Pieces of `text` of at most ~`max_tokens` each, with their approximate token counts.
+
+    "truncate" keeps only the first piece; "chunk" keeps up to `max_chunks` consecutive
+    pieces, to be embedded separately and mean-pooled. Short text comes back unchanged.
+    """
+    spans = token_spans(text)
+    if max_tokens <= 0 or sum(n for _, _, n in spans) <= max_tokens:
+        return [(text, sum(n for _, _, n in spans))]
+
+    limit = 1 if strategy == "truncate" else max(1, max_chunks)
+    chunks: List[Tuple[str, int]] = []
+    start = spans[0][0]
+    end = start
+    count = 0
+    for s, e, n in spans:
+        if count and count + n > max_tokens:
+            chunks.append((text[start:end], count))
+            if len(chunks) == limit:
+                return chunks
+            start, count = s, 0
+        end = e
+        count += n
+    chunks.append((text[start:end], count))
+    return chunks
+
+
+def l2_normalize(vec: List[float]) -> List[float]:
+    s = 0.0
+    for x in vec:
+        s += x * x
+    if s <= 0.0:
+        return vec
+    norm = s ** 0.5
+    return [x / norm for x in vec]
+
+
+def mean_pool(vectors: Sequence[Sequence[float]], weights: Sequence[float]) -> List[float]:
+    """Token-weighted mean of chunk embeddings, renormalized to unit length."""
+    total = float(sum(weights)) or 1.0
+    dim = len(vectors[0])
+    pooled = [0.0] * dim
+    for vec, w in zip(vectors, weights):
+        scale = w / total
+        for i in range(dim):
+            pooled[i] += vec[i] * scale
+    return l2_normalize(pooled)
@@ -1,10 +1,30 @@
+import base64
+import os
+import struct
 from datetime import datetime
-from typing import Any, Dict, List, Literal
+from typing import Any, Dict, List, Literal, Optional
 from uuid import UUID
-from pydantic import BaseModel, ConfigDict, Field
+from pydantic import BaseModel, ConfigDict, Field, model_validator
 
 MODEL_CFG = ConfigDict(extra="forbid", protected_namespaces=())
 
+EmbeddingDType = Literal["float32", "float16"]
+EmbeddingStore = Literal["db", "kv"]
+
+# struct format code and item size for each wire dtype (always little-endian)
+_EMBEDDING_DTYPES = {"float32": ("f", 4), "float16": ("e", 2)}
+
+
+def encode_embedding(vec: List[float], dtype: EmbeddingDType = "float32") -> str:
+    code, _ = _EMBEDDING_DTYPES[dtype]
+    return base64.b64encode(struct.pack(f"<{len(vec)}{code}", *vec)).decode("ascii")
+
+
+def decode_embedding(data: str, dtype: EmbeddingDType = "float32") -> List[float]:
+    code, size = _EMBEDDING_DTYPES[dtype]
+    raw = base64.b64decode(data)
+    return list(struct.unpack(f"<{len(raw) // size}{code}", raw))
+
 
 class MessagePayload(BaseModel):
     model_config = MODEL_CFG
@@ -28,18 +48,77 @@ class MessageCreatedEvent(BaseModel):
 
 
 class MessageEmbeddedEvent(BaseModel):
+    """
+    Version 1 carries `embedding` as a JSON list of floats.
+    Version 2 carries `embedding_b64`, the base64 of `embedding_dim` little-endian
+    `embedding_dtype` values, which is several times smaller and cheaper to parse.
+    Version 3 is a claim check: the vector lives in `embedding_store` (see app.claim_check)
+    and only `embedding_ref` is carried, for stores that need a key.
+    Use `vector()` to read the embedding from version 1 or 2.
+    """
+
     model_config = MODEL_CFG
 
     event_type: Literal["message.embedded"] = "message.embedded"
-    event_version: int = 1
+    event_version: Literal[1, 2, 3] = 1
     event_id: UUID
     org_id: str
     message: MessagePayload
     model_version: str
     embedding_dim: int
-    embedding: List[float]
+    embedding: Optional[List[float]] = None
+    embedding_b64: Optional[str] = None
+    embedding_dtype: Optional[EmbeddingDType] = None
+    embedding_store: Optional[EmbeddingStore] = None
+    embedding_ref: Optional[str] = None
     created_at: datetime
 
+    @model_validator(mode="after")
+    def _check_embedding_encoding(self) -> "MessageEmbeddedEvent":
+        inline = (self.embedding, self.embedding_b64, self.embedding_dtype)
+        if self.event_version != 3 and (self.embedding_store is not None or self.embedding_ref is not None):
+            raise ValueError("only event_version 3 carries `embedding_store` and `embedding_ref`")
+
+        if self.event_version == 1:
+            if self.embedding is None or self.embedding_b64 is not None or self.embedding_dtype is not None:
+                raise ValueError("event_version 1 carries only `embedding`")
+        elif self.event_version == 3:
+            if any(x is not None for x in inline) or self.embedding_store is None:
+                raise ValueError("event_version 3 carries only `embedding_store` and `embedding_ref`")
+            if (self.embedding_store == "kv") != (self.embedding_ref is not None):
+                raise ValueError("`embedding_ref` is required for, and only for, embedding_store 'kv'")
+        else:
+            if self.embedding is not None or self.embedding_b64 is None or self.embedding_dtype is None:
+                raise ValueError("event_version 2 carries `embedding_b64` and `embedding_dtype`")
+            _, size = _EMBEDDING_DTYPES[self.embedding_dtype]
+            # Length check on the base64 text itself, without decoding it
+            if len(self.embedding_b64) != 4 * ((self.embedding_dim * size + 2) // 3):
+                raise ValueError("`embedding_b64` length does not match `embedding_dim`")
+        return self
+
+    def vector(self) -> List[float]:
+        if self.event_version == 3:
+            raise ValueError(f"embedding is claim-checked in {self.embedding_store!r}; resolve it from there")
+        if self.embedding is not None:
+            return list(self.embedding)
+        return decode_embedding(self.embedding_b64, self.embedding_dtype)
+
+
+def embedding_fields(
+    vec: List[float],
+    event_version: int = 1,
+    dtype: EmbeddingDType = "float32",
+) -> Dict[str, Any]:
+    """Keyword arguments for MessageEmbeddedEvent carrying `vec` in the given event version."""
+    if event_version == 1:
+        return {"event_version": 1, "embedding": vec}
+    return {"event_version": 2, "embedding_b64": encode_embedding(vec, dtype), "embedding_dtype": dtype}
+
+
+def claim_check_fields(store: EmbeddingStore, ref: Optional[str] = None) -> Dict[str, Any]:
+    """Keyword arguments for a version 3 MessageEmbeddedEvent referencing a stored vector."""
+    return {"event_version": 3, "embedding_store": store, "embedding_ref": ref}
+
 
 class MessageClusteredEvent(BaseModel):
     model_config = MODEL_CFG
@@ -60,7 +139,9 @@ class MessageClusteredEvent(BaseModel):
     
     
 def to_json_bytes(model: BaseModel) -> bytes:
-    return model.model_dump_json().encode("utf-8")
+    # Unset optional fields are omitted so that events of an older version keep
+    # exactly their original shape for consumers that forbid extra fields.
+    return model.model_dump_json(exclude_none=True).encode("utf-8")
 
 
 def parse_message_created(data: bytes) -> MessageCreatedEvent:
@@ -72,4 +153,19 @@ def parse_message_embedded(data: bytes) -> MessageEmbeddedEvent:
 
 
 def parse_message_clustered(data: bytes) -> MessageClusteredEvent:
-    return MessageClusteredEvent.model_validate_json(data)
\ No newline at end of file
+    return MessageClusteredEvent.model_validate_json(data)
+
+
+# Codec for the functions above: "pydantic" (default) or "msgspec". Both read and
+# write the same bytes and return the same pydantic models.
+EVENT_CODEC = os.getenv("EVENT_CODEC", "pydantic").strip().lower()
+
+if EVENT_CODEC == "msgspec":
+    from app.event_codec_msgspec import (  # noqa: E402,F811
+        parse_message_clustered,
+        parse_message_created,
+        parse_message_embedded,
+        to_json_bytes,
+    )
+elif EVENT_CODEC != "pydantic":
+    raise ValueError(f"EVENT_CODEC must be 'pydantic' or 'msgspec', got {EVENT_CODEC!r}")
@@ -5,19 +5,43 @@ from dotenv import load_dotenv
 from nats.aio.client import Client as NATS
 from nats.js.api import ConsumerConfig, DeliverPolicy, AckPolicy
 
+from app.core.embedder_consumer_config import (
+    EMBEDDER_CONSUMER_MODE,
+    EMBEDDER_DURABLE,
+    EMBEDDER_FILTER_SUBJECT,
+    embedder_pull_consumer_config,
+)
 from app.core.nats_client import NatsJetStreamPublisher
 
 load_dotenv()
 
 STREAM = os.getenv("JETSTREAM_STREAM", "ingress_messages")
 NATS_URL = os.getenv("NATS_URL", "nats://nats:4222")
+# Window in which JetStream drops publishes repeating a Nats-Msg-Id (client message_id)
+DUPLICATE_WINDOW_SEC = float(os.getenv("JETSTREAM_DUPLICATE_WINDOW_SEC", "120"))
 
 subjects = ["messages.>","embeddings.>","clusters.>"]
+
+def _consumer_config(durable, filt, deliver_subject=None) -> ConsumerConfig:
+    return ConsumerConfig(
+        durable_name=durable,
+        deliver_policy=DeliverPolicy.ALL,
+        ack_policy=AckPolicy.EXPLICIT,
+        ack_wait=30,
+        max_ack_pending=10_000,
+        filter_subject=filt,
+        deliver_subject=deliver_subject,
+    )
+
+
 consumers = [
-    # (durable_name, filter_subject, deliver_subject)
-    ("api_messages_v1", "messages.>", None),
-    ("embedder_v1", "messages.>", f"deliver.embedder.embedder_v1"),
-    ("clusterer_v1", "embeddings.>", None),
+    _consumer_config("api_messages_v1", "messages.>"),
+    # Only the embedder's mode gets a consumer; both would each receive every message.
+    # The pull durable is the one the embedder re-applies on startup.
+    embedder_pull_consumer_config()
+    if EMBEDDER_CONSUMER_MODE == "pull"
+    else _consumer_config(EMBEDDER_DURABLE, EMBEDDER_FILTER_SUBJECT, f"deliver.embedder.{EMBEDDER_DURABLE}"),
+    _consumer_config("clusterer_v1", "embeddings.>"),
 ]
 
 async def main():
@@ -27,7 +51,7 @@ async def main():
         subjects=subjects,
     )
     await publisher.connect()
-    await publisher.ensure_stream()
+    await publisher.ensure_stream(duplicate_window=DUPLICATE_WINDOW_SEC)
     await publisher.close()
 
     nc = NATS()
@@ -35,23 +59,14 @@ async def main():
     js = nc.jetstream()
 
     # Ensure consumers
-    for durable, filt, deliver_subject in consumers:
-        ccfg = ConsumerConfig(
-            durable_name=durable,
-            deliver_policy=DeliverPolicy.ALL,
-            ack_policy=AckPolicy.EXPLICIT,
-            ack_wait=30,
-            max_ack_pending=10_000,
-            filter_subject=filt,
-            deliver_subject=deliver_subject,
-        )
+    for ccfg in consumers:
         try:
             await js.add_consumer(STREAM, ccfg)
-            print(f"✅ created consumer {durable} filter={filt}")
+            print(f"✅ created consumer {ccfg.durable_name} filter={ccfg.filter_subject}")
         except Exception as e:
             msg = str(e).lower()
             if "already" in msg and "consumer" in msg:
-                print(f"ℹ️ consumer exists {durable}")
+                print(f"ℹ️ consumer exists {ccfg.durable_name}")
             else:
                 raise
 
@@ -0,0 +1,5 @@
+#!/bin/sh
+# Postgres entrypoint hook: applies schema.sql with vector columns sized to EMBED_DIM
+set -e
+psql -v ON_ERROR_STOP=1 -v embed_dim="${EMBED_DIM:-768}" \
+  --username "$POSTGRES_USER" --dbname "$POSTGRES_DB" -f /db/schema.sql
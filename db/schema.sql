@@ -1,6 +1,13 @@
 CREATE EXTENSION IF NOT EXISTS pgcrypto;
 CREATE EXTENSION IF NOT EXISTS vector;
 
+-- Embedding dimension, matching the embedder's EMBED_DIM:
+--   psql -v embed_dim=384 -f db/schema.sql   (db/init_schema.sh passes $EMBED_DIM)
+\if :{?embed_dim}
+\else
+  \set embed_dim 768
+\endif
+
 -- =========================
 -- Messages (immutable facts)
 -- =========================
@@ -32,7 +39,7 @@ CREATE TABLE IF NOT EXISTS message_embeddings (
   org_id        TEXT NOT NULL,
   message_id    UUID NOT NULL,
   model_version TEXT NOT NULL,
-  embedding     VECTOR(768) NOT NULL,
+  embedding     VECTOR(:embed_dim) NOT NULL,
   created_at    TIMESTAMPTZ NOT NULL DEFAULT now(),
   PRIMARY KEY (org_id, message_id, model_version)
 );
@@ -47,7 +54,7 @@ CREATE TABLE IF NOT EXISTS clusters (
   org_id             TEXT NOT NULL,
   cluster_id         UUID NOT NULL DEFAULT gen_random_uuid(),
   model_version      TEXT NOT NULL,
-  centroid_embedding VECTOR(768) NOT NULL,
+  centroid_embedding VECTOR(:embed_dim) NOT NULL,
   label              TEXT NULL,
   effective_count    BIGINT NOT NULL DEFAULT 0,
   last_activity_at   TIMESTAMPTZ NOT NULL DEFAULT now(),
@@ -97,3 +104,68 @@ CREATE INDEX IF NOT EXISTS idx_user_cluster_user
 
 CREATE INDEX IF NOT EXISTS idx_user_cluster_cluster
   ON user_cluster (org_id, cluster_id);
+
+-- =========================
+-- User -> Cluster embedding sums (derived)
+-- =========================
+-- Running sum of a user's message embeddings within a cluster, maintained by the
+-- clusterer on each new assignment. Cosine distance is scale invariant, so ranking
+-- on the sum gives the same order as ranking on the mean.
+CREATE TABLE IF NOT EXISTS user_cluster_vectors (
+  org_id        TEXT NOT NULL,
+  cluster_id    UUID NOT NULL,
+  user_id       TEXT NOT NULL,
+  embedding_sum VECTOR(:embed_dim) NOT NULL,
+  message_count BIGINT NOT NULL DEFAULT 0,
+  updated_at    TIMESTAMPTZ NOT NULL DEFAULT now(),
+  PRIMARY KEY (org_id, cluster_id, user_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_user_cluster_vectors_user
+  ON user_cluster_vectors (org_id, user_id);
+
+-- Backfill from existing assignments (no-op on a fresh database)
+INSERT INTO user_cluster_vectors (org_id, cluster_id, user_id, embedding_sum, message_count)
+SELECT mc.org_id, mc.cluster_id, m.user_id, SUM(me.embedding), COUNT(*)
+FROM message_cluster mc
+JOIN clusters c
+  ON c.org_id = mc.org_id
+ AND c.cluster_id = mc.cluster_id
+JOIN messages m
+  ON m.org_id = mc.org_id
+ AND m.message_id = mc.message_id
+JOIN message_embeddings me
+  ON me.org_id = mc.org_id
+ AND me.message_id = mc.message_id
+ AND me.model_version = c.model_version
+GROUP BY mc.org_id, mc.cluster_id, m.user_id
+ON CONFLICT (org_id, cluster_id, user_id) DO NOTHING;
+
+-- =========================
+-- User profile vectors (derived)
+-- =========================
+-- Running sum of all of a user's message embeddings per model, maintained by the
+-- clusterer. The HNSW index answers org-wide "most similar users" queries; cosine
+-- distance on the sum equals distance on the mean.
+CREATE TABLE IF NOT EXISTS user_profile_vectors (
+  org_id        TEXT NOT NULL,
+  user_id       TEXT NOT NULL,
+  model_version TEXT NOT NULL,
+  embedding_sum VECTOR(:embed_dim) NOT NULL,
+  message_count BIGINT NOT NULL DEFAULT 0,
+  updated_at    TIMESTAMPTZ NOT NULL DEFAULT now(),
+  PRIMARY KEY (org_id, user_id, model_version)
+);
+
+CREATE INDEX IF NOT EXISTS idx_user_profile_vectors_hnsw
+  ON user_profile_vectors USING hnsw (embedding_sum vector_cosine_ops);
+
+-- Backfill from existing embeddings (no-op on a fresh database)
+INSERT INTO user_profile_vectors (org_id, user_id, model_version, embedding_sum, message_count)
+SELECT me.org_id, m.user_id, me.model_version, SUM(me.embedding), COUNT(*)
+FROM message_embeddings me
+JOIN messages m
+  ON m.org_id = me.org_id
+ AND m.message_id = me.message_id
+GROUP BY me.org_id, m.user_id, me.model_version
+ON CONFLICT (org_id, user_id, model_version) DO NOTHING;
@@ -0,0 +1,103 @@
+"""
+Compare the pydantic and msgspec event codecs on each event type.
+
+    python scripts/bench_event_codecs.py [--number 20000] [--dim 768]
+
+Reports decode throughput; the msgspec column is what EVENT_CODEC=msgspec gives the
+embedders and clusterer. Both codecs encode with pydantic, so encoding is not compared.
+"""
+import argparse
+import random
+import sys
+import timeit
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app import event_codec_msgspec  # noqa: E402
+from app.events import (  # noqa: E402
+    MessageClusteredEvent,
+    MessageCreatedEvent,
+    MessageEmbeddedEvent,
+    MessagePayload,
+    embedding_fields,
+)
+
+
+def sample_events(dim: int):
+    now = datetime.now(timezone.utc)
+    payload = MessagePayload(
+        message_id=uuid.uuid4(),
+        user_id="user-1",
+        ts=now,
+        source_type="slack",
+        text="Can someone review the rollout plan for the ingest service before Friday?",
+        metadata={"channel": "eng", "thread": "t-123"},
+    )
+    vec = [random.uniform(-1.0, 1.0) for _ in range(dim)]
+    embedded = dict(
+        event_id=uuid.uuid4(), org_id="org-1", message=payload,
+        model_version="stub-768-v1", embedding_dim=dim, created_at=now,
+    )
+    return {
+        "message.created": (
+            MessageCreatedEvent(event_id=uuid.uuid4(), org_id="org-1", message=payload),
+            MessageCreatedEvent,
+            event_codec_msgspec.parse_message_created,
+        ),
+        "message.embedded v1": (
+            MessageEmbeddedEvent(**embedded, **embedding_fields(vec, 1)),
+            MessageEmbeddedEvent,
+            event_codec_msgspec.parse_message_embedded,
+        ),
+        "message.embedded v2": (
+            MessageEmbeddedEvent(**embedded, **embedding_fields(vec, 2)),
+            MessageEmbeddedEvent,
+            event_codec_msgspec.parse_message_embedded,
+        ),
+        "message.clustered": (
+            MessageClusteredEvent(
+                event_id=uuid.uuid4(), org_id="org-1", message_id=payload.message_id,
+                user_id="user-1", ts=now, model_version="stub-768-v1",
+                cluster_id=uuid.uuid4(), confidence=0.83, created_at=now,
+            ),
+            MessageClusteredEvent,
+            event_codec_msgspec.parse_message_clustered,
+        ),
+    }
+
+
+def rate(fn, number: int) -> float:
+    best = min(timeit.repeat(fn, number=number, repeat=3))
+    return number / best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--number", type=int, default=20000, help="operations per timing run")
+    parser.add_argument("--dim", type=int, default=768, help="embedding dimension")
+    args = parser.parse_args()
+
+    print(f"{'event':<22}{'op':<8}{'pydantic/s':>14}{'msgspec/s':>14}{'speedup':>10}")
+    for name, (evt, model, parse_msgspec) in sample_events(args.dim).items():
+        raw = evt.model_dump_json(exclude_none=True).encode("utf-8")
+        assert event_codec_msgspec.to_json_bytes(evt) == raw
+
+        # The embedded events are large, so scale their run down to keep timings comparable
+        number = args.number if "embedded" not in name else max(1, args.number // 10)
+        ops = {
+            "decode": (
+                lambda: model.model_validate_json(raw),
+                lambda: parse_msgspec(raw),
+            ),
+        }
+        for op, (with_pydantic, with_msgspec) in ops.items():
+            p, m = rate(with_pydantic, number), rate(with_msgspec, number)
+            print(f"{name:<22}{op:<8}{p:>14,.0f}{m:>14,.0f}{m / p:>9.1f}x")
+        print(f"{'':<22}{'bytes':<8}{len(raw):>14,}")
+
+
+if __name__ == "__main__":
+    main()
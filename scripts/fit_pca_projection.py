@@ -0,0 +1,80 @@
+"""
+Fit the PCA projection used by EMBED_DIM_REDUCTION=pca from stored full-size embeddings.
+
+    python scripts/fit_pca_projection.py --model-version BAAI/bge-base-en-v1.5@tei \\
+        --dim 256 --out pca-bge-base-256.json [--limit 50000]
+
+Reads the model's rows from message_embeddings (run with EMBED_PERSIST_TO_DB=true and no
+reduction to collect them), so the DB_* settings apply. Needs numpy
+(requirements-local.txt). Point the embedder's EMBED_PCA_PATH at the output.
+"""
+import argparse
+import json
+import os
+import sys
+from pathlib import Path
+
+import numpy as np
+import psycopg
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.cluster.clusterer_consumer import db_conninfo, parse_vector_text  # noqa: E402
+
+
+def load_embeddings(model_version: str, limit: int) -> np.ndarray:
+    with psycopg.connect(db_conninfo()) as conn, conn.cursor() as cur:
+        cur.execute(
+            """
+            SELECT embedding::text
+            FROM message_embeddings
+            WHERE model_version = %s
+            ORDER BY created_at DESC
+            LIMIT %s
+            """,
+            (model_version, limit),
+        )
+        return np.array([parse_vector_text(row[0]) for row in cur.fetchall()], dtype=np.float64)
+
+
+def fit(x: np.ndarray, dim: int):
+    mean = x.mean(axis=0)
+    # Rows of vt are the principal axes, by decreasing variance
+    _, s, vt = np.linalg.svd(x - mean, full_matrices=False)
+    variance = s ** 2
+    return mean, vt[:dim], variance[:dim].sum() / variance.sum()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--model-version", required=True, help="full-size model_version to fit on")
+    parser.add_argument("--dim", type=int, required=True, help="output dimension (EMBED_DIM)")
+    parser.add_argument("--out", required=True, help="artifact path (JSON)")
+    parser.add_argument("--limit", type=int, default=50000, help="most recent embeddings to use")
+    args = parser.parse_args()
+
+    x = load_embeddings(args.model_version, args.limit)
+    if len(x) < args.dim:
+        sys.exit(f"need at least {args.dim} embeddings for {args.model_version!r}, found {len(x)}")
+
+    mean, components, explained = fit(x, args.dim)
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(
+            {
+                "model_version": args.model_version,
+                "model_dim": int(x.shape[1]),
+                "dim": args.dim,
+                "explained_variance": float(explained),
+                "mean": mean.tolist(),
+                "components": components.tolist(),
+            },
+            f,
+        )
+    print(
+        f"✅ fitted {x.shape[1]} -> {args.dim} on {len(x)} embeddings "
+        f"({explained:.1%} of variance kept) -> {os.path.abspath(args.out)}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,4 @@
+import os
 import uuid
 from datetime import datetime, timezone
 
@@ -5,8 +6,11 @@ import httpx
 import pytest
 
 
+EMBED_DIM = int(os.getenv("TEST_EMBED_DIM", "768"))
+
+
 def _vec(first: float, second: float) -> str:
-    vals = [0.0] * 768
+    vals = [0.0] * EMBED_DIM
     vals[0] = first
     vals[1] = second
     return "[" + ",".join(f"{v:.6f}" for v in vals) + "]"
@@ -168,6 +172,41 @@ async def test_api_user_centroids_ranked_by_distance(api_url, db):
                 str(cluster_2),
             ),
         )
+
+        # Per-user sums the clusterer maintains alongside user_cluster (one message each here)
+        cur.execute(
+            """
+            INSERT INTO user_cluster_vectors (org_id, cluster_id, user_id, embedding_sum, message_count)
+            VALUES
+              (%s, %s::uuid, %s, %s::vector, 1),
+              (%s, %s::uuid, %s, %s::vector, 1),
+              (%s, %s::uuid, %s, %s::vector, 1),
+              (%s, %s::uuid, %s, %s::vector, 1),
+              (%s, %s::uuid, %s, %s::vector, 1)
+            """,
+            (
+                org_id,
+                str(cluster_1),
+                target_user,
+                _vec(1.0, 0.0),
+                org_id,
+                str(cluster_1),
+                user_b,
+                _vec(0.8, 0.6),
+                org_id,
+                str(cluster_1),
+                user_c,
+                _vec(0.0, 1.0),
+                org_id,
+                str(cluster_2),
+                target_user,
+                _vec(0.0, 1.0),
+                org_id,
+                str(cluster_2),
+                user_d,
+                _vec(0.6, 0.8),
+            ),
+        )
         db.commit()
 
     async with httpx.AsyncClient(timeout=10.0) as client:
@@ -38,6 +38,6 @@ async def test_embedder_publishes_embedded_event(api_url, nats):
             assert evt.message.user_id == "user-embed-test"
             assert evt.message.text == "integration test message.embedded"
             assert evt.embedding_dim == expected_dim
-            assert len(evt.embedding) == expected_dim
+            assert len(evt.vector()) == expected_dim
     finally:
         await sub.unsubscribe()
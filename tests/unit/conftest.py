@@ -0,0 +1,47 @@
+import pytest
+from nats.js.errors import KeyNotFoundError
+
+
+class FakeClock:
+    """Manually advanced stand-in for time.monotonic."""
+
+    def __init__(self, now: float = 0.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+    def tick(self, seconds: float = 1.0) -> None:
+        self.now += seconds
+
+
+class FakeKeyValueEntry:
+    def __init__(self, value: bytes):
+        self.value = value
+
+
+class FakeKeyValue:
+    """In-memory NATS KV bucket; records the keys read."""
+
+    def __init__(self):
+        self.data = {}
+        self.gets = []
+
+    async def put(self, key, value):
+        self.data[key] = value
+
+    async def get(self, key):
+        self.gets.append(key)
+        if key not in self.data:
+            raise KeyNotFoundError
+        return FakeKeyValueEntry(self.data[key])
+
+
+@pytest.fixture
+def clock() -> FakeClock:
+    return FakeClock()
+
+
+@pytest.fixture
+def fake_kv() -> FakeKeyValue:
+    return FakeKeyValue()
@@ -0,0 +1,133 @@
+import pytest
+from fastapi import HTTPException
+
+from app.api.admission import AdmissionController
+
+
+class _FakePublisher:
+    def __init__(self, pending):
+        self.pending = pending
+
+    async def consumer_pending(self, durable: str) -> int:
+        value = self.pending[durable]
+        if isinstance(value, Exception):
+            raise value
+        return value
+
+
+def _controller(pending, per_org=False) -> AdmissionController:
+    return AdmissionController(
+        publisher=_FakePublisher(pending),
+        max_pending={"embedder_v1": 100, "clusterer_v1": 100, "disabled_v1": 0},
+        poll_interval=60.0,
+        retry_after=7,
+        per_org=per_org,
+    )
+
+
+@pytest.mark.asyncio
+async def test_check_returns_429_with_retry_after_when_a_durable_lags():
+    ctrl = _controller({"embedder_v1": 150, "clusterer_v1": 10, "disabled_v1": 10_000})
+    await ctrl.refresh()
+
+    with pytest.raises(HTTPException) as exc:
+        ctrl.check("org-a")
+
+    assert exc.value.status_code == 429
+    assert exc.value.headers == {"Retry-After": "7"}
+    assert "embedder_v1 pending=150" in exc.value.detail
+    assert "disabled_v1" not in ctrl.pending
+
+
+@pytest.mark.asyncio
+async def test_check_admits_again_once_lag_recovers():
+    pending = {"embedder_v1": 150, "clusterer_v1": 10}
+    ctrl = _controller(pending)
+    await ctrl.refresh()
+    with pytest.raises(HTTPException):
+        ctrl.check("org-a")
+
+    pending["embedder_v1"] = 20
+    await ctrl.refresh()
+
+    assert not ctrl.overloaded
+    ctrl.check("org-a")
+
+
+@pytest.mark.asyncio
+async def test_check_fails_open_when_consumer_info_errors():
+    publisher = _FakePublisher({"embedder_v1": 150, "clusterer_v1": 10})
+    ctrl = _controller({})
+    ctrl._publisher = publisher
+    await ctrl.refresh()
+    assert ctrl.overloaded
+
+    publisher.pending["embedder_v1"] = RuntimeError("nats down")
+    await ctrl.refresh()
+
+    assert not ctrl.overloaded
+    ctrl.check("org-a")
+
+
+def _admitted(ctrl: AdmissionController, org_id: str, attempts: int) -> int:
+    admitted = 0
+    for _ in range(attempts):
+        try:
+            ctrl.check(org_id)
+            admitted += 1
+        except HTTPException:
+            pass
+    return admitted
+
+
+@pytest.mark.asyncio
+async def test_per_org_mode_caps_each_org_at_its_share_of_a_reduced_budget():
+    pending = {"embedder_v1": 0, "clusterer_v1": 0}
+    ctrl = _controller(pending, per_org=True)
+    await ctrl.refresh()
+    for _ in range(8):
+        ctrl.check("org-big")
+    for _ in range(2):
+        ctrl.check("org-small")
+
+    pending["embedder_v1"] = 500
+    await ctrl.refresh()
+
+    # Budget is half the last unthrottled interval's 10 messages: 5 / 2 orgs = 2.5 each.
+    assert _admitted(ctrl, "org-small", 10) == 2
+    assert _admitted(ctrl, "org-big", 10) == 2
+
+
+@pytest.mark.asyncio
+async def test_per_org_mode_sheds_evenly_loaded_orgs_and_keeps_the_budget_while_overloaded():
+    pending = {"embedder_v1": 0, "clusterer_v1": 0}
+    ctrl = _controller(pending, per_org=True)
+    await ctrl.refresh()
+    for org in ("org-a", "org-b", "org-c", "org-d"):
+        assert _admitted(ctrl, org, 10) == 10
+
+    pending["embedder_v1"] = 500
+    for _ in range(3):
+        await ctrl.refresh()
+        # 40 messages before the overload -> 20 per interval while it lasts, not 40 or fewer each time
+        assert sum(_admitted(ctrl, org, 10) for org in ("org-a", "org-b", "org-c", "org-d")) == 20
+
+
+@pytest.mark.asyncio
+async def test_per_org_mode_charges_batches_by_their_message_count():
+    pending = {"embedder_v1": 0, "clusterer_v1": 0}
+    ctrl = _controller(pending, per_org=True)
+    await ctrl.refresh()
+    ctrl.check("org-bulk", cost=30)
+    ctrl.check("org-small", cost=10)
+
+    pending["embedder_v1"] = 500
+    await ctrl.refresh()
+
+    # 0.5 * 40 messages / 2 orgs = a share of 10 messages each
+    with pytest.raises(HTTPException):
+        ctrl.check("org-bulk", cost=11)
+    ctrl.check("org-bulk", cost=10)
+    with pytest.raises(HTTPException):
+        ctrl.check("org-bulk")
+    ctrl.check("org-small", cost=4)
@@ -0,0 +1,164 @@
+import uuid
+from contextlib import contextmanager
+
+import pytest
+from fastapi import HTTPException
+
+from app.api.routes import centroids as centroids_route
+from app.api.routes.centroids import ConnectionsBatchResponse, SimilarUsersResponse, UserCentroidsResponse
+
+
+class _FakeCursor:
+    def __init__(self, rows):
+        self.rows = rows
+        self.params = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params):
+        self.params = params
+
+    def __iter__(self):
+        return iter(self.rows)
+
+
+class _FakeConn:
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def cursor(self):
+        return self._cursor
+
+
+def _use_rows(monkeypatch, rows) -> _FakeCursor:
+    cursor = _FakeCursor(rows)
+
+    @contextmanager
+    def fake_pooled_connection():
+        yield _FakeConn(cursor)
+
+    monkeypatch.setattr(centroids_route, "pooled_connection", fake_pooled_connection)
+    return cursor
+
+
+def test_rank_user_connections_pages_clusters_and_emits_cursor(monkeypatch):
+    c1, c2, c3 = (uuid.uuid4() for _ in range(3))
+    cursor = _use_rows(
+        monkeypatch,
+        [
+            (c1, 3.0, "user-a", 0.0, 2),
+            (c1, 3.0, "user-b", 0.1, 1),
+            (c2, 2.0, "user-a", 0.0, 1),
+            (c3, 1.0, "user-a", 0.0, 1),
+        ],
+    )
+
+    resp = centroids_route._rank_user_connections("org-1", "user-a", limit_per_cluster=5, max_clusters=2)
+
+    assert [c["cluster_id"] for c in resp["centroids"]] == [str(c1), str(c2)]
+    assert [u["user_id"] for u in resp["centroids"][0]["users"]] == ["user-a", "user-b"]
+    assert cursor.params["cluster_limit"] == 3
+    assert cursor.params["limit_per_cluster"] == 5
+    assert centroids_route._decode_cursor(resp["next_cursor"]) == (2.0, c2)
+    UserCentroidsResponse.model_validate(resp)
+
+
+def test_rank_user_connections_has_no_cursor_on_last_page(monkeypatch):
+    c1 = uuid.uuid4()
+    cursor = _use_rows(monkeypatch, [(c1, 1.0, "user-a", 0.0, 1)])
+
+    resp = centroids_route._rank_user_connections("org-1", "user-a", max_clusters=2, after=(2.0, uuid.uuid4()))
+
+    assert len(resp["centroids"]) == 1
+    assert resp["next_cursor"] is None
+    assert cursor.params["after_score"] == 2.0
+
+
+def test_decode_cursor_rejects_garbage_with_400():
+    with pytest.raises(HTTPException) as exc:
+        centroids_route._decode_cursor("not-a-cursor")
+
+    assert exc.value.status_code == 400
+
+
+class _SequencedCursor(_FakeCursor):
+    def __init__(self, target, rows):
+        super().__init__(rows)
+        self.target = target
+        self.statements = []
+
+    def execute(self, sql, params=None):
+        self.statements.append(sql)
+        self.params = params
+
+    def fetchone(self):
+        return self.target
+
+
+def _use_sequenced(monkeypatch, target, rows) -> _SequencedCursor:
+    cursor = _SequencedCursor(target, rows)
+
+    @contextmanager
+    def fake_pooled_connection():
+        yield _FakeConn(cursor)
+
+    monkeypatch.setattr(centroids_route, "pooled_connection", fake_pooled_connection)
+    return cursor
+
+
+def test_nearest_users_searches_within_target_model_version(monkeypatch):
+    cursor = _use_sequenced(
+        monkeypatch,
+        ("stub-768-v1", "[1,0]"),
+        [("user-b", 0.1, 4), ("user-c", 0.3, 1)],
+    )
+
+    resp = centroids_route._nearest_users("org-1", "user-a", limit=2)
+
+    assert resp["model_version"] == "stub-768-v1"
+    assert [(u["user_id"], u["distance"]) for u in resp["users"]] == [("user-b", 0.1), ("user-c", 0.3)]
+    SimilarUsersResponse.model_validate(resp)
+    assert cursor.params == {
+        "target": "[1,0]",
+        "org_id": "org-1",
+        "model_version": "stub-768-v1",
+        "user_id": "user-a",
+        "limit": 2,
+    }
+
+
+def test_nearest_users_returns_404_for_unknown_user(monkeypatch):
+    _use_sequenced(monkeypatch, None, [])
+
+    with pytest.raises(HTTPException) as exc:
+        centroids_route._nearest_users("org-1", "nobody", limit=5)
+
+    assert exc.value.status_code == 404
+
+
+def test_rank_many_user_connections_groups_rows_per_target(monkeypatch):
+    c1, c2 = uuid.uuid4(), uuid.uuid4()
+    cursor = _use_rows(
+        monkeypatch,
+        [
+            ("user-a", c1, "user-a", 0.0, 2),
+            ("user-a", c1, "user-b", 0.2, 1),
+            ("user-a", c2, "user-a", 0.0, 1),
+            ("user-b", c1, "user-b", 0.0, 1),
+            ("user-b", c1, "user-a", 0.2, 2),
+        ],
+    )
+
+    results = centroids_route._rank_many_user_connections(
+        "org-1", ["user-a", "user-b", "user-z"], limit_per_cluster=10
+    )
+
+    assert cursor.params["user_ids"] == ["user-a", "user-b", "user-z"]
+    assert [c["cluster_id"] for c in results["user-a"]["centroids"]] == [str(c1), str(c2)]
+    assert [u["user_id"] for u in results["user-b"]["centroids"][0]["users"]] == ["user-b", "user-a"]
+    assert results["user-z"]["centroids"] == []
+    ConnectionsBatchResponse.model_validate({"org_id": "org-1", "results": list(results.values())})
@@ -0,0 +1,103 @@
+import uuid
+from datetime import datetime, timezone
+
+import pytest
+
+from app.api.connections_cache import ConnectionsCache
+from app.events import MessageClusteredEvent, to_json_bytes
+
+
+class _Msg:
+    def __init__(self, data: bytes):
+        self.data = data
+
+
+def _payload(user_id: str):
+    return {"org_id": "org-1", "user_id": user_id, "centroids": []}
+
+
+async def _cached(cache: ConnectionsCache, clock, user_id: str, clusters):
+    computed_at = clock()
+    clock.tick()
+    await cache.put("org-1", user_id, _payload(user_id), clusters, computed_at)
+
+
+@pytest.mark.asyncio
+async def test_event_for_a_contained_cluster_invalidates_only_affected_entries(clock):
+    clock.tick()
+    cache = ConnectionsCache(max_entries=10, ttl=60, clock=clock)
+    await _cached(cache, clock, "alice", ["c1", "c2"])
+    await _cached(cache, clock, "bob", ["c3"])
+
+    cache.invalidate("org-1", "c2", "carol")
+    clock.tick()
+
+    assert await cache.get("org-1", "alice") is None
+    assert await cache.get("org-1", "bob") == _payload("bob")
+
+
+@pytest.mark.asyncio
+async def test_event_for_the_target_user_invalidates_even_a_new_cluster(clock):
+    clock.tick()
+    cache = ConnectionsCache(max_entries=10, ttl=60, clock=clock)
+    await _cached(cache, clock, "alice", [])
+
+    evt = MessageClusteredEvent(
+        event_id=uuid.uuid4(),
+        org_id="org-1",
+        message_id=uuid.uuid4(),
+        user_id="alice",
+        ts=datetime.now(timezone.utc),
+        model_version="stub-768-v1",
+        cluster_id=uuid.uuid4(),
+        confidence=1.0,
+        created_at=datetime.now(timezone.utc),
+    )
+    await cache.handle_clustered(_Msg(to_json_bytes(evt)))
+
+    assert await cache.get("org-1", "alice") is None
+
+
+@pytest.mark.asyncio
+async def test_results_computed_before_a_racing_event_are_not_cached(clock):
+    clock.tick()
+    cache = ConnectionsCache(max_entries=10, ttl=60, clock=clock)
+
+    computed_at = clock()
+    clock.tick()
+    cache.invalidate("org-1", "c1", "bob")
+    await cache.put("org-1", "alice", _payload("alice"), ["c1"], computed_at)
+
+    assert await cache.get("org-1", "alice") is None
+
+
+@pytest.mark.asyncio
+async def test_entries_expire_after_ttl_and_lru_is_bounded(clock):
+    clock.tick()
+    cache = ConnectionsCache(max_entries=2, ttl=10, clock=clock)
+    await _cached(cache, clock, "alice", ["c1"])
+    await _cached(cache, clock, "bob", ["c1"])
+    await _cached(cache, clock, "carol", ["c1"])
+
+    assert await cache.get("org-1", "alice") is None
+    assert await cache.get("org-1", "carol") == _payload("carol")
+
+    clock.tick(10)
+    assert await cache.get("org-1", "carol") is None
+
+
+@pytest.mark.asyncio
+async def test_shared_tier_entries_are_checked_against_local_invalidations(clock, fake_kv):
+    kv = fake_kv
+    writer = ConnectionsCache(max_entries=10, ttl=60, kv=kv, clock=clock)
+    clock.tick()
+    reader = ConnectionsCache(max_entries=10, ttl=60, kv=kv, clock=clock)
+    clock.tick()
+    await _cached(writer, clock, "alice", ["c1"])
+    await _cached(writer, clock, "bob", ["c2"])
+
+    assert await reader.get("org-1", "alice") == _payload("alice")
+
+    reader.invalidate("org-1", "c2", "dave")
+    clock.tick()
+    assert await reader.get("org-1", "bob") is None
@@ -0,0 +1,71 @@
+from contextlib import contextmanager
+
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY, generate_latest
+from psycopg_pool import PoolTimeout
+
+from app.api import dependencies
+from app.api.main import create_app
+
+
+class _FakePool:
+    def __init__(self, stats):
+        self.stats = stats
+        self.checkouts = 0
+
+    def get_stats(self):
+        return dict(self.stats)
+
+    @contextmanager
+    def connection(self):
+        self.checkouts += 1
+        yield "conn"
+
+
+def test_pool_timeout_maps_to_503():
+    app = create_app()
+
+    @app.get("/boom")
+    def boom():
+        raise PoolTimeout("couldn't get a connection after 5.00 sec")
+
+    resp = TestClient(app).get("/boom")
+
+    assert resp.status_code == 503
+    assert resp.json() == {"detail": "Database pool exhausted: couldn't get a connection after 5.00 sec"}
+
+
+def test_pool_stats_are_exported_as_gauges(monkeypatch):
+    monkeypatch.setattr(dependencies, "_db_pool", _FakePool({"pool_size": 4, "requests_waiting": 2}))
+
+    output = generate_latest(REGISTRY).decode()
+
+    assert "api_db_pool_pool_size 4.0" in output
+    assert "api_db_pool_requests_waiting 2.0" in output
+
+
+def test_pool_stats_collector_is_silent_without_a_pool(monkeypatch):
+    monkeypatch.setattr(dependencies, "_db_pool", None)
+
+    assert list(dependencies._DbPoolStatsCollector().collect()) == []
+
+
+def test_metrics_endpoint_serves_pool_stats(monkeypatch):
+    monkeypatch.setattr(dependencies, "_db_pool", _FakePool({"pool_available": 3}))
+
+    resp = TestClient(create_app()).get("/metrics/")
+
+    assert resp.status_code == 200
+    assert "api_db_pool_pool_available 3.0" in resp.text
+
+
+def test_pooled_connection_records_checkout_wait(monkeypatch):
+    pool = _FakePool({})
+    monkeypatch.setattr(dependencies, "_db_pool", pool)
+    before = REGISTRY.get_sample_value("api_db_pool_wait_seconds_count") or 0.0
+
+    with dependencies.pooled_connection() as conn:
+        assert conn == "conn"
+
+    assert pool.checkouts == 1
+    assert REGISTRY.get_sample_value("api_db_pool_wait_seconds_count") == before + 1
@@ -0,0 +1,43 @@
+import msgpack
+import orjson
+from starlette.requests import Request
+
+from app.api.encoding import encoded_response
+
+PAYLOAD = {"org_id": "org-1", "users": [{"user_id": "u", "distance": 0.25, "message_count": 3}]}
+
+
+def _request(accept: str) -> Request:
+    return Request({"type": "http", "headers": [(b"accept", accept.encode("latin-1"))]})
+
+
+def test_encoded_response_defaults_to_json():
+    resp = encoded_response(_request("*/*"), PAYLOAD)
+
+    assert resp.media_type == "application/json"
+    assert orjson.loads(resp.body) == PAYLOAD
+
+
+def test_encoded_response_negotiates_msgpack():
+    resp = encoded_response(_request("application/json;q=0.5, application/msgpack"), PAYLOAD)
+
+    assert resp.media_type == "application/msgpack"
+    assert msgpack.unpackb(resp.body) == PAYLOAD
+
+
+def test_encoded_response_ignores_msgpack_with_zero_quality():
+    resp = encoded_response(_request("application/msgpack;q=0, application/json"), PAYLOAD)
+
+    assert resp.media_type == "application/json"
+
+
+def test_encoded_response_prefers_json_when_it_has_the_higher_quality():
+    resp = encoded_response(_request("application/json;q=1, application/msgpack;q=0.1"), PAYLOAD)
+
+    assert resp.media_type == "application/json"
+
+
+def test_encoded_response_weighs_msgpack_against_wildcards():
+    assert encoded_response(_request("*/*, application/msgpack;q=0.5"), PAYLOAD).media_type == "application/json"
+    assert encoded_response(_request("*/*;q=0.1, application/msgpack"), PAYLOAD).media_type == "application/msgpack"
+    assert encoded_response(_request("application/msgpack, application/json"), PAYLOAD).media_type == "application/json"
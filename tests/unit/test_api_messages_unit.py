@@ -1,33 +1,61 @@
+import asyncio
 from datetime import datetime, timezone
-from uuid import UUID
+from uuid import UUID, uuid4
 
 import pytest
 from fastapi import HTTPException
 
-from app.api.routes.messages import IngestMessageRequest, ingest_message
+from app.api.routes import messages as messages_route
+from app.api.routes.messages import (
+    IngestBatchRequest,
+    IngestMessageRequest,
+    ingest_message,
+    ingest_message_batch,
+    ingest_message_stream,
+)
 from app.events import MessageCreatedEvent
 
 
 class _Ack:
-    def __init__(self, stream: str, seq: int):
+    def __init__(self, stream: str, seq: int, duplicate: bool = False):
         self.stream = stream
         self.seq = seq
+        self.duplicate = duplicate
 
 
-class _FakePublisher:
+class _PipelinedPublisherMixin:
+    async def publish_async(self, subject: str, payload: bytes, headers=None):
+        return asyncio.ensure_future(self.publish(subject, payload, headers))
+
+    async def publish_many(self, messages):
+        return await asyncio.gather(
+            *(self.publish(subject, payload, headers) for subject, payload, headers in messages),
+            return_exceptions=True,
+        )
+
+
+class _FakePublisher(_PipelinedPublisherMixin):
     def __init__(self):
         self.stream_name = "ingress_messages"
         self.published = []
+        self.headers = []
+        self._seen_msg_ids = set()
 
-    async def publish(self, subject: str, payload: bytes):
+    async def publish(self, subject: str, payload: bytes, headers=None):
+        msg_id = (headers or {}).get("Nats-Msg-Id")
+        self.headers.append(headers)
+        if msg_id is not None and msg_id in self._seen_msg_ids:
+            return _Ack(stream="ingress_messages", seq=123, duplicate=True)
+        if msg_id is not None:
+            self._seen_msg_ids.add(msg_id)
         self.published.append((subject, payload))
         return _Ack(stream="ingress_messages", seq=123)
 
 
-class _FailingPublisher:
+class _FailingPublisher(_PipelinedPublisherMixin):
     stream_name = "ingress_messages"
 
-    async def publish(self, subject: str, payload: bytes):
+    async def publish(self, subject: str, payload: bytes, headers=None):
         raise RuntimeError("publish failed")
 
 
@@ -79,3 +107,214 @@ async def test_ingest_message_returns_503_when_publish_fails():
 
     assert exc.value.status_code == 503
     assert "JetStream publish failed" in str(exc.value.detail)
+
+
+@pytest.mark.asyncio
+async def test_ingest_message_sets_msg_id_header_only_for_client_message_ids():
+    fake = _FakePublisher()
+    message_id = uuid4()
+    retried = _request("retried")
+    retried.message_id = message_id
+
+    first = await ingest_message(org_id="org-unit", body=retried, pub=fake)
+    second = await ingest_message(org_id="org-unit", body=retried, pub=fake)
+    await ingest_message(org_id="org-unit", body=_request("no id"), pub=fake)
+
+    assert fake.headers[0] == {"Nats-Msg-Id": f"org-unit.{message_id}"}
+    assert fake.headers[2] is None
+    assert first.status == "accepted"
+    assert second.status == "duplicate"
+    assert len(fake.published) == 2
+
+
+@pytest.mark.asyncio
+async def test_ingest_message_enqueue_mode_returns_before_puback(monkeypatch):
+    monkeypatch.setattr(messages_route, "INGEST_ACK_MODE", "enqueue")
+    fake = _FakePublisher()
+
+    resp = await ingest_message(org_id="org-unit", body=_request("enqueued"), pub=fake)
+    await asyncio.sleep(0)
+
+    assert resp.status == "enqueued"
+    assert resp.seq is None
+    assert resp.stream == "ingress_messages"
+    assert len(fake.published) == 1
+
+
+class _FlakyPublisher(_PipelinedPublisherMixin):
+    stream_name = "ingress_messages"
+
+    def __init__(self, fail_texts):
+        self.fail_texts = set(fail_texts)
+        self.published = []
+        self._seq = 0
+
+    async def publish(self, subject: str, payload: bytes, headers=None):
+        evt = MessageCreatedEvent.model_validate_json(payload)
+        if evt.message.text in self.fail_texts:
+            raise RuntimeError("publish failed")
+        self._seq += 1
+        self.published.append((subject, payload))
+        return _Ack(stream="ingress_messages", seq=self._seq)
+
+
+def _request(text: str) -> IngestMessageRequest:
+    return IngestMessageRequest(
+        user_id="unit-user",
+        ts=datetime.now(timezone.utc),
+        text=text,
+        source_type="unit-test",
+        metadata={},
+    )
+
+
+@pytest.mark.asyncio
+async def test_ingest_message_batch_reports_partial_failures_per_item():
+    fake = _FlakyPublisher(fail_texts={"bad"})
+    body = IngestBatchRequest(messages=[_request("one"), _request("bad"), _request("three")])
+
+    resp = await ingest_message_batch(org_id="org-unit", body=body, pub=fake, admission=None)
+
+    assert resp.org_id == "org-unit"
+    assert resp.subject == "messages.org-unit"
+    assert resp.accepted == 2
+    assert resp.failed == 1
+    assert [r.index for r in resp.results] == [0, 1, 2]
+    assert [r.status for r in resp.results] == ["accepted", "failed", "accepted"]
+    assert resp.results[0].seq is not None
+    assert resp.results[1].seq is None
+    assert "JetStream publish failed" in resp.results[1].error
+    assert len(fake.published) == 2
+    assert len({r.event_id for r in resp.results}) == 3
+
+
+@pytest.mark.asyncio
+async def test_ingest_message_batch_keeps_client_message_ids():
+    fake = _FakePublisher()
+    message_id = uuid4()
+    first = _request("one")
+    first.message_id = message_id
+    body = IngestBatchRequest(messages=[first, _request("two")])
+
+    resp = await ingest_message_batch(org_id="org-unit", body=body, pub=fake, admission=None)
+
+    assert resp.accepted == 2
+    assert resp.results[0].message_id == message_id
+    assert resp.results[1].message_id != message_id
+
+
+class _NdjsonRequest:
+    def __init__(self, chunks, content_type="application/x-ndjson"):
+        self.headers = {"content-type": content_type}
+        self._chunks = chunks
+
+    async def stream(self):
+        for chunk in self._chunks:
+            yield chunk
+
+
+def _ndjson_line(text: str) -> bytes:
+    return _request(text).model_dump_json().encode("utf-8") + b"\n"
+
+
+@pytest.mark.asyncio
+async def test_ingest_message_stream_publishes_lines_split_across_chunks():
+    fake = _FlakyPublisher(fail_texts={"bad"})
+    body = _ndjson_line("one") + b"\n" + b'{"not": "a message"}\n' + _ndjson_line("bad") + _ndjson_line("four")
+    chunks = [body[i : i + 7] for i in range(0, len(body), 7)]
+
+    resp = await ingest_message_stream(
+        org_id="org-unit", request=_NdjsonRequest(chunks), max_errors=100, pub=fake, admission=None
+    )
+
+    assert resp.subject == "messages.org-unit"
+    assert resp.received == 4
+    assert resp.accepted == 2
+    assert resp.failed == 2
+    assert [e.line for e in resp.errors] == [3, 4]
+    assert "Invalid message" in resp.errors[0].error
+    assert "JetStream publish failed" in resp.errors[1].error
+    texts = [MessageCreatedEvent.model_validate_json(p).message.text for _, p in fake.published]
+    assert sorted(texts) == ["four", "one"]
+
+
+@pytest.mark.asyncio
+async def test_ingest_message_stream_caps_reported_errors():
+    body = b"x\n" * 5
+
+    resp = await ingest_message_stream(
+        org_id="org-unit", request=_NdjsonRequest([body]), max_errors=2, pub=_FakePublisher(), admission=None
+    )
+
+    assert resp.received == 5
+    assert resp.failed == 5
+    assert [e.line for e in resp.errors] == [1, 2]
+
+
+@pytest.mark.asyncio
+async def test_ingest_message_stream_does_not_echo_oversized_invalid_lines():
+    huge = "x" * 200_000
+    body = b'{"user_id": "%s"}\n' % huge.encode() + b'{"text": %s\n' % huge.encode()
+
+    resp = await ingest_message_stream(
+        org_id="org-unit", request=_NdjsonRequest([body]), max_errors=100, pub=_FakePublisher(), admission=None
+    )
+
+    assert resp.failed == 2
+    assert all(len(e.error) <= messages_route.MAX_STREAM_ERROR_CHARS for e in resp.errors)
+    assert len(resp.model_dump_json()) < 2 * messages_route.MAX_STREAM_ERROR_CHARS + 500
+
+
+class _BudgetAdmission:
+    def __init__(self, budget):
+        self.budget = budget
+        self.charged = []
+
+    def check(self, org_id, cost=1):
+        if cost > self.budget:
+            raise HTTPException(status_code=429, detail="lagging", headers={"Retry-After": "7"})
+        self.budget -= cost
+        self.charged.append(cost)
+
+
+@pytest.mark.asyncio
+async def test_ingest_message_batch_charges_admission_per_message():
+    body = IngestBatchRequest(messages=[_request(str(i)) for i in range(5)])
+    fake = _FakePublisher()
+
+    with pytest.raises(HTTPException) as exc:
+        await ingest_message_batch(org_id="org-unit", body=body, pub=fake, admission=_BudgetAdmission(4))
+
+    assert exc.value.status_code == 429
+    assert fake.published == []
+
+
+@pytest.mark.asyncio
+async def test_ingest_message_stream_stops_at_the_first_line_over_budget():
+    fake = _FakePublisher()
+    admission = _BudgetAdmission(3)
+    body = b"".join(_ndjson_line(str(i)) for i in range(5))
+
+    resp = await ingest_message_stream(
+        org_id="org-unit", request=_NdjsonRequest([body]), max_errors=100, pub=fake, admission=admission
+    )
+
+    assert admission.charged == [0, 1, 1, 1]
+    assert resp.received == resp.accepted == 3
+    assert resp.stopped_at_line == 4
+    assert resp.retry_after == 7
+    assert len(fake.published) == 3
+
+
+@pytest.mark.asyncio
+async def test_ingest_message_stream_rejects_other_content_types():
+    with pytest.raises(HTTPException) as exc:
+        await ingest_message_stream(
+            org_id="org-unit",
+            request=_NdjsonRequest([], content_type="application/json"),
+            max_errors=100,
+            pub=_FakePublisher(),
+            admission=None,
+        )
+
+    assert exc.value.status_code == 415
@@ -0,0 +1,52 @@
+from app.embed.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+
+
+def _breaker(clock) -> CircuitBreaker:
+    return CircuitBreaker("test", window=4, min_calls=4, failure_rate=0.5, open_sec=10.0, clock=clock)
+
+
+def test_opens_at_failure_rate_once_window_has_min_calls(clock):
+    breaker = _breaker(clock)
+
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == CLOSED  # only 3 calls seen
+
+    breaker.record_success()
+    assert breaker.state == OPEN
+    assert breaker.is_open() and not breaker.allow()
+
+
+def test_half_open_probe_closes_on_success_and_reopens_on_failure(clock):
+    breaker = _breaker(clock)
+    for _ in range(4):
+        breaker.record_failure()
+
+    clock.now = 10.0
+    assert breaker.state == HALF_OPEN and not breaker.is_open()
+    assert breaker.allow()
+    assert not breaker.allow()  # single probe in flight
+    assert breaker.is_open()
+    breaker.record_failure()
+    assert breaker.state == OPEN
+
+    clock.now = 20.0
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CLOSED
+    # window starts over after closing
+    breaker.record_failure()
+    assert breaker.state == CLOSED
+
+
+def test_released_probe_lets_the_next_call_through(clock):
+    breaker = _breaker(clock)
+    for _ in range(4):
+        breaker.record_failure()
+
+    clock.now = 10.0
+    assert breaker.allow()
+    breaker.release_probe()
+    assert breaker.state == HALF_OPEN and not breaker.is_open()
+    assert breaker.allow()
@@ -0,0 +1,59 @@
+import uuid
+from datetime import datetime, timezone
+
+import pytest
+
+from app.claim_check import claim_check_key, fetch_kv_embeddings, pack_embedding, unpack_embedding
+from app.cluster.clusterer_consumer import resolve_embeddings
+from app.events import MessageEmbeddedEvent, MessagePayload, claim_check_fields, embedding_fields
+
+VECTOR = [0.5, -0.25, 0.125, 1.0]
+
+
+def _embedded(**fields) -> MessageEmbeddedEvent:
+    return MessageEmbeddedEvent(
+        event_id=uuid.uuid4(),
+        org_id="org-1",
+        message=MessagePayload(
+            message_id=uuid.uuid4(),
+            user_id="user-1",
+            ts=datetime.now(timezone.utc),
+            source_type="test",
+            text="hello",
+        ),
+        model_version="BAAI/bge-base-en-v1.5@tei",
+        embedding_dim=len(VECTOR),
+        created_at=datetime.now(timezone.utc),
+        **fields,
+    )
+
+
+def test_key_is_deterministic_and_kv_safe():
+    key = claim_check_key("org/1", "m-1", "BAAI/bge-base-en-v1.5@tei")
+
+    assert key == claim_check_key("org/1", "m-1", "BAAI/bge-base-en-v1.5@tei")
+    assert key != claim_check_key("org/1", "m-2", "BAAI/bge-base-en-v1.5@tei")
+    assert key.isalnum()
+    assert unpack_embedding(pack_embedding(VECTOR)) == VECTOR
+
+
+@pytest.mark.asyncio
+async def test_kv_fetch_skips_missing_keys_and_duplicates(fake_kv):
+    kv = fake_kv
+    await kv.put("a", pack_embedding(VECTOR))
+
+    assert await fetch_kv_embeddings(kv, ["a", "missing", "a"]) == {"a": VECTOR}
+    assert sorted(kv.gets) == ["a", "missing"]
+
+
+@pytest.mark.asyncio
+async def test_resolve_embeddings_mixes_inline_and_kv_references(fake_kv):
+    kv = fake_kv
+    claimed = _embedded(**claim_check_fields("kv", "k1"))
+    dangling = _embedded(**claim_check_fields("kv", "k2"))
+    inline = _embedded(**embedding_fields(VECTOR, 2))
+    await kv.put("k1", pack_embedding([1.0, 0.0, 0.0, 0.0]))
+
+    vectors = await resolve_embeddings(None, kv, [claimed, dangling, inline])
+
+    assert vectors == {claimed.event_id: [1.0, 0.0, 0.0, 0.0], inline.event_id: VECTOR}
@@ -0,0 +1,101 @@
+import json
+import math
+import sys
+from datetime import datetime, timezone
+from uuid import uuid4
+
+import pytest
+
+import app.cluster.clusterer_consumer as clusterer
+from app.embed.dim_reduction import DimensionReducer
+from app.events import MessageEmbeddedEvent, MessagePayload, claim_check_fields
+
+
+def _norm(vec):
+    return math.sqrt(sum(x * x for x in vec))
+
+
+def test_none_requires_matching_dimensions():
+    reducer = DimensionReducer(4, 4)
+    assert reducer.reduce([0.5, 0.5, 0.5, 0.5]) == [0.5, 0.5, 0.5, 0.5]
+    assert reducer.model_version("m") == "m"
+
+    with pytest.raises(ValueError, match="EMBED_DIM_REDUCTION"):
+        DimensionReducer(4, 2)
+
+
+def test_matryoshka_truncates_and_renormalizes():
+    reducer = DimensionReducer(4, 2, "matryoshka")
+
+    out = reducer.reduce([0.6, 0.0, 0.8, 0.0])
+
+    assert out == pytest.approx([1.0, 0.0])
+    assert reducer.model_version("bge@tei") == "bge@tei#mrl2"
+
+
+def test_pca_projects_onto_leading_components(tmp_path):
+    path = tmp_path / "pca.json"
+    path.write_text(
+        json.dumps(
+            {
+                "mean": [0.1, 0.0, 0.0],
+                "components": [[0.0, 1.0, 0.0], [0.0, 0.0, 1.0], [1.0, 0.0, 0.0]],
+            }
+        )
+    )
+    reducer = DimensionReducer.from_pca_file(str(path), model_dim=3, dim=2)
+
+    out = reducer.reduce([0.1, 0.3, 0.4])
+
+    assert out == pytest.approx([0.6, 0.8])
+    assert _norm(out) == pytest.approx(1.0)
+    assert reducer.model_version("bge@tei") == "bge@tei#pca2"
+
+
+def test_pca_without_numpy_is_offloaded_and_matches_numpy(monkeypatch):
+    mean = [0.1, 0.0, 0.0]
+    components = [[0.0, 1.0, 0.0], [0.0, 0.0, 1.0], [1.0, 0.0, 0.0]]
+    vec = [0.1, 0.3, 0.4]
+
+    with monkeypatch.context() as m:
+        m.setitem(sys.modules, "numpy", None)
+        pure = DimensionReducer(3, 2, "pca", mean=mean, components=components)
+    assert pure.offload
+    assert pure.reduce(vec) == pytest.approx([0.6, 0.8])
+
+    pytest.importorskip("numpy")
+    fast = DimensionReducer(3, 2, "pca", mean=mean, components=components)
+    assert not fast.offload
+    assert fast.reduce(vec) == pytest.approx(pure.reduce(vec))
+
+
+def test_pca_rejects_mismatched_artifact():
+    with pytest.raises(ValueError, match="fitted"):
+        DimensionReducer(3, 2, "pca", mean=[0.0, 0.0], components=[[1.0, 0.0], [0.0, 1.0]])
+    with pytest.raises(ValueError, match="components"):
+        DimensionReducer(3, 2, "pca", mean=[0.0] * 3, components=[[1.0, 0.0, 0.0]])
+
+
+def test_clusterer_rejects_embeddings_of_another_dimension(monkeypatch):
+    monkeypatch.setattr(clusterer, "EMBED_DIM", 2)
+    payload = MessagePayload(
+        message_id=uuid4(),
+        user_id="u",
+        ts=datetime.now(timezone.utc),
+        source_type="test",
+        text="hi",
+        metadata={},
+    )
+    evt = MessageEmbeddedEvent(
+        event_id=uuid4(),
+        org_id="org",
+        message=payload,
+        model_version="m#mrl2",
+        embedding_dim=2,
+        **claim_check_fields("db"),
+        created_at=datetime.now(timezone.utc),
+    )
+
+    assert clusterer.checked_embedding(evt, [3.0, 4.0]) == pytest.approx([0.6, 0.8])
+    with pytest.raises(clusterer.EmbeddingDimensionError, match="expected 2"):
+        clusterer.checked_embedding(evt, [1.0, 0.0, 0.0])
@@ -0,0 +1,250 @@
+import asyncio
+import math
+from typing import List
+from uuid import uuid4
+
+import pytest
+
+import app.embed.providers.tei as tei_module
+from app.embed.circuit_breaker import CLOSED, CircuitOpenError
+from app.embed.providers import PROVIDERS, create_provider
+from app.embed.providers.base import BatchedEmbeddingProvider, EmbeddingProvider
+from app.embed.providers.stub import StubProvider
+from app.embed.tei_client import TeiInputError
+
+
+def _norm(vec: List[float]) -> float:
+    return math.sqrt(sum(x * x for x in vec))
+
+
+class FakeProvider(BatchedEmbeddingProvider):
+    name = "fake"
+    default_model_version = "fake-v1"
+    max_batch_size = 8
+
+    def __init__(self, dim: int, out_dim: int = 0):
+        super().__init__()
+        self.dim = dim
+        self.out_dim = out_dim or dim
+        self.batches: List[List[str]] = []
+
+    async def embed_batch(self, texts: List[str]) -> List[List[float]]:
+        self.batches.append(list(texts))
+        return [[float(len(t))] + [1.0] * (self.out_dim - 1) for t in texts]
+
+
+def test_registry_lists_all_providers():
+    assert sorted(PROVIDERS) == ["local", "stub", "tei"]
+
+
+def test_providers_must_implement_their_abstract_methods():
+    class NoBatch(BatchedEmbeddingProvider):
+        pass
+
+    with pytest.raises(TypeError, match="embed_batch"):
+        NoBatch()
+    with pytest.raises(TypeError, match="embed"):
+        EmbeddingProvider()
+
+
+def test_create_provider_rejects_unknown_name():
+    with pytest.raises(ValueError, match="EMBED_PROVIDER"):
+        create_provider("openai")
+
+
+async def test_stub_provider_is_deterministic_and_unit_length():
+    provider = create_provider(" Stub ")
+    assert isinstance(provider, StubProvider)
+
+    message_id = uuid4()
+    a = await provider.embed("hello", "org", message_id)
+    b = await provider.embed("hello", "org", message_id)
+
+    assert a == b
+    assert len(a) == provider.dim
+    assert _norm(a) == pytest.approx(1.0)
+
+
+async def test_batched_provider_batches_and_normalizes():
+    provider = FakeProvider(dim=4)
+    vectors = await asyncio.gather(*(provider.embed(t, "org", uuid4()) for t in ("a", "bb", "ccc")))
+    await provider.close()
+
+    assert provider.batches == [["a", "bb", "ccc"]]
+    assert all(_norm(v) == pytest.approx(1.0) for v in vectors)
+
+
+async def test_batched_provider_rejects_wrong_dimension():
+    provider = FakeProvider(dim=4, out_dim=5)
+
+    with pytest.raises(RuntimeError, match="dimension mismatch"):
+        await provider.embed("a", "org", uuid4())
+    await provider.close()
+
+
+async def test_tei_provider_open_circuit_naks_or_falls_back(monkeypatch):
+    provider = tei_module.TeiProvider()
+    for _ in range(tei_module.TEI_BREAKER_MIN_CALLS):
+        provider.breaker.record_failure()
+    message_id = uuid4()
+
+    monkeypatch.setattr(tei_module, "TEI_BREAKER_OPEN_ACTION", "nak")
+    with pytest.raises(CircuitOpenError) as exc_info:
+        await provider.embed("hello", "org", message_id)
+    assert exc_info.value.retry_after == tei_module.TEI_BREAKER_NAK_DELAY_SEC
+
+    monkeypatch.setattr(tei_module, "TEI_BREAKER_OPEN_ACTION", "fallback")
+    assert await provider.embed("hello", "org", message_id) == await StubProvider().embed(
+        "hello", "org", message_id
+    )
+
+    monkeypatch.setattr(tei_module, "EMBED_FALLBACK_TO_STUB", False)
+    with pytest.raises(CircuitOpenError) as exc_info:
+        await provider.embed("hello", "org", message_id)
+    assert exc_info.value.retry_after == tei_module.TEI_BREAKER_NAK_DELAY_SEC
+    await provider.close()
+
+
+async def test_tei_provider_cancellation_does_not_count_as_a_tei_failure():
+    provider = tei_module.TeiProvider()
+
+    async def embed_batch(texts):
+        raise asyncio.CancelledError
+
+    provider.embed_batch = embed_batch
+    for _ in range(tei_module.TEI_BREAKER_MIN_CALLS):
+        with pytest.raises(asyncio.CancelledError):
+            await provider._embed_checked(["hello"])
+
+    assert not provider.breaker.is_open()
+    await provider.close()
+
+
+async def test_tei_provider_cancelled_half_open_probe_frees_its_slot(clock):
+    provider = tei_module.TeiProvider()
+    provider.breaker._clock = clock
+    for _ in range(tei_module.TEI_BREAKER_MIN_CALLS):
+        provider.breaker.record_failure()
+    clock.tick(tei_module.TEI_BREAKER_OPEN_SEC)
+    started = asyncio.Event()
+
+    async def hanging_batch(texts):
+        started.set()
+        await asyncio.Event().wait()
+
+    provider.embed_batch = hanging_batch
+    probe = asyncio.create_task(provider._embed_checked(["hello"]))
+    await started.wait()
+    probe.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await probe
+
+    assert not provider.breaker.is_open()
+
+    async def embed_batch(texts):
+        return [[1.0] * provider.dim for _ in texts]
+
+    provider.embed_batch = embed_batch
+    assert len(await provider._embed_checked(["hello"])) == 1
+    assert provider.breaker.state == CLOSED
+    await provider.close()
+
+
+async def test_tei_provider_splits_batches_only_on_input_errors(monkeypatch):
+    monkeypatch.setattr(tei_module, "EMBED_FALLBACK_TO_STUB", False)
+    provider = tei_module.TeiProvider()
+    calls = []
+
+    async def embed_batch(texts):
+        calls.append(list(texts))
+        if "bad" in texts:
+            raise TeiInputError("TEI rejected request: 413")
+        if "down" in texts:
+            raise RuntimeError("TEI request failed: 503")
+        return [[1.0] * provider.dim for _ in texts]
+
+    provider.embed_batch = embed_batch
+    results = await asyncio.gather(
+        *(provider.embed(t, "org", uuid4()) for t in ("a", "bad", "c")), return_exceptions=True
+    )
+    assert isinstance(results[1], TeiInputError) and len(results[0]) == len(results[2]) == provider.dim
+    assert sorted(calls[1:]) == [["a"], ["bad"], ["c"]]
+
+    calls.clear()
+    results = await asyncio.gather(
+        *(provider.embed(t, "org", uuid4()) for t in ("a", "down", "c")), return_exceptions=True
+    )
+    assert all(isinstance(r, RuntimeError) for r in results)
+    assert calls == [["a", "down", "c"]]
+    await provider.close()
+
+
+async def test_local_provider_explains_missing_dependencies():
+    try:
+        import onnxruntime  # noqa: F401
+    except ImportError:
+        pass
+    else:
+        pytest.skip("onnxruntime installed")
+
+    provider = create_provider("local")
+    with pytest.raises(RuntimeError, match="requirements-local.txt"):
+        await provider.start(None)
+
+
+class _FakeEncoding:
+    def __init__(self, ids, length):
+        self.ids = ids + [0] * (length - len(ids))
+        self.attention_mask = [1] * len(ids) + [0] * (length - len(ids))
+        self.type_ids = [0] * length
+
+
+class _FakeTokenizer:
+    """One token per word, id = word length, padded to the longest text like enable_padding()."""
+
+    def encode_batch(self, texts):
+        ids = [[len(w) for w in t.split()] for t in texts]
+        length = max(len(i) for i in ids)
+        return [_FakeEncoding(i, length) for i in ids]
+
+
+class _FakeSession:
+    """Hidden state [id, 1] per real token and a large [100, 100] at padded positions."""
+
+    def __init__(self, np):
+        self.np = np
+        self.feeds = None
+
+    def run(self, outputs, feeds):
+        self.feeds = feeds
+        ids, mask = feeds["input_ids"], feeds["attention_mask"]
+        real = self.np.stack([ids, self.np.ones_like(ids)], axis=-1).astype(self.np.float32)
+        return [self.np.where(mask[:, :, None] == 1, real, 100.0)]
+
+
+@pytest.mark.parametrize("pooling", ["mean", "cls"])
+async def test_local_provider_pools_real_tokens_and_normalizes(monkeypatch, pooling):
+    np = pytest.importorskip("numpy")
+    import app.embed.providers.local as local_module
+
+    monkeypatch.setattr(local_module, "EMBED_LOCAL_POOLING", pooling)
+    provider = local_module.LocalOnnxProvider()
+    provider.dim = 2
+    provider._np = np
+    provider._tokenizer = _FakeTokenizer()
+    provider._session = _FakeSession(np)
+    provider._input_names = ["input_ids", "attention_mask"]
+
+    short, long = await asyncio.gather(
+        provider.embed("abc", "org", uuid4()), provider.embed("a bb cccccc", "org", uuid4())
+    )
+    await provider.close()
+
+    assert set(provider._session.feeds) == {"input_ids", "attention_mask"}
+    assert provider._session.feeds["input_ids"].shape == (2, 3)  # one padded batch
+    # "abc" is padded to three positions; the padding must not leak into its vector
+    expected_short = [3.0, 1.0]
+    expected_long = [3.0, 1.0] if pooling == "mean" else [1.0, 1.0]
+    for vec, expected in ((short, expected_short), (long, expected_long)):
+        assert _norm(vec) == pytest.approx(1.0)
+        assert vec == pytest.approx([x / _norm(expected) for x in expected])
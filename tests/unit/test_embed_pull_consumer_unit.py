@@ -0,0 +1,115 @@
+import asyncio
+import contextlib
+
+import pytest
+from nats import errors as nats_errors
+
+from app.core.embedder_consumer_config import EMBEDDER_MAX_DELIVER
+from app.embed.pull_consumer import run_pull_consumer
+
+
+class FakeMsg:
+    def __init__(self, n):
+        self.n = n
+        self.acked = False
+        self.progress = 0
+
+    async def ack(self):
+        self.acked = True
+
+    async def in_progress(self):
+        self.progress += 1
+
+
+class FakeSub:
+    def __init__(self, queue, fetch_sizes):
+        self.queue = queue
+        self.fetch_sizes = fetch_sizes
+
+    async def fetch(self, batch=1, timeout=None):
+        self.fetch_sizes.append(batch)
+        if not self.queue:
+            await asyncio.sleep(0.01)
+            raise nats_errors.TimeoutError
+        out, self.queue[:] = self.queue[:batch], self.queue[batch:]
+        return out
+
+
+class FakeJetStream:
+    def __init__(self, msgs):
+        self.queue = list(msgs)
+        self.fetch_sizes = []
+        self.subs = 0
+        self.consumers = []
+
+    async def add_consumer(self, stream, config):
+        self.consumers.append((stream, config))
+
+    async def pull_subscribe_bind(self, durable=None, stream=None):
+        self.subs += 1
+        return FakeSub(self.queue, self.fetch_sizes)
+
+
+@pytest.mark.asyncio
+async def test_pull_workers_respect_max_in_flight_and_leave_failures_unacked():
+    msgs = [FakeMsg(n) for n in range(20)]
+    js = FakeJetStream(msgs)
+    active = 0
+    peak = 0
+    done = asyncio.Event()
+    handled = []
+
+    async def handler(msg):
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        try:
+            await asyncio.sleep(0.02)
+            handled.append(msg.n)
+            if len(handled) == len(msgs):
+                done.set()
+            if msg.n == 7:
+                raise RuntimeError("boom")
+            await msg.ack()
+        finally:
+            active -= 1
+
+    runner = asyncio.create_task(
+        run_pull_consumer(js, "s", handler, durable="d", workers=3, batch=4, max_in_flight=5)
+    )
+    try:
+        await asyncio.wait_for(done.wait(), 2.0)
+    finally:
+        runner.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await runner
+
+    assert js.subs == 3
+    [(stream, config)] = js.consumers
+    assert stream == "s" and config.durable_name == "d" and config.filter_subject == "messages.>"
+    assert config.max_ack_pending == 10 and config.max_deliver == EMBEDDER_MAX_DELIVER
+    assert peak <= 5
+    assert max(js.fetch_sizes) <= 4
+    assert [m.n for m in msgs if not m.acked] == [7]
+
+
+@pytest.mark.asyncio
+async def test_slow_messages_get_in_progress_acks():
+    msg = FakeMsg(0)
+    js = FakeJetStream([msg])
+
+    async def handler(m):
+        await asyncio.sleep(0.1)
+        await m.ack()
+
+    runner = asyncio.create_task(
+        run_pull_consumer(js, "s", handler, durable="d", workers=1, ack_wait_sec=0.09)
+    )
+    try:
+        await asyncio.sleep(0.15)
+    finally:
+        runner.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await runner
+
+    assert msg.acked and msg.progress >= 2
@@ -0,0 +1,67 @@
+import asyncio
+
+import pytest
+
+from app.embed.embedding_cache import EmbeddingCache
+
+VEC = [0.5, -0.25, 0.125, 1.0]
+
+
+class Backend:
+    def __init__(self, fail=False):
+        self.calls = 0
+        self.fail = fail
+
+    async def __call__(self):
+        self.calls += 1
+        await asyncio.sleep(0.01)
+        if self.fail:
+            raise RuntimeError("TEI down")
+        return list(VEC)
+
+
+def test_key_ignores_whitespace_but_not_model_or_case():
+    cache = EmbeddingCache("model-a", max_bytes=1024)
+
+    assert cache.key("hello   world\n") == cache.key(" hello world")
+    assert cache.key("hello world") != cache.key("Hello world")
+    assert cache.key("hello") != EmbeddingCache("model-b", max_bytes=1024).key("hello")
+
+
+@pytest.mark.asyncio
+async def test_concurrent_duplicates_share_one_computation():
+    cache = EmbeddingCache("m", max_bytes=1024)
+    backend = Backend()
+
+    results = await asyncio.gather(*(cache.get_or_compute("same text", backend) for _ in range(5)))
+
+    assert results == [VEC] * 5
+    assert backend.calls == 1
+    assert await cache.get_or_compute("same  text", backend) == VEC
+    assert backend.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_failures_are_not_cached():
+    cache = EmbeddingCache("m", max_bytes=1024)
+
+    with pytest.raises(RuntimeError):
+        await cache.get_or_compute("t", Backend(fail=True))
+
+    backend = Backend()
+    assert await cache.get_or_compute("t", backend) == VEC
+    assert backend.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_local_tier_evicts_least_recent_by_size_and_refills_from_kv(fake_kv):
+    kv = fake_kv
+    # room for two 4-dim float32 vectors
+    cache = EmbeddingCache("m", max_bytes=32, kv=kv)
+    for text in ("a", "b", "c"):
+        await cache.put(cache.key(text), VEC)
+
+    assert cache.key("a") not in cache._entries
+    assert list(cache._entries) == [cache.key("b"), cache.key("c")]
+    assert await cache.get(cache.key("a")) == VEC
+    assert list(cache._entries) == [cache.key("c"), cache.key("a")]
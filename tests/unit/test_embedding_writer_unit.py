@@ -0,0 +1,74 @@
+import asyncio
+import uuid
+from contextlib import asynccontextmanager
+
+import pytest
+
+from app.embed.embedding_writer import EmbeddingWriter
+
+
+class FakeCursor:
+    def __init__(self, pool):
+        self.pool = pool
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def execute(self, sql, params):
+        self.pool.statements.append(params)
+        if self.pool.fail:
+            raise RuntimeError("db down")
+
+
+class FakeConnection:
+    def __init__(self, pool):
+        self.pool = pool
+
+    def cursor(self):
+        return FakeCursor(self.pool)
+
+
+class FakePool:
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.statements = []
+        self.commits = 0
+
+    @asynccontextmanager
+    async def connection(self):
+        yield FakeConnection(self)
+        self.commits += 1
+
+
+@pytest.mark.asyncio
+async def test_concurrent_writes_share_one_insert_and_return_after_commit():
+    pool = FakePool()
+    writer = EmbeddingWriter(pool, "m-v1", max_batch_size=10, max_wait_sec=0.01)
+    ids = [uuid.uuid4() for _ in range(3)]
+
+    await asyncio.gather(*(writer.write("org-1", mid, [0.5, 0.25]) for mid in ids))
+
+    assert pool.commits == 1
+    model_version, org_ids, message_ids, vectors = pool.statements[0]
+    assert model_version == "m-v1"
+    assert org_ids == ["org-1"] * 3
+    assert message_ids == [str(mid) for mid in ids]
+    assert vectors == ["[0.500000,0.250000]"] * 3
+
+
+@pytest.mark.asyncio
+async def test_failed_flush_fails_every_writer():
+    pool = FakePool(fail=True)
+    writer = EmbeddingWriter(pool, "m-v1", max_batch_size=2, max_wait_sec=0.01)
+
+    results = await asyncio.gather(
+        writer.write("org-1", uuid.uuid4(), [1.0]),
+        writer.write("org-1", uuid.uuid4(), [1.0]),
+        return_exceptions=True,
+    )
+
+    assert all(isinstance(r, RuntimeError) for r in results)
+    assert pool.commits == 0
@@ -0,0 +1,114 @@
+import uuid
+from datetime import datetime, timezone
+
+import pytest
+from pydantic import BaseModel
+
+from app import event_codec_msgspec as msgspec_codec
+from app import events
+from app.events import (
+    MessageClusteredEvent,
+    MessageCreatedEvent,
+    MessageEmbeddedEvent,
+    MessagePayload,
+    embedding_fields,
+)
+
+VECTOR = [0.5, -0.25, 0.125, 1.0, 0.0]
+
+
+def _payload() -> MessagePayload:
+    return MessagePayload(
+        message_id=uuid.uuid4(),
+        user_id="user-1",
+        ts=datetime.now(timezone.utc),
+        source_type="test",
+        text="hello",
+        metadata={"via": "unit", "tags": ["a", None, 3]},
+    )
+
+
+def _events():
+    now = datetime.now(timezone.utc)
+    created = MessageCreatedEvent(event_id=uuid.uuid4(), org_id="org-1", message=_payload())
+    embedded = {
+        version: MessageEmbeddedEvent(
+            event_id=uuid.uuid4(),
+            org_id="org-1",
+            message=_payload(),
+            model_version="stub-768-v1",
+            embedding_dim=len(VECTOR),
+            created_at=now,
+            **embedding_fields(VECTOR, version),
+        )
+        for version in (1, 2)
+    }
+    clustered = MessageClusteredEvent(
+        event_id=uuid.uuid4(),
+        org_id="org-1",
+        message_id=uuid.uuid4(),
+        user_id="user-1",
+        ts=now,
+        model_version="stub-768-v1",
+        cluster_id=uuid.uuid4(),
+        confidence=0.75,
+        created_at=now,
+    )
+    return [
+        (created, events.parse_message_created, msgspec_codec.parse_message_created),
+        (embedded[1], events.parse_message_embedded, msgspec_codec.parse_message_embedded),
+        (embedded[2], events.parse_message_embedded, msgspec_codec.parse_message_embedded),
+        (clustered, events.parse_message_clustered, msgspec_codec.parse_message_clustered),
+    ]
+
+
+@pytest.mark.parametrize("evt,parse_pydantic,parse_msgspec", _events())
+def test_codecs_are_wire_compatible(evt, parse_pydantic, parse_msgspec):
+    raw = events.to_json_bytes(evt)
+
+    assert msgspec_codec.to_json_bytes(evt) == raw
+    assert parse_msgspec(raw) == parse_pydantic(raw) == evt
+    assert type(parse_msgspec(raw)) is type(evt)
+
+
+def test_msgspec_codec_forbids_unknown_fields_and_runs_model_validators():
+    evt = _events()[2][0]
+    raw = events.to_json_bytes(evt)
+
+    with pytest.raises(ValueError):
+        msgspec_codec.parse_message_embedded(raw.replace(b'"org_id"', b'"extra":1,"org_id"'))
+    with pytest.raises(ValueError, match="event_version 1"):
+        msgspec_codec.parse_message_embedded(raw.replace(b'"event_version":2', b'"event_version":1'))
+
+
+@pytest.mark.parametrize("model", [MessageCreatedEvent, MessageEmbeddedEvent, MessageClusteredEvent])
+def test_every_after_validator_is_rerun_by_the_msgspec_codec(model):
+    # model_construct skips validation, so a new @model_validator(mode="after") on an event
+    # model must be registered with the msgspec codec too
+    after = {
+        name
+        for name, decorator in model.__pydantic_decorators__.model_validators.items()
+        if decorator.info.mode == "after"
+    }
+    registered = msgspec_codec._AFTER_VALIDATORS.get(model)
+
+    assert after == ({registered.__name__} if registered else set())
+
+
+@pytest.mark.parametrize("fast", [True, False])
+def test_decoded_models_match_model_construct_with_either_construction(monkeypatch, fast):
+    # _to_model fills BaseModel's slots itself only while their layout is the one it knows
+    if fast and not msgspec_codec._FAST_CONSTRUCT:
+        pytest.skip("pydantic's instance layout changed; _to_model uses model_construct")
+    monkeypatch.setattr(msgspec_codec, "_FAST_CONSTRUCT", fast)
+
+    for evt, _, parse_msgspec in _events():
+        raw = events.to_json_bytes(evt)
+        decoded = parse_msgspec(raw)
+        constructed = type(evt).model_construct(
+            _fields_set=decoded.model_fields_set, **{k: getattr(decoded, k) for k in type(evt).model_fields}
+        )
+        for slot in BaseModel.__slots__:
+            assert getattr(decoded, slot) == getattr(constructed, slot), slot
+        assert decoded == evt
+        assert decoded.model_copy() == decoded
@@ -0,0 +1,86 @@
+import json
+import uuid
+from datetime import datetime, timezone
+
+import pytest
+from pydantic import ValidationError
+
+from app.events import (
+    MessageEmbeddedEvent,
+    MessagePayload,
+    claim_check_fields,
+    embedding_fields,
+    parse_message_embedded,
+    to_json_bytes,
+)
+
+VECTOR = [0.5, -0.25, 0.125, 1.0, 0.0]
+
+
+def _embedded(**fields) -> MessageEmbeddedEvent:
+    return MessageEmbeddedEvent(
+        event_id=uuid.uuid4(),
+        org_id="org-1",
+        message=MessagePayload(
+            message_id=uuid.uuid4(),
+            user_id="user-1",
+            ts=datetime.now(timezone.utc),
+            source_type="test",
+            text="hello",
+        ),
+        model_version="stub-768-v1",
+        embedding_dim=len(VECTOR),
+        created_at=datetime.now(timezone.utc),
+        **fields,
+    )
+
+
+def test_version_1_keeps_its_original_wire_shape():
+    raw = to_json_bytes(_embedded(**embedding_fields(VECTOR, 1)))
+
+    body = json.loads(raw)
+    assert body["event_version"] == 1
+    assert body["embedding"] == VECTOR
+    assert "embedding_b64" not in body and "embedding_dtype" not in body
+    assert parse_message_embedded(raw).vector() == VECTOR
+
+
+@pytest.mark.parametrize("dtype", ["float32", "float16"])
+def test_version_2_round_trips_binary_embedding(dtype):
+    raw = to_json_bytes(_embedded(**embedding_fields(VECTOR, 2, dtype)))
+
+    body = json.loads(raw)
+    assert body["event_version"] == 2
+    assert body["embedding_dtype"] == dtype
+    assert "embedding" not in body
+    # exactly representable values survive both dtypes
+    assert parse_message_embedded(raw).vector() == VECTOR
+
+
+def test_version_2_rejects_mismatched_dimension_and_mixed_fields():
+    fields = embedding_fields(VECTOR[:-1], 2)
+    with pytest.raises(ValidationError):
+        _embedded(**fields)
+
+    with pytest.raises(ValidationError):
+        _embedded(event_version=2, embedding=VECTOR)
+
+
+def test_version_3_carries_only_a_claim_check_reference():
+    raw = to_json_bytes(_embedded(**claim_check_fields("kv", "abc123")))
+
+    body = json.loads(raw)
+    assert body["event_version"] == 3
+    assert (body["embedding_store"], body["embedding_ref"]) == ("kv", "abc123")
+    assert "embedding" not in body and "embedding_b64" not in body
+
+    evt = parse_message_embedded(raw)
+    with pytest.raises(ValueError):
+        evt.vector()
+
+    # db references are keyed by the event itself; kv references need a key
+    assert "embedding_ref" not in json.loads(to_json_bytes(_embedded(**claim_check_fields("db"))))
+    with pytest.raises(ValidationError):
+        _embedded(**claim_check_fields("kv"))
+    with pytest.raises(ValidationError):
+        _embedded(**claim_check_fields("db"), embedding=VECTOR)
@@ -0,0 +1,72 @@
+import asyncio
+
+import pytest
+
+from app.embed.micro_batcher import MicroBatcher
+
+
+class RecordingBackend:
+    def __init__(self, poison=()):
+        self.poison = set(poison)
+        self.calls = []
+
+    async def __call__(self, items):
+        self.calls.append(list(items))
+        await asyncio.sleep(0)
+        if self.poison.intersection(items):
+            raise ValueError("poison input")
+        return [item.upper() for item in items]
+
+
+@pytest.mark.asyncio
+async def test_full_batches_flush_immediately_and_fan_results_out():
+    backend = RecordingBackend()
+    batcher = MicroBatcher(backend, max_batch_size=3, max_wait_sec=10.0)
+
+    results = await asyncio.wait_for(asyncio.gather(*(batcher.submit(t) for t in "abcdef")), 1.0)
+
+    assert results == list("ABCDEF")
+    assert backend.calls == [["a", "b", "c"], ["d", "e", "f"]]
+
+
+@pytest.mark.asyncio
+async def test_partial_batch_flushes_after_max_wait():
+    backend = RecordingBackend()
+    batcher = MicroBatcher(backend, max_batch_size=32, max_wait_sec=0.01)
+
+    results = await asyncio.gather(batcher.submit("x"), batcher.submit("y"))
+
+    assert results == ["X", "Y"]
+    assert backend.calls == [["x", "y"]]
+
+
+@pytest.mark.asyncio
+async def test_failed_batch_is_retried_per_item_to_isolate_bad_inputs():
+    backend = RecordingBackend(poison={"bad"})
+    batcher = MicroBatcher(
+        backend, max_batch_size=3, max_wait_sec=10.0, should_split=lambda e: isinstance(e, ValueError)
+    )
+
+    results = await asyncio.gather(
+        batcher.submit("a"), batcher.submit("bad"), batcher.submit("c"), return_exceptions=True
+    )
+
+    assert results[0] == "A" and results[2] == "C"
+    assert isinstance(results[1], ValueError)
+    assert backend.calls[0] == ["a", "bad", "c"]
+    assert sorted(backend.calls[1:]) == [["a"], ["bad"], ["c"]]
+
+
+@pytest.mark.asyncio
+async def test_failed_batch_fails_every_item_when_the_error_is_not_an_input_error():
+    backend = RecordingBackend(poison={"bad"})
+    batcher = MicroBatcher(
+        backend, max_batch_size=3, max_wait_sec=10.0, should_split=lambda e: isinstance(e, KeyError)
+    )
+
+    results = await asyncio.gather(
+        batcher.submit("a"), batcher.submit("bad"), batcher.submit("c"), return_exceptions=True
+    )
+
+    assert all(isinstance(r, ValueError) for r in results)
+    assert backend.calls == [["a", "bad", "c"]]
@@ -0,0 +1,61 @@
+import asyncio
+
+import pytest
+
+from app.core.nats_client import NatsJetStreamPublisher
+
+
+class _FakeJetStream:
+    def __init__(self, fail_subjects=(), stall_subjects=()):
+        self.fail_subjects = set(fail_subjects)
+        self.stall_subjects = set(stall_subjects)
+        self.sent = []
+
+    async def publish_async(self, subject, payload, wait_stall=None, headers=None):
+        if subject in self.fail_subjects:
+            raise RuntimeError("too many stalled msgs")
+        self.sent.append((subject, payload, headers))
+        future = asyncio.get_running_loop().create_future()
+        if subject not in self.stall_subjects:
+            asyncio.get_running_loop().call_soon(future.set_result, len(self.sent))
+        return future
+
+
+def _publisher(js, ack_timeout=1.0) -> NatsJetStreamPublisher:
+    pub = NatsJetStreamPublisher(
+        nats_url="nats://unused:4222",
+        stream_name="ingress_messages",
+        subjects=["messages.>"],
+        ack_timeout=ack_timeout,
+    )
+    pub._js = js
+    return pub
+
+
+@pytest.mark.asyncio
+async def test_publish_many_returns_acks_and_errors_in_input_order():
+    js = _FakeJetStream(fail_subjects={"messages.bad"})
+    pub = _publisher(js)
+
+    results = await pub.publish_many(
+        [
+            ("messages.a", b"1", None),
+            ("messages.bad", b"2", None),
+            ("messages.b", b"3", {"Nats-Msg-Id": "org.1"}),
+        ]
+    )
+
+    assert results[0] == 1
+    assert isinstance(results[1], RuntimeError)
+    assert results[2] == 2
+    assert js.sent == [("messages.a", b"1", None), ("messages.b", b"3", {"Nats-Msg-Id": "org.1"})]
+
+
+@pytest.mark.asyncio
+async def test_publish_async_times_out_when_puback_never_arrives():
+    pub = _publisher(_FakeJetStream(stall_subjects={"messages.slow"}), ack_timeout=0.05)
+
+    ack = await pub.publish_async("messages.slow", b"x")
+
+    with pytest.raises(asyncio.TimeoutError):
+        await ack
@@ -0,0 +1,188 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from app.embed.tei_client import TeiClient
+
+
+def _client(handler, **kwargs) -> TeiClient:
+    kwargs.setdefault("backoff_base_sec", 0.0)
+    return TeiClient("http://tei", transport=httpx.MockTransport(handler), **kwargs)
+
+
+@pytest.mark.asyncio
+async def test_retries_overload_responses_then_returns_vectors():
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(json.loads(request.content))
+        if len(calls) < 3:
+            return httpx.Response(503)
+        return httpx.Response(200, json=[[1.0, 0.0], [0.0, 1.0]])
+
+    client = _client(handler, max_retries=2)
+    try:
+        assert await client.embed(["a", "b"]) == [[1.0, 0.0], [0.0, 1.0]]
+    finally:
+        await client.aclose()
+    assert calls == [{"inputs": ["a", "b"], "truncate": True}] * 3
+
+
+@pytest.mark.asyncio
+async def test_client_errors_are_not_retried():
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request)
+        return httpx.Response(413, text="input too long")
+
+    client = _client(handler, max_retries=3)
+    try:
+        with pytest.raises(RuntimeError, match="413"):
+            await client.embed(["a"])
+    finally:
+        await client.aclose()
+    assert len(calls) == 1
+
+
+@pytest.mark.asyncio
+async def test_concurrency_is_capped():
+    active = 0
+    peak = 0
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0.01)
+        active -= 1
+        return httpx.Response(200, json=[[1.0]])
+
+    client = _client(handler, max_concurrency=2)
+    try:
+        await asyncio.gather(*(client.embed(["x"]) for _ in range(6)))
+    finally:
+        await client.aclose()
+    assert peak == 2
+
+
+def _replicas(handler, **kwargs) -> TeiClient:
+    kwargs.setdefault("backoff_base_sec", 0.0)
+    return TeiClient(["http://a", "http://b"], transport=httpx.MockTransport(handler), **kwargs)
+
+
+@pytest.mark.asyncio
+async def test_routes_to_least_outstanding_endpoint():
+    hosts = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        hosts.append(request.url.host)
+        return httpx.Response(200, json=[[1.0]])
+
+    client = _replicas(handler)
+    try:
+        client.endpoints[0].outstanding = 3
+        await client.embed(["x"])
+        await client.embed(["y"])
+    finally:
+        await client.aclose()
+    assert hosts == ["b", "b"]
+
+
+@pytest.mark.asyncio
+async def test_retry_goes_to_another_endpoint():
+    hosts = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        hosts.append(request.url.host)
+        if request.url.host == "a":
+            return httpx.Response(503)
+        return httpx.Response(200, json=[[1.0]])
+
+    client = _replicas(handler, max_retries=1)
+    client.endpoints[1].outstanding = 1  # make the first pick deterministic
+    try:
+        assert await client.embed(["x"]) == [[1.0]]
+    finally:
+        await client.aclose()
+    assert hosts == ["a", "b"]
+
+
+@pytest.mark.asyncio
+async def test_failing_endpoint_is_ejected_until_its_time_is_up(clock):
+    hosts = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        hosts.append(request.url.host)
+        if request.url.host == "a":
+            raise httpx.ConnectError("connection refused", request=request)
+        return httpx.Response(200, json=[[1.0]])
+
+    client = _replicas(handler, max_retries=1, eject_consecutive_failures=2, eject_base_sec=10.0, clock=clock)
+    a = client.endpoints[0]
+    try:
+        for _ in range(2):
+            client.endpoints[1].outstanding = 1
+            await client.embed(["x"])
+            client.endpoints[1].outstanding = 0
+        assert not a.available(clock.now)
+
+        hosts.clear()
+        for _ in range(5):
+            await client.embed(["x"])
+        assert hosts == ["b"] * 5
+
+        clock.now = 10.0
+        assert a.available(clock.now)
+        # Ejected again straight away: twice as long this time
+        for _ in range(2):
+            client.endpoints[1].outstanding = 1
+            await client.embed(["x"])
+            client.endpoints[1].outstanding = 0
+        assert a.ejected_until == 30.0
+    finally:
+        await client.aclose()
+
+
+@pytest.mark.asyncio
+async def test_health_check_takes_endpoint_out_of_rotation():
+    a_healthy = False
+    hosts = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.path == "/health":
+            return httpx.Response(200 if request.url.host == "b" or a_healthy else 503)
+        hosts.append(request.url.host)
+        return httpx.Response(200, json=[[1.0]])
+
+    client = _replicas(handler)
+    try:
+        await client.check_health()
+        for _ in range(4):
+            await client.embed(["x"])
+        assert hosts == ["b"] * 4
+
+        a_healthy = True
+        await client.check_health()
+        client.endpoints[1].outstanding = 1
+        await client.embed(["x"])
+        assert hosts[-1] == "a"
+    finally:
+        await client.aclose()
+
+
+@pytest.mark.asyncio
+async def test_all_endpoints_down_still_tries_them():
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.path == "/health":
+            return httpx.Response(503)
+        return httpx.Response(200, json=[[1.0]])
+
+    client = _replicas(handler)
+    try:
+        await client.check_health()
+        assert await client.embed(["x"]) == [[1.0]]
+    finally:
+        await client.aclose()
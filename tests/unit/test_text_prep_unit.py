@@ -0,0 +1,51 @@
+import math
+
+from app.embed.text_prep import approx_token_count, mean_pool, split_for_embedding
+
+TEXT = "Deploy window moves to Friday. " * 40  # 6 tokens per sentence
+
+
+def test_short_text_is_returned_unchanged():
+    assert split_for_embedding("hi there", 512) == [("hi there", 2)]
+
+
+def test_truncate_keeps_the_start_within_budget():
+    [(piece, count)] = split_for_embedding(TEXT, 30, "truncate")
+
+    assert count <= 30
+    assert TEXT.startswith(piece)
+    assert approx_token_count(piece) == count
+
+
+def test_chunk_covers_text_in_order_up_to_max_chunks():
+    pieces = split_for_embedding(TEXT, 30, "chunk", max_chunks=100)
+
+    assert all(count <= 30 for _, count in pieces)
+    assert sum(count for _, count in pieces) == approx_token_count(TEXT)
+    assert " ".join(p for p, _ in pieces).split() == TEXT.split()
+    assert len(split_for_embedding(TEXT, 30, "chunk", max_chunks=3)) == 3
+
+
+def test_long_words_cost_more_than_one_token():
+    assert approx_token_count("a" * 40) == 5
+
+
+def test_unspaced_scripts_count_a_token_per_character():
+    cjk = "部署窗口改到周五请大家提前准备" * 40  # 15 characters per sentence
+    thai = "กรุณาตรวจสอบแผนการปล่อย"
+
+    assert approx_token_count(cjk) == len(cjk)
+    assert approx_token_count(thai) == len(thai)
+    assert approx_token_count("deploy 部署 Friday") == 4
+
+    pieces = split_for_embedding(cjk, 100, "chunk", max_chunks=100)
+    assert len(pieces) == 6
+    assert all(count <= 100 for _, count in pieces)
+    assert "".join(p for p, _ in pieces) == cjk
+
+
+def test_mean_pool_weights_by_tokens_and_renormalizes():
+    pooled = mean_pool([[1.0, 0.0], [0.0, 1.0]], [3, 1])
+
+    assert math.isclose(sum(x * x for x in pooled), 1.0)
+    assert math.isclose(pooled[0] / pooled[1], 3.0)